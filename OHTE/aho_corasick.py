@@ -0,0 +1,130 @@
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+class AhoCorasickMatch(object):
+    """What `AhoCorasick.finditer` yields. Like a regex match, as far as finding goes."""
+
+    __slots__ = ('_start', '_end', 'term')
+
+    def __init__(self, start: int, end: int, term: int):
+        self._start = start
+        self._end = end
+        self.term = term  # index of the term matched
+
+    def start(self) -> int:
+        return self._start
+
+    def end(self) -> int:
+        return self._end
+
+    def span(self) -> Tuple[int, int]:
+        return self._start, self._end
+
+
+class AhoCorasick(object):
+    """
+    Automaton finding any of a list of literal terms in one pass over a text, however many terms there are.
+
+    It stands in for a compiled regex of the terms as alternatives (`finditer`, `search`), and like `re` finds
+    non-overlapping matches left to right; of matches starting at the same place, the longest wins.
+    """
+
+    def __init__(self, terms: List[str], case_sensitive: bool = True):
+        """
+        :param terms: Literal terms to find. Empty terms are ignored; for duplicates, the first one's index counts.
+        :param case_sensitive: If False, terms match regardless of case.
+        """
+        self.terms = terms
+        self.case_sensitive = case_sensitive
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail = [0]
+        self._depth = [0]
+        self._out: List[Tuple[int, ...]] = [()]  # terms ending at each state, its own first, then by failure links
+        self._term_indices: Dict[str, int] = {}
+        self._normalized: Tuple[Optional[str], str] = (None, '')
+
+        for i, term in enumerate(terms):
+            term = self.normalize(term)
+            if not term or term in self._term_indices:
+                continue
+            self._term_indices[term] = i
+            state = 0
+            for char in term:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._depth.append(self._depth[state] + 1)
+                    self._out.append(())
+                state = next_state
+            self._out[state] = (i,)
+
+        # Breadth first, so each state's failure state, being shallower, is done before it.
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[next_state] = fail
+                self._out[next_state] += self._out[fail]
+                queue.append(next_state)
+
+    def normalize(self, text: str) -> str:
+        """Case folds `text` if case insensitive, keeping its length, so positions in it are positions in `text`."""
+        if self.case_sensitive:
+            return text
+        lower = text.lower()
+        if len(lower) == len(text):
+            return lower
+        return ''.join(char.lower() if len(char.lower()) == 1 else char for char in text)
+
+    def term_index(self, matched: str) -> int:
+        """
+        :param matched: Text of a match.
+        :return: Index of the term it matched.
+        :raises KeyError: It matches none.
+        """
+        return self._term_indices[self.normalize(matched)]
+
+    def finditer(self, text: str, pos: int = 0, endpos: Optional[int] = None) -> Iterator[AhoCorasickMatch]:
+        """Yields the non-overlapping, leftmost-longest matches in `text[pos:endpos]`, in order."""
+        if self._normalized[0] is not text:  # e.g. repeated `search`es of the same text, only normalize it once
+            self._normalized = (text, self.normalize(text))
+        normalized = self._normalized[1]
+        endpos = len(text) if endpos is None else min(endpos, len(text))
+        goto, fail, depth, out, terms = self._goto, self._fail, self._depth, self._out, self.terms
+
+        state = 0
+        best: Optional[Tuple[int, int, int]] = None  # (start, end, term)
+        i = pos
+        while True:
+            if i < endpos:
+                char = normalized[i]
+                while state and char not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(char, 0)
+                i += 1
+                for term in out[state]:
+                    start = i - len(terms[term])
+                    if best is None or start < best[0] or (start == best[0] and i > best[1]):
+                        best = (start, i, term)
+                # Nothing can beat the best match once every partial match in progress starts after it.
+                if best is None or i - depth[state] <= best[0]:
+                    continue
+            elif best is None:
+                return
+            # From the end of the match, start over, so that matches don't overlap.
+            yield AhoCorasickMatch(*best)
+            i = best[1]
+            state = 0
+            best = None
+
+    def search(self, text: str, pos: int = 0, endpos: Optional[int] = None) -> Optional[AhoCorasickMatch]:
+        """The first match in `text[pos:endpos]`, or None."""
+        return next(self.finditer(text, pos, endpos), None)
@@ -0,0 +1,230 @@
+import os
+import json
+import uuid
+import threading
+from typing import List, Optional, Tuple
+
+from PySide2.QtCore import QDir, QFile, QFileInfo, QLockFile, QObject, QTextStream, QTimer
+from PySide2.QtGui import QTextCursor, QTextDocument
+
+
+AUTOSAVE_INTERVAL = 5000  # ms between writes of the edits recorded
+COMPACT_MIN_SIZE = 1 << 20  # bytes of edits journaled before compacting, however short the document
+
+# Journal records, one JSON array per line. A journal is one base record, then edits.
+FILE = 'file'  # [FILE, file_name, size, last modified ms]: the file as saved
+TEXT = 'text'  # [TEXT, file_name or '' if untitled, text]
+EDIT = 'edit'  # [EDIT, position, chars removed, text added], as from QTextDocument.contentsChange
+
+
+def _file_record(file_name: str) -> list:
+    info = QFileInfo(file_name)
+    return [FILE, file_name, info.size(), info.lastModified().toMSecsSinceEpoch()]
+
+
+def replay_journal(journal_name: str) -> Optional[Tuple[str, str]]:
+    """
+    Rebuilds the document a recovery journal was kept for.
+
+    :param journal_name: The journal file.
+    :return: (file name, or '' if untitled, text), or None if there's nothing to recover: no edits since the file was
+             saved, or the file changed since, or the journal has no base.
+    """
+    document = QTextDocument()
+    document.setUndoRedoEnabled(False)
+    cursor = QTextCursor(document)
+    base = None
+    edited = False
+    with open(journal_name, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:  # Line cut short by a crash mid-write.
+                break
+            if base is None:
+                base = record
+                if record[0] == TEXT:
+                    cursor.insertText(record[2])
+                    edited = bool(record[2])
+                elif record[0] == FILE:
+                    file = QFile(record[1])
+                    if _file_record(record[1]) != record or not file.open(QFile.ReadOnly | QFile.Text):
+                        return None
+                    cursor.insertText(QTextStream(file).readAll())
+                else:
+                    return None
+            elif record[0] == EDIT:
+                _, position, removed, added = record
+                cursor.setPosition(position)
+                cursor.setPosition(position + removed, QTextCursor.KeepAnchor)
+                cursor.insertText(added)
+                edited = True
+    if base is None or not edited:
+        return None
+    return base[1], document.toPlainText()
+
+
+def find_journals(recovery_dir: str) -> List[str]:
+    """Journals in `recovery_dir` left by windows that weren't closed, i.e. that no running instance has locked."""
+    journals = []
+    for name in sorted(QDir(recovery_dir).entryList(['*.journal'], QDir.Files)):
+        journal_name = QDir(recovery_dir).filePath(name)
+        lock = QLockFile(journal_name + '.lock')
+        if lock.tryLock(0):  # Takes over stale locks, those of processes that are gone.
+            lock.unlock()
+            journals.append(journal_name)
+    return journals
+
+
+def remove_journal(journal_name: str):
+    for file_name in (journal_name, journal_name + '.compact'):
+        if os.path.exists(file_name):
+            os.remove(file_name)
+
+
+class Autosave(QObject):
+    """
+    Keeps a recovery journal of a document's unsaved edits, so that they survive a crash.
+
+    Every change the document reports (`contentsChange`) is recorded as an edit, and the edits are appended to the
+    journal (and synced to disk) every `interval` ms. Writing costs O(edits), whatever the size of the document.
+
+    The journal starts with a base to apply the edits to: the file as saved, which costs nothing to record, or the
+    text. When the edits journaled grow past twice the document, the journal is compacted: the document's text is
+    written in the background as the base of a new journal, which then replaces the old one. Edits made meanwhile go
+    into both.
+
+    The journal is locked while in use, so another instance doesn't take it for the journal of a crashed window.
+    """
+
+    def __init__(self, document: QTextDocument, recovery_dir: str, interval: int = AUTOSAVE_INTERVAL,
+                 parent: QObject = None):
+        """
+        :param document: The document to journal. Recording starts with `restart`.
+        :param recovery_dir: Existing directory for the journal.
+        :param interval: ms between journal writes.
+        """
+        super().__init__(parent)
+        self.document = document
+        self.journal_name = QDir(recovery_dir).filePath(uuid.uuid4().hex + '.journal')
+        self.lock = QLockFile(self.journal_name + '.lock')
+        self.lock.tryLock(0)
+        self.file_name = ''
+        self.recording = False
+        self.length = 0  # of the document's text, as of the last change recorded
+        self.pending: List[str] = []  # journal lines not yet written
+        self.since_compaction: Optional[List[str]] = None  # written since the compaction snapshot, while compacting
+        self.journal_size = 0  # bytes of edits in the journal
+        self.compaction_thread: Optional[threading.Thread] = None
+        self._file = None
+        self.timer = QTimer(self, interval=interval, timeout=self.flush)
+        document.documentLayout()  # Without a layout, as for a document not in an editor, contentsChange isn't emitted.
+        document.contentsChange.connect(self.record)
+
+    def pause(self):
+        """Stops recording, e.g. while a file loads, until `restart`."""
+        self.recording = False
+
+    def restart(self, file_name: str):
+        """
+        Starts the journal over from the document as it is now.
+
+        :param file_name: The document's file, or '' if untitled. If it's saved, the journal starts from the file.
+        """
+        self.file_name = file_name
+        self.recording = True
+        self.length = self.document.characterCount() - 1
+        self.pending = []
+        self.timer.start()
+        if file_name and not self.document.isModified():
+            self.finish_compaction()
+            self._write_journal([json.dumps(_file_record(file_name)) + '\n'])
+        else:
+            self.compact()
+
+    def record(self, position: int, removed: int, added: int):
+        if not self.recording:
+            return
+        # Changes spanning the whole document count its final block separator, which isn't part of the text.
+        length = self.document.characterCount() - 1
+        removed = min(removed, self.length - position)
+        added = min(added, length - position)
+        self.length = length
+        cursor = QTextCursor(self.document)
+        cursor.setPosition(position)
+        cursor.setPosition(position + added, QTextCursor.KeepAnchor)
+        text = cursor.selectedText().replace('\u2029', '\n')  # paragraph separators, between blocks
+        self.pending.append(json.dumps([EDIT, position, removed, text]) + '\n')
+
+    def flush(self):
+        """Writes the edits recorded to the journal, compacting it if it outgrew the document."""
+        if self.compaction_thread is not None and not self.compaction_thread.is_alive():
+            self.finish_compaction()
+        if not self.pending:
+            return
+        lines, self.pending = self.pending, []
+        if self._file is None:
+            self._file = open(self.journal_name, 'a', encoding='utf-8')
+        self._file.write(''.join(lines))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.journal_size += sum(map(len, lines))
+        if self.since_compaction is not None:
+            self.since_compaction.extend(lines)
+        elif self.journal_size > max(COMPACT_MIN_SIZE, 2 * self.document.characterCount()):
+            self.compact()
+
+    def compact(self):
+        """Writes the document's text as the base of a new journal in the background, to replace this one with."""
+        self.finish_compaction()
+        self.flush()
+        self.since_compaction = []
+        # Only the snapshot is taken here; encoding it, as long as the document, is left to the worker.
+        self.compaction_thread = threading.Thread(target=self._compact,
+                                                  args=(self.file_name, self.document.toPlainText()), daemon=True)
+        self.compaction_thread.start()
+
+    def _compact(self, file_name: str, text: str):
+        with open(self.journal_name + '.compact', 'w', encoding='utf-8') as f:
+            f.write(json.dumps([TEXT, file_name, text]) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def finish_compaction(self):
+        """Waits for a compaction in progress, if any, and switches to its journal."""
+        if self.compaction_thread is None:
+            return
+        self.compaction_thread.join()
+        self.compaction_thread = None
+        lines, self.since_compaction = self.since_compaction, None
+        self.close()
+        os.replace(self.journal_name + '.compact', self.journal_name)
+        self.journal_size = 0
+        if lines:
+            self._write_journal(lines, append=True)
+
+    def _write_journal(self, lines: List[str], append: bool = False):
+        self.close()
+        if not append:
+            self.journal_size = 0
+        with open(self.journal_name, 'a' if append else 'w', encoding='utf-8') as f:
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        self.journal_size += sum(map(len, lines))
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def discard(self):
+        """Stops journaling and deletes the journal, e.g. once the document is saved or its changes discarded."""
+        self.recording = False
+        self.timer.stop()
+        if self.compaction_thread is not None:
+            self.compaction_thread.join()
+            self.compaction_thread = None
+        self.close()
+        remove_journal(self.journal_name)
+        self.lock.unlock()
@@ -0,0 +1,145 @@
+import re
+import threading
+from bisect import bisect_left
+from typing import Callable, Iterator, List, Pattern, Tuple, Union
+
+from PySide2.QtCore import QObject, Signal
+from PySide2.QtGui import QTextDocument
+
+from OHTE.match_index import MatchIndex
+from OHTE.aho_corasick import AhoCorasick
+
+
+CHUNK_SIZE = 1 << 16  # characters searched between checks for cancellation
+
+# Find modes
+LITERAL = 0
+REGEX = 1  # Python regex, matching within lines
+BATCH = 2  # any of several literals, separated by BATCH_SEPARATOR
+BATCH_SEPARATOR = '|'
+
+_astral_pattern = re.compile('[\U00010000-\U0010FFFF]')
+
+
+def find_pattern(text: str, flags=QTextDocument.FindFlags(), mode: int = LITERAL) -> Union[Pattern, AhoCorasick]:
+    """
+    Compiles what to find, matching case as `QTextDocument.find` would with `flags`.
+
+    For literals, FindWholeWords is left to `find_spans`, as Qt's handling of it is more particular than a regex
+    lookaround.
+
+    :param text: The Find text.
+    :param flags: Any of FindCaseSensitively and FindWholeWords.
+    :param mode: LITERAL, REGEX or BATCH.
+    :return: A regex, or for BATCH, an automaton that searches like one.
+    :raises re.error: `text` isn't a valid regex, in REGEX mode.
+    """
+    case_sensitive = bool(flags & QTextDocument.FindCaseSensitively)
+    if mode == BATCH:
+        return AhoCorasick(text.split(BATCH_SEPARATOR), case_sensitive)
+    if mode == REGEX:
+        if flags & QTextDocument.FindWholeWords:
+            text = r'(?<![^\W_])(?:' + text + r')(?![^\W_])'
+        return re.compile(text, re.MULTILINE | (0 if case_sensitive else re.IGNORECASE))
+    return re.compile(re.escape(text), 0 if case_sensitive else re.IGNORECASE)
+
+
+def code_point_index(text: str, position: int) -> int:
+    """Converts a QTextDocument-style position, counting UTF-16 units, into an index into `text`."""
+    if text.isascii():
+        return position
+    return len(text.encode('utf-16-le')[:2 * position].decode('utf-16-le'))
+
+
+def _is_letter_or_number(char: str) -> bool:
+    return char.isalnum() and char <= '\uffff'  # Qt checks UTF-16 units, and surrogates are neither.
+
+
+def _whole_word_spans(pattern: Union[Pattern, AhoCorasick], text: str, start: int, end: int) -> List[Tuple[int, int]]:
+    spans = []
+    while True:
+        match = pattern.search(text, start, end)
+        if match is None:
+            return spans
+        match_start, match_end = match.span()
+        if ((match_start > 0 and _is_letter_or_number(text[match_start - 1]))
+                or (match_end < len(text) and _is_letter_or_number(text[match_end]))):
+            start = match_end + 1  # Qt resumes one past a match that isn't a whole word, so must we.
+        else:
+            spans.append((match_start, match_end))
+            start = match_end
+
+
+def find_spans(pattern: Union[Pattern, AhoCorasick], text: str, whole_words: bool = False, chunk_size: int = CHUNK_SIZE,
+               cancelled: Callable[[], bool] = lambda: False) -> Iterator[List[Tuple[int, int]]]:
+    """
+    Finds what successive calls to `QTextDocument.find` would, in a snapshot of the document's text, a chunk at a time.
+
+    Chunks end at line ends, which no match crosses, as `QTextDocument.find` searches line by line. Regex matches
+    that would cross one, or are empty, are left out.
+
+    :param pattern: From `find_pattern`.
+    :param text: The document's `toPlainText()`.
+    :param whole_words: As with the FindWholeWords flag: only matches with no letter or number right before or after.
+    :param chunk_size: Roughly how many characters to search per chunk.
+    :param cancelled: Checked before each chunk. Stops the search when it returns True.
+    :return: Per chunk, the (start, end) of its matches, as positions in the document.
+    """
+    # Python indexes by code point, QTextDocument by UTF-16 unit: each character past U+FFFF counts twice there.
+    astral = [m.start() for m in _astral_pattern.finditer(text)] if not text.isascii() else []
+    start = 0
+    while start <= len(text) and not cancelled():
+        end = text.find('\n', start + chunk_size)
+        end = len(text) if end == -1 else end
+        if whole_words:
+            spans = _whole_word_spans(pattern, text, start, end)
+        else:
+            spans = [m.span() for m in pattern.finditer(text, start, end)]
+        if not isinstance(pattern, AhoCorasick):
+            spans = [(s, e) for s, e in spans if s < e and text.find('\n', s, e) == -1]
+        if astral:
+            spans = [(s + bisect_left(astral, s), e + bisect_left(astral, e)) for s, e in spans]
+        yield spans
+        start = end + 1
+
+
+class BackgroundFind(QObject):
+    """
+    Finds matches in a snapshot of a document's text on a worker thread, reporting the running count as it goes.
+
+    The signals are queued to the receivers' (GUI) thread. `cancel` doesn't wait for the thread, so after it the chunk
+    in progress may still report, and some signals may already be queued: receivers should ignore a cancelled search's
+    signals, e.g. by checking it is still the search they want.
+    Left without a parent, the thread keeps it alive for as long as it runs, even if its owner goes away first.
+    """
+
+    progress = Signal(int)  # matches found so far
+    found = Signal(object)  # MatchIndex of all matches
+
+    def __init__(self, pattern: Union[Pattern, AhoCorasick], text: str, whole_words: bool = False):
+        """
+        :param pattern: From `find_pattern`.
+        :param text: The document's `toPlainText()`, taken on the GUI thread.
+        :param whole_words: As with the FindWholeWords flag.
+        """
+        super().__init__()
+        self.pattern = pattern
+        self.text = text
+        self.whole_words = whole_words
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def cancel(self):
+        """Stops the search after the chunk in progress, without waiting for it."""
+        self._cancelled.set()
+
+    def _run(self):
+        matches = MatchIndex()
+        for spans in find_spans(self.pattern, self.text, self.whole_words, cancelled=self._cancelled.is_set):
+            matches.extend(spans)
+            self.progress.emit(len(matches))
+        if not self._cancelled.is_set():
+            self.found.emit(matches)
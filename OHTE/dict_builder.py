@@ -0,0 +1,129 @@
+"""
+Builds the binary dictionary file from word lists, streaming them and normalizing words in a process pool.
+
+Usage:  python -m OHTE.dict_builder regex_map.bin -w common_words.txt -w COCA.txt -l /usr/share/dict/words [...]
+
+Word lists are given in order of priority (the first word mapped to a regex is its Entry's default). `-w` keeps all
+words of a list, `-l` only its all-lower-case words.
+"""
+import os
+import sys
+import locale
+import argparse
+import itertools
+from multiprocessing import Pool
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from OHTE.regex_map import words_to_lc_regexes
+from OHTE.dict_file import encode_entry, write_dict_records
+
+
+CHUNK_SIZE = 20000  # lines per job sent to the process pool
+
+
+def _read_chunks(src: List[str], keep_capitals: List[bool], chunk_size: int) -> Iterator[Tuple[List[str], bool, int]]:
+    """
+    Yields (lines, keep_capitals, bytes read so far) chunks of the source files, in order.
+
+    Lines are decoded as `open` would, with the locale's encoding, as word lists such as /usr/share/dict/words are in
+    it. Bytes that aren't valid in it become U+FFFD rather than stopping the build.
+    """
+    encoding = locale.getpreferredencoding(False)
+    bytes_read = 0
+    for file_name, keep_caps in zip(src, keep_capitals):
+        with open(file_name, 'rb') as f:
+            while True:
+                raw_lines = list(itertools.islice(f, chunk_size))
+                if not raw_lines:
+                    break
+                bytes_read += sum(map(len, raw_lines))
+                yield [line.decode(encoding, 'replace').rstrip() for line in raw_lines], keep_caps, bytes_read
+
+
+def _normalize_chunk(chunk: Tuple[List[str], bool, int]) -> Tuple[List[str], List[str], int]:
+    """Runs in a worker. Filters a chunk's words and maps them to their regexes."""
+    lines, keep_caps, bytes_read = chunk
+    words = [wd for wd in lines if wd] if keep_caps else [wd for wd in lines if wd.islower()]
+    return words, words_to_lc_regexes(words), bytes_read
+
+
+def build_dict_file(src: List[str], keep_capitals: List[bool], dest: str = 'regex_map.bin',
+                    processes: Optional[int] = None, chunk_size: int = CHUNK_SIZE,
+                    progress: Optional[Callable[[int, int], None]] = None) -> int:
+    """
+    Streaming, parallel `regex_map.create_regex_map`, writing a binary dictionary file.
+
+    Source files are read `chunk_size` lines at a time, so memory scales with the number of distinct words rather than
+    the size of the sources. Chunks are normalized by a pool of `processes` workers and merged back in source order,
+    which keeps the priority order of `src`. Entries are written out one by one as the file is built.
+
+    :param src: Word list files of "{word}\\n", in order of priority.
+    :param keep_capitals: Linked by index to `src`. Defaults to / padded with True. False keeps only lower case words.
+    :param dest: Output file name.
+    :param processes: Worker processes. Defaults to the number of CPUs. 1 normalizes in this process.
+    :param chunk_size: Lines per job.
+    :param progress: Called as `progress(bytes_read, total_bytes)` after each chunk is merged.
+    :return: Number of Entries written.
+    """
+    keep_capitals = list(keep_capitals) + [True] * (len(src) - len(keep_capitals))
+    total_bytes = sum(os.path.getsize(file_name) for file_name in src)
+
+    # {regex: {word: None}}, dicts being ordered sets here. Within each regex, words stay in first-seen order.
+    regex_words: Dict[str, Dict[str, None]] = {}
+    chunks = _read_chunks(src, keep_capitals, chunk_size)
+    pool = Pool(processes) if processes != 1 else None
+    try:
+        results = pool.imap(_normalize_chunk, chunks) if pool is not None else map(_normalize_chunk, chunks)
+        for words, regexes, bytes_read in results:
+            for word, regex in zip(words, regexes):
+                words_of_regex = regex_words.get(regex)
+                if words_of_regex is None:
+                    regex_words[regex] = {word: None}
+                else:
+                    words_of_regex.setdefault(word)
+            if progress is not None:
+                progress(bytes_read, total_bytes)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    def records() -> Iterator[Tuple[bytes, bytes]]:
+        for key in sorted(regex_words, key=lambda regex: regex.encode('utf-8')):
+            words = list(regex_words.pop(key))  # Free the words once written.
+            yield key.encode('utf-8'), encode_entry({'default': words[0], 'words': words})
+
+    count = len(regex_words)
+    write_dict_records(records(), count, dest)
+    return count
+
+
+def _print_progress(bytes_read: int, total_bytes: int):
+    print("\r{:5.1f}% of {:.1f} MB read".format(100 * bytes_read / max(total_bytes, 1), total_bytes / 1e6),
+          end='', file=sys.stderr, flush=True)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog='python -m OHTE.dict_builder', description=__doc__.strip().split('\n')[0])
+    parser.add_argument('dest', help="output dictionary file, e.g. regex_map.bin")
+    parser.add_argument('-w', '--words', dest='sources', action='append', type=lambda file_name: (file_name, True),
+                        metavar='FILE', help="word list, keeping all words")
+    parser.add_argument('-l', '--lower-words', dest='sources', action='append',
+                        type=lambda file_name: (file_name, False), metavar='FILE',
+                        help="word list, keeping only lower case words")
+    parser.add_argument('-j', '--processes', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('-q', '--quiet', action='store_true', help="don't report progress")
+    args = parser.parse_args(argv)
+    if not args.sources:
+        parser.error("no word lists given")
+
+    src = [file_name for file_name, _ in args.sources]
+    keep_capitals = [keep_caps for _, keep_caps in args.sources]
+    count = build_dict_file(src, keep_capitals, args.dest, processes=args.processes,
+                            progress=None if args.quiet else _print_progress)
+    if not args.quiet:
+        print("\nWrote {} entries to {}".format(count, args.dest), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,310 @@
+import os
+import sys
+import json
+import mmap
+import heapq
+import struct
+from bisect import bisect_right
+from array import array
+from collections.abc import MutableMapping
+from typing import Callable, Dict, List, Set, Iterable, Iterator, Mapping, Optional, Tuple
+
+from OHTE.key_index import KeyIndex
+
+
+# File layout (all integers little-endian):
+#   header: magic | version | reserved | entry count | index offset | pool offset
+#   index:  one uint32 per entry, the offset of its record within the pool. Sorted by the record's utf-8 key bytes.
+#   pool:   records of  key length (uint16) | key | entry length (uint32) | entry
+#           where an entry is utf-8 "default\nword\nword...".
+DICT_MAGIC = b'OHTEDICT'
+DICT_VERSION = 1
+
+_HEADER = struct.Struct('<8sHHIII')
+_OFFSET = struct.Struct('<I')
+_KEY_LEN = struct.Struct('<H')
+_ENTRY_LEN = struct.Struct('<I')
+
+
+def encode_entry(entry: dict) -> bytes:
+    """An Entry as stored in a dictionary file."""
+    return '\n'.join([entry['default']] + entry['words']).encode('utf-8')
+
+
+def _decode_entry(raw: bytes) -> dict:
+    default, *words = raw.decode('utf-8').split('\n')
+    return {'default': default, 'words': words}
+
+
+def write_dict_file(regex_map: Mapping[str, dict], dest: str):
+    """
+    Writes a regex map to `dest` in the binary dictionary format.
+
+    The file is written next to `dest` first and then moved over it, so a crash mid-write leaves the old file intact.
+
+    :param regex_map: {regex: Entry} mapping to write. Any Mapping works. A `MappedRegexMap` is streamed, with only
+                      the entries that changed encoded (see `MappedRegexMap.iter_records`). One mapped from `dest`
+                      itself is closed before the new file replaces `dest`, as Windows won't replace a mapped file, so
+                      it can't be used after.
+    :param dest: Output file name.
+    :return: None. Side effect: writes `dest`.
+    """
+    if isinstance(regex_map, MappedRegexMap):
+        mapped = os.path.exists(regex_map.file_name) and os.path.exists(dest) and \
+            os.path.samefile(regex_map.file_name, dest)
+        write_dict_records(regex_map.iter_records(), len(regex_map), dest, regex_map.close if mapped else None)
+        return
+    records = sorted((regex.encode('utf-8'), encode_entry(entry)) for regex, entry in regex_map.items())
+    write_dict_records(records, len(records), dest)
+
+
+def write_dict_records(records: Iterable[Tuple[bytes, bytes]], count: int, dest: str,
+                       before_replace: Optional[Callable[[], None]] = None):
+    """
+    Streams encoded records into a binary dictionary file, without holding the file's contents in memory.
+
+    :param records: (utf-8 key, encoded Entry) pairs, sorted by key. See `encode_entry`.
+    :param count: Number of records.
+    :param dest: Output file name. Written next to `dest` first, then moved over it.
+    :param before_replace: Called once the records are all written, before the new file is moved over `dest`.
+    :return: None. Side effect: writes `dest`.
+    """
+    index_offset = _HEADER.size
+    pool_offset = index_offset + _OFFSET.size * count
+    index = array('I')  # record offsets within the pool
+
+    tmp_dest = dest + '.tmp'
+    with open(tmp_dest, 'wb') as f:
+        f.write(_HEADER.pack(DICT_MAGIC, DICT_VERSION, 0, count, index_offset, pool_offset))
+        f.seek(pool_offset)
+        pool_len = 0
+        for key, entry in records:
+            index.append(pool_len)
+            record = _KEY_LEN.pack(len(key)) + key + _ENTRY_LEN.pack(len(entry)) + entry
+            f.write(record)
+            pool_len += len(record)
+        if len(index) != count:
+            raise ValueError("expected {} records, got {}".format(count, len(index)))
+
+        if sys.byteorder != 'little':
+            index.byteswap()
+        f.seek(index_offset)
+        f.write(index.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    if before_replace is not None:
+        before_replace()
+    os.replace(tmp_dest, dest)
+
+
+def convert_json_dict(json_src: str, dest: str):
+    """
+    One-time conversion of a dictionary saved in the old JSON format (e.g. a user's modified copy).
+
+    :param json_src: JSON regex map file, as previously written by `create_regex_map` or `main.save_dictionary`.
+    :param dest: Output file name for the binary dictionary.
+    :return: None. Side effect: writes `dest`. `json_src` is left as is.
+    """
+    with open(json_src) as f:
+        regex_map: dict = json.load(f)
+    write_dict_file(regex_map, dest)
+
+
+class MappedRegexMap(MutableMapping):
+    """
+    A {regex: Entry} dictionary backed by a memory-mapped binary dictionary file.
+
+    Lookups binary search the file's sorted key table, and an Entry is only decoded the first time it is looked up.
+    Decoded, added, replaced, and deleted entries are kept in memory on top of the file. Memory use therefore scales
+    with the entries actually touched, not with the size of the dictionary. The file itself is never modified; write
+    the map back out with `write_dict_file`.
+
+    `key_index` is a `KeyIndex` over the keys. It searches the file's sorted key table in place, decoding only the keys
+    it compares, with the keys added and deleted since the file was mapped kept on top.
+    """
+
+    def __init__(self, file_name: str):
+        """
+        Maps the file and validates its header.
+
+        :param file_name: A binary dictionary, as written by `write_dict_file`.
+        :raises ValueError: If the file isn't a dictionary file of a supported version.
+        """
+        with open(file_name, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)  # stays valid after the file is closed
+
+        if len(self._mm) < _HEADER.size:
+            raise ValueError("{} is not a dictionary file".format(file_name))
+        magic, version, _, count, index_offset, pool_offset = _HEADER.unpack_from(self._mm, 0)
+        if magic != DICT_MAGIC:
+            raise ValueError("{} is not a dictionary file".format(file_name))
+        if version != DICT_VERSION:
+            raise ValueError("{} has unsupported dictionary version {}".format(file_name, version))
+
+        self.file_name = file_name
+        self._count = count
+        self._index_offset = index_offset
+        self._pool_offset = pool_offset
+
+        self._entries: Dict[str, dict] = {}  # decoded or added entries, which take precedence over the file.
+        self._added: Set[str] = set()  # keys in `_entries` that are not in the file.
+        self._replaced: Set[str] = set()  # keys in the file whose entry in `_entries` was assigned, not decoded.
+        self._deleted: Set[str] = set()  # keys in the file that have been deleted.
+        self._key_table = _KeyTable(self)
+        self.key_index = KeyIndex(base=self._key_table)
+
+    def close(self):
+        """Unmaps the file, e.g. so that it can be replaced on Windows. The map can't be used after."""
+        self._mm.close()
+
+    def _record_offset(self, i: int) -> int:
+        return self._pool_offset + _OFFSET.unpack_from(self._mm, self._index_offset + 4 * i)[0]
+
+    def _key_at(self, offset: int) -> bytes:
+        key_len = _KEY_LEN.unpack_from(self._mm, offset)[0]
+        return self._mm[offset + 2:offset + 2 + key_len]
+
+    def _raw_entry_at(self, offset: int) -> bytes:
+        entry_offset = offset + 2 + _KEY_LEN.unpack_from(self._mm, offset)[0]
+        entry_len = _ENTRY_LEN.unpack_from(self._mm, entry_offset)[0]
+        return self._mm[entry_offset + 4:entry_offset + 4 + entry_len]
+
+    def _entry_at(self, offset: int) -> dict:
+        return _decode_entry(self._raw_entry_at(offset))
+
+    def _find(self, key: str) -> Optional[int]:
+        """Binary searches the key table. Returns the record offset of `key` in the file, if present."""
+        i = self._key_table.bisect_right(key) - 1
+        if i >= 0 and self._key_table[i] == key:
+            return self._record_offset(i)
+        return
+
+    def get(self, key: str, default=None):
+        entry = self._entries.get(key)
+        if entry is not None:
+            return entry
+        if key in self._deleted:
+            return default
+
+        offset = self._find(key)
+        if offset is None:
+            return default
+        entry = self._entry_at(offset)
+        self._entries[key] = entry
+        return entry
+
+    def __getitem__(self, key: str) -> dict:
+        entry = self.get(key)
+        if entry is None:
+            raise KeyError(key)
+        return entry
+
+    def __contains__(self, key) -> bool:
+        return self.get(key) is not None
+
+    def __setitem__(self, key: str, entry: dict):
+        if key not in self._entries:
+            if key in self._deleted:
+                self._deleted.remove(key)
+            elif self._find(key) is None:
+                self._added.add(key)
+            self.key_index.add(key)
+        if key not in self._added:
+            self._replaced.add(key)
+        self._entries[key] = entry
+
+    def __delitem__(self, key: str):
+        if key not in self:
+            raise KeyError(key)
+        del self._entries[key]
+        if key in self._added:
+            self._added.remove(key)
+        else:
+            self._deleted.add(key)
+            self._replaced.discard(key)
+        self.key_index.remove(key)
+
+    def __len__(self) -> int:
+        return self._count - len(self._deleted) + len(self._added)
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(self._count):
+            key = self._key_at(self._record_offset(i)).decode('utf-8')
+            if key not in self._deleted:
+                yield key
+        yield from list(self._added)
+
+    def iter_items(self) -> Iterator[Tuple[str, dict]]:
+        """Like `items`, but without caching every Entry of the file just to write them back out."""
+        for i in range(self._count):
+            offset = self._record_offset(i)
+            key = self._key_at(offset).decode('utf-8')
+            if key in self._deleted:
+                continue
+            entry = self._entries.get(key)
+            yield key, entry if entry is not None else self._entry_at(offset)
+        for key in list(self._added):
+            yield key, self._entries[key]
+
+    def iter_records(self) -> Iterator[Tuple[bytes, bytes]]:
+        """
+        The map's (utf-8 key, encoded Entry) records, sorted by key, as `write_dict_records` takes them.
+
+        The records of entries that were neither replaced nor added are copied from the file as they are, so writing
+        the map back out decodes and encodes only the entries that changed.
+        """
+        added = sorted((key.encode('utf-8'), encode_entry(self._entries[key])) for key in self._added)
+        return heapq.merge(self._file_records(), added)
+
+    def _file_records(self) -> Iterator[Tuple[bytes, bytes]]:
+        for i in range(self._count):
+            offset = self._record_offset(i)
+            key_bytes = self._key_at(offset)
+            key = key_bytes.decode('utf-8')
+            if key in self._deleted:
+                continue
+            if key in self._replaced:
+                yield key_bytes, encode_entry(self._entries[key])
+            else:
+                yield key_bytes, self._raw_entry_at(offset)
+
+
+_FENCE_STRIDE = 32  # keys per fence of a `_KeyTable`
+
+
+class _KeyTable(object):
+    """
+    The sorted keys of a `MappedRegexMap`'s file, as a sequence that decodes each key only when indexed.
+
+    Every `_FENCE_STRIDE`th key is decoded up front, as fences, so that `bisect_right` narrows down to one stretch of
+    keys between two fences in a plain list, then bisects just that stretch of the file.
+    """
+
+    __slots__ = ('_map', '_fences')
+
+    def __init__(self, regex_map: MappedRegexMap):
+        self._map = regex_map
+        self._fences: List[str] = [self[i] for i in range(0, regex_map._count, _FENCE_STRIDE)]
+
+    def __len__(self) -> int:
+        return self._map._count
+
+    def __getitem__(self, i: int) -> str:
+        regex_map = self._map
+        if not 0 <= i < regex_map._count:
+            raise IndexError(i)
+        mm = regex_map._mm  # `_key_at(_record_offset(i))`, inlined as bisection calls it in a loop
+        offset = regex_map._pool_offset + _OFFSET.unpack_from(mm, regex_map._index_offset + 4 * i)[0]
+        return mm[offset + 2:offset + 2 + (mm[offset] | mm[offset + 1] << 8)].decode('utf-8')
+
+    def bisect_right(self, key: str) -> int:
+        """As `bisect.bisect_right(self, key)`."""
+        fence = bisect_right(self._fences, key)
+        if fence == 0:
+            return 0
+        return bisect_right(self, key, (fence - 1) * _FENCE_STRIDE + 1, min(fence * _FENCE_STRIDE, self._map._count))
+
+
+def open_dict_file(file_name: str) -> MappedRegexMap:
+    """Opens a binary dictionary file for lazy lookups. See `MappedRegexMap`."""
+    return MappedRegexMap(file_name)
@@ -0,0 +1,167 @@
+import os
+import json
+import threading
+from typing import Dict, Optional, Callable
+
+from OHTE.regex_map import Entry, add_word_to_dict, del_word_from_dict, set_entry_default
+from OHTE.dict_file import open_dict_file, write_dict_file
+
+
+# Journal operations, and the regex_map functions that apply them.
+ADD = 'add'
+DELETE = 'del'
+SET_DEFAULT = 'default'
+
+_ops: Dict[str, Callable[[str, Dict[str, Entry]], bool]] = {
+    ADD: add_word_to_dict,
+    DELETE: del_word_from_dict,
+    SET_DEFAULT: set_entry_default,
+}
+
+
+def _replay_file(file_name: str, regex_map: Dict[str, Entry]) -> int:
+    """Applies the operations logged in `file_name` to `regex_map`. Returns how many were read."""
+    count = 0
+    try:
+        with open(file_name, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    op, word = json.loads(line)
+                except ValueError:  # Line cut short by a crash mid-write.
+                    continue
+                if op in _ops:
+                    _ops[op](word, regex_map)
+                    count += 1
+    except FileNotFoundError:
+        pass
+    return count
+
+
+class DictJournal(object):
+    """
+    Append-only journal of the changes a user makes to their dictionary.
+
+    Each add / delete / set-default is written (and synced to disk) as one JSON line at the moment it happens, so
+    saving costs O(changes) and survives crashes. On startup, `replay` re-applies the journal over the base dictionary
+    file. `compact` folds the journal into a new base dictionary file in a background thread.
+
+    While compacting, the journal being folded in is set aside as `<file_name>.old`, and new changes go to a fresh
+    journal. A base dictionary plus `.old` plus the journal, in that order, is always the complete dictionary. The new
+    base is written next to its destination, as `<dest>.compact`; `finish_compaction` moves it into place, on the GUI
+    thread, so that it never replaces a file the GUI has mapped behind its back. Where a mapped file can't be replaced
+    at all (Windows), that is left to `install_compaction` on the next launch, before the base is mapped.
+    """
+
+    def __init__(self, file_name: str):
+        """
+        :param file_name: Journal file. Created on the first recorded change.
+        """
+        self.file_name = file_name
+        self.old_file_name = file_name + '.old'
+        self.compaction_thread: Optional[threading.Thread] = None
+        self.compaction_dest = ''
+        self._file = None
+        self._count = 0  # entries in the journal file(s), as far as we know.
+
+    def record(self, op: str, word: str):
+        """
+        Appends a change to the journal, synced to disk before returning.
+
+        :param op: One of ADD, DELETE, SET_DEFAULT.
+        :param word: The word passed to the corresponding regex_map function.
+        :raises OSError: If the journal can't be written.
+        """
+        if self._file is None:
+            self._file = open(self.file_name, 'a', encoding='utf-8')
+        self._file.write(json.dumps([op, word]) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._count += 1
+
+    def replay(self, regex_map: Dict[str, Entry]) -> int:
+        """
+        Applies the journaled changes to `regex_map`, e.g. the base dictionary as loaded on startup.
+
+        :param regex_map: Dictionary to modify.
+        :return: Number of changes replayed.
+        """
+        self._count = _replay_file(self.old_file_name, regex_map) + _replay_file(self.file_name, regex_map)
+        return self._count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def compact(self, base_src: str, dest: str) -> Optional[threading.Thread]:
+        """
+        Writes `base_src` with the journal applied, for `dest`, in the background. Call `finish_compaction` once it is
+        done to put it in place.
+
+        :param base_src: The base dictionary file the journal applies to.
+        :param dest: Where to write the new base dictionary. May be `base_src`.
+        :return: The started compaction thread, or None if there was nothing to compact.
+        """
+        self.close()
+        if os.path.exists(self.file_name):
+            if os.path.exists(self.old_file_name):  # Left over from an interrupted compaction. Fold both in.
+                with open(self.old_file_name, 'a', encoding='utf-8') as old, \
+                        open(self.file_name, encoding='utf-8') as f:
+                    old.write(f.read())
+                    old.flush()
+                    os.fsync(old.fileno())
+                os.remove(self.file_name)
+            else:
+                os.replace(self.file_name, self.old_file_name)
+        elif not os.path.exists(self.old_file_name):
+            return
+
+        if os.path.exists(dest + '.compact'):  # Left over from an interrupted compaction, never finished.
+            os.remove(dest + '.compact')
+        self._count = 0
+        self.compaction_dest = dest
+        self.compaction_thread = threading.Thread(target=self._compact, args=(base_src, dest + '.compact'),
+                                                  daemon=True)
+        self.compaction_thread.start()
+        return self.compaction_thread
+
+    def _compact(self, base_src: str, dest: str):
+        # Works on its own copy of the base dictionary, so it never touches the one the GUI is using.
+        regex_map = open_dict_file(base_src)
+        _replay_file(self.old_file_name, regex_map)
+        write_dict_file(regex_map, dest)
+
+    def finish_compaction(self) -> str:
+        """
+        Waits for a compaction in progress, if any, then moves the new base dictionary into place and discards the
+        folded-in journal. Call on the GUI thread, then map the new base (see `DictionaryStore.remap`).
+
+        :return: The new base dictionary file, or '' if there was no compaction, or it failed or can't be put in place
+                 yet (see `install_compaction`).
+        """
+        if self.compaction_thread is None:
+            return ''
+        self.compaction_thread.join()
+        self.compaction_thread = None
+        dest, self.compaction_dest = self.compaction_dest, ''
+        return dest if self.install_compaction(dest) else ''
+
+    def install_compaction(self, dest: str) -> bool:
+        """
+        Moves the new base dictionary a finished compaction wrote for `dest` into place, and discards the journal folded
+        into it. On startup, call before mapping `dest`, for a compaction `finish_compaction` couldn't put in place.
+
+        :return: Whether it did. If there was none to, or `dest` can't be replaced (e.g. it's mapped, on Windows),
+                 everything is left as is: the old base, the journal set aside and the journal are still complete.
+        """
+        if not os.path.exists(dest + '.compact'):
+            return False
+        try:
+            os.replace(dest + '.compact', dest)
+        except OSError:
+            return False
+        os.remove(self.old_file_name)
+        return True
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
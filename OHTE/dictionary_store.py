@@ -0,0 +1,138 @@
+import weakref
+from collections.abc import Mapping
+from typing import Dict, Iterator, Optional, Set
+
+from PySide2.QtCore import QObject, Signal
+
+from OHTE.regex_map import Entry, invalidate_entry_views
+from OHTE.word_cache import WordCache
+
+
+class DictionarySnapshot(Mapping):
+    """
+    Read-only view of a `DictionaryStore` as it was when the snapshot was taken.
+
+    Taking one copies nothing. Instead, the store hands each live snapshot an Entry's old value just before it first
+    replaces or deletes it, so a snapshot costs memory only for the entries changed since. Entries are never modified
+    in place (see `regex_map.add_word_to_dict`), so the Entry objects themselves need no copying.
+
+    Like the store, it is for use on the GUI thread: the map underneath may cache entries as they are looked up.
+    """
+
+    def __init__(self, regex_map: Dict[str, Entry]):
+        self._map = regex_map
+        self._saved: Dict[str, Optional[Entry]] = {}  # {regex: Entry as of the snapshot, or None if there was none}
+
+    def get(self, key: str, default=None):
+        if key in self._saved:
+            entry = self._saved[key]
+            return default if entry is None else entry
+        return self._map.get(key, default)
+
+    def __getitem__(self, key: str) -> Entry:
+        entry = self.get(key)
+        if entry is None:
+            raise KeyError(key)
+        return entry
+
+    def __contains__(self, key) -> bool:
+        return self.get(key) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        saved = self._saved
+        for key in self._map:
+            if key not in saved:
+                yield key
+        yield from [key for key, entry in saved.items() if entry is not None]
+
+    def __len__(self) -> int:
+        return (len(self._map) - sum(1 for key in self._saved if key in self._map)
+                + sum(1 for entry in self._saved.values() if entry is not None))
+
+
+class DictionaryStore(QObject):
+    """
+    The user's dictionary, a {regex: Entry} map shared by all windows.
+
+    Windows look words up in the store as in any regex map, and the `regex_map.py` functions change it as they would
+    a dict: they only ever assign or delete whole entries. The store passes each change on to the map underneath and
+    - records the regex as dirty, until the change is saved (`mark_clean`);
+    - keeps each live `snapshot` as it was;
+    - emits `changed` with the regex, so that caches and indexes can drop or update just that key.
+
+    Its `word_cache` is one such cache, of the words typed in any window, and `regex_map`'s `EntryView`s another.
+
+    One store serves any number of windows: a change is applied once, whichever window makes it.
+    """
+
+    changed = Signal(str)  # regex whose Entry was added, replaced or deleted
+
+    def __init__(self, regex_map: Dict[str, Entry], parent: QObject = None):
+        """
+        :param regex_map: The dictionary as loaded, e.g. a `MappedRegexMap`. From now on, change it only through the
+                          store.
+        """
+        super().__init__(parent)
+        self.regex_map = regex_map
+        self.dirty: Set[str] = set()  # regexes changed since last saved
+        self._snapshots = weakref.WeakValueDictionary()  # {id: live DictionarySnapshot}
+        self.word_cache = WordCache(regex_map)
+        self.changed.connect(self.word_cache.invalidate)
+        self.changed.connect(invalidate_entry_views)
+
+    @property
+    def key_index(self):
+        """The map's `KeyIndex`, if it keeps one (see `regex_map._longest_key_prefix`)."""
+        return getattr(self.regex_map, 'key_index', None)
+
+    def get(self, key: str, default=None):
+        return self.regex_map.get(key, default)
+
+    def __getitem__(self, key: str) -> Entry:
+        return self.regex_map[key]
+
+    def __contains__(self, key) -> bool:
+        return key in self.regex_map
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.regex_map)
+
+    def __len__(self) -> int:
+        return len(self.regex_map)
+
+    def __setitem__(self, key: str, entry: Entry):
+        self._save_for_snapshots(key)
+        self.regex_map[key] = entry
+        self.dirty.add(key)
+        self.changed.emit(key)
+
+    def __delitem__(self, key: str):
+        self._save_for_snapshots(key)
+        del self.regex_map[key]
+        self.dirty.add(key)
+        self.changed.emit(key)
+
+    def _save_for_snapshots(self, key: str):
+        if not self._snapshots:
+            return
+        entry = self.regex_map.get(key)
+        for snapshot in list(self._snapshots.values()):
+            snapshot._saved.setdefault(key, entry)
+
+    def remap(self, regex_map: Dict[str, Entry]):
+        """
+        Switches to another map of the same dictionary, e.g. of a compacted dictionary file with the changes made since
+        replayed over it. Nothing changes as far as windows can tell. Snapshots taken before keep the old map.
+        """
+        self.regex_map = regex_map
+        self.word_cache.regex_map = regex_map
+
+    def snapshot(self) -> DictionarySnapshot:
+        """A read-only view of the dictionary as it is now, which later changes don't affect. O(1)."""
+        snapshot = DictionarySnapshot(self.regex_map)
+        self._snapshots[id(snapshot)] = snapshot
+        return snapshot
+
+    def mark_clean(self):
+        """Forgets the dirty regexes, once their changes are saved."""
+        self.dirty.clear()
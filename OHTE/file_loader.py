@@ -0,0 +1,75 @@
+from typing import Optional
+
+from PySide2.QtCore import QFile, QObject, QTextCodec, QTextDecoder, QTimer, Signal
+from PySide2.QtGui import QTextCursor, QTextDocument
+
+
+CHUNK_SIZE = 1 << 18  # bytes read per pass of the event loop
+
+
+class FileLoader(QObject):
+    """
+    Loads a text file into a document a chunk at a time, between passes of the event loop.
+
+    `setPlainText(stream.readAll())` blocks until the whole file is in, and holds the file's text several times over
+    meanwhile (the read string, its copy handed to Qt, the document). Here the first chunk, enough to fill a screen, is
+    appended right away and the rest from a zero-interval timer, so the window can be scrolled and read while a long
+    file comes in, and only a chunk of text is held besides the document.
+
+    Undo is off while loading, as with `setPlainText`, both so that the load isn't an undo step and so that the undo
+    stack doesn't keep a copy of every chunk.
+
+    Text is decoded as `QTextStream` would: UTF-8/16/32 if the file starts with a byte order mark, else in the
+    locale's encoding. The decoder carries a character split across chunks over to the next, which
+    `QTextStream.read` would break in two.
+    """
+
+    progress = Signal(int, int)  # bytes read, file size
+    finished = Signal()
+
+    def __init__(self, file: QFile, document: QTextDocument, chunk_size: int = CHUNK_SIZE, parent: QObject = None):
+        """
+        :param file: File opened for reading, as text. Closed once loaded or cancelled.
+        :param document: Document to append the file's text to, normally an empty one.
+        :param chunk_size: Bytes per chunk.
+        """
+        super().__init__(parent)
+        self.file = file
+        self.decoder: Optional[QTextDecoder] = None  # made from the first chunk, which may start with a BOM
+        self.document = document
+        self.chunk_size = chunk_size
+        self.cursor = QTextCursor(document)
+        self.loading = False
+        self.timer = QTimer(self, interval=0, timeout=self.load_chunk)
+
+    def start(self):
+        """Appends the first chunk, then schedules the rest. If that was the whole file, `finished` is emitted first."""
+        self.loading = True
+        self.document.setUndoRedoEnabled(False)
+        self.load_chunk()
+        if self.loading:
+            self.timer.start()
+
+    def cancel(self):
+        """Stops loading, leaving what was appended so far."""
+        if self.loading:
+            self.stop()
+
+    def load_chunk(self):
+        data = self.file.read(self.chunk_size)
+        if self.decoder is None:
+            self.decoder = QTextDecoder(QTextCodec.codecForUtfText(data, QTextCodec.codecForLocale()))
+        text = self.decoder.toUnicode(data)
+        if text:
+            self.cursor.movePosition(QTextCursor.End)
+            self.cursor.insertText(text)
+        self.progress.emit(self.file.pos(), self.file.size())
+        if self.file.atEnd():
+            self.stop()
+            self.finished.emit()
+
+    def stop(self):
+        self.timer.stop()
+        self.loading = False
+        self.file.close()
+        self.document.setUndoRedoEnabled(True)
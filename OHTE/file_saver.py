@@ -0,0 +1,59 @@
+import threading
+from typing import Optional
+
+from PySide2.QtCore import QFile, QObject, QSaveFile, QTextCodec, QTextEncoder, Signal
+
+
+CHUNK_SIZE = 1 << 20  # characters encoded and written at a time
+
+
+class FileSaver(QObject):
+    """
+    Saves a snapshot of a document's text to a file on a worker thread.
+
+    The text is encoded as `QTextStream` would (in the locale's encoding, without a byte order mark) and written a
+    chunk at a time to a `QSaveFile`, which on commit flushes the new file to disk and renames it over the old one. So
+    the file is either wholly the old one or wholly the new one, whenever the save is interrupted.
+
+    `finished` is queued to the receivers' (GUI) thread. As with `BackgroundFind`, the thread keeps it alive while it
+    runs.
+    """
+
+    finished = Signal()
+
+    def __init__(self, file_name: str, text: str, chunk_size: int = CHUNK_SIZE):
+        """
+        :param file_name: The file to save to.
+        :param text: The document's `toPlainText()`, taken on the GUI thread.
+        :param chunk_size: Characters per chunk.
+        """
+        super().__init__()
+        self.file_name = file_name
+        self.text = text
+        self.chunk_size = chunk_size
+        self.error: Optional[str] = None  # once finished, a message if the save failed, else ''
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def wait(self) -> str:
+        """Blocks until the save is done. :return: `error`."""
+        self._thread.join()
+        return self.error
+
+    def _run(self):
+        file = QSaveFile(self.file_name)
+        if not file.open(QFile.WriteOnly | QFile.Text):
+            self.error = "Cannot open file {}:\n{}.".format(self.file_name, file.errorString())
+        else:
+            encoder = QTextEncoder(QTextCodec.codecForLocale(), QTextCodec.IgnoreHeader)
+            for start in range(0, len(self.text), self.chunk_size):
+                if file.write(encoder.fromUnicode(self.text[start:start + self.chunk_size])) == -1:
+                    break  # QSaveFile keeps the error, and won't commit.
+            if not file.commit():
+                self.error = "Cannot write file {}:\n{}.".format(self.file_name, file.errorString())
+            else:
+                self.error = ''
+        self.text = ''
+        self.finished.emit()
@@ -0,0 +1,103 @@
+from bisect import bisect_left, bisect_right, insort
+from typing import Iterable, List, Optional, Sequence, Set
+
+
+def _common_prefix_len(a: str, b: str) -> int:
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def _has(keys: Sequence[str], key: str) -> bool:
+    i = bisect_left(keys, key)
+    return i < len(keys) and keys[i] == key
+
+
+def _bisect_base(base: Sequence[str], key: str) -> int:
+    bisect = getattr(base, 'bisect_right', None)
+    return bisect(key) if bisect is not None else bisect_right(base, key)
+
+
+def _has_base(base: Sequence[str], key: str) -> bool:
+    i = _bisect_base(base, key) - 1
+    return i >= 0 and base[i] == key
+
+
+class KeyIndex(object):
+    """
+    Sorted index over the keys of a regex map, for finding the longest key that is a prefix of a string.
+
+    A sorted list is the leaves of a trie in order: the keys under any trie node form one contiguous run. So instead of
+    a node per character, it is searched by bisection, and costs one reference per key, shared with the map's own keys
+    where possible.
+
+    The keys can also be a read-only, sorted `base` sequence that is only read by index, e.g. a dictionary file's key
+    table, which bisection then reads just the few keys it compares. Keys added and removed since are kept apart, in a
+    small sorted overlay and a set, so the base is never copied. A base with a `bisect_right(key)` method of its own
+    is bisected with that.
+    """
+
+    def __init__(self, keys: Iterable[str] = (), base: Sequence[str] = ()):
+        """
+        :param keys: Keys not in `base`, in any order (already sorted is fastest).
+        :param base: Sorted keys, e.g. from a dictionary file. Only its length, its items by index and its
+                     `bisect_right`, if any, are used.
+        """
+        self._base = base
+        self._added: List[str] = sorted(keys)  # keys not in `_base`
+        self._removed: Set[str] = set()  # keys of `_base` that are not keys any more
+
+    def __len__(self) -> int:
+        return len(self._base) - len(self._removed) + len(self._added)
+
+    def __contains__(self, key: str) -> bool:
+        return _has(self._added, key) or (key not in self._removed and _has_base(self._base, key))
+
+    def add(self, key: str):
+        """Adds `key`, if not already present."""
+        if key in self._removed:
+            self._removed.remove(key)
+        elif not _has(self._added, key) and not _has_base(self._base, key):
+            insort(self._added, key)
+
+    def remove(self, key: str):
+        """Removes `key`, if present."""
+        i = bisect_left(self._added, key)
+        if i < len(self._added) and self._added[i] == key:
+            del self._added[i]
+        elif _has_base(self._base, key):
+            self._removed.add(key)
+
+    def floor(self, s: str) -> Optional[str]:
+        """The greatest key <= `s`, if any."""
+        i = _bisect_base(self._base, s) - 1
+        while i >= 0 and self._removed and self._base[i] in self._removed:
+            i -= 1
+        j = bisect_right(self._added, s) - 1
+        candidates = ([self._base[i]] if i >= 0 else []) + ([self._added[j]] if j >= 0 else [])
+        return max(candidates) if candidates else None
+
+    def longest_prefix(self, s: str, min_len: int = 1) -> Optional[str]:
+        """
+        Finds the longest key that `s` starts with.
+
+        The greatest key <= `s` is either that prefix, or shares with `s` every character of it. So each step either
+        finds it, or cuts `s` down to the part it shares with that key and looks again. Usually one step suffices.
+
+        :param s: e.g. the regex of a word with punctuation after it.
+        :param min_len: Shortest key to accept.
+        :return: The key, or None if no key of at least `min_len` characters is a prefix of `s`.
+        """
+        end = len(s)
+        while end >= min_len:
+            prefix = s[:end]
+            key = self.floor(prefix)
+            if key is None:
+                return
+            if prefix.startswith(key):
+                return key if len(key) >= min_len else None
+            end = _common_prefix_len(key, prefix)
+
+        return
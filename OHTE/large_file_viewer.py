@@ -0,0 +1,361 @@
+import re
+import mmap
+import threading
+from array import array
+from bisect import bisect_right
+from itertools import accumulate, islice
+from typing import Callable, Dict, Iterator, Optional, Pattern, Tuple
+
+from PySide2.QtCore import QEvent, QFileInfo, QObject, Qt, Signal
+from PySide2.QtGui import QKeySequence, QTextCursor
+from PySide2.QtWidgets import (QCheckBox, QHBoxLayout, QLabel, QLineEdit, QPlainTextEdit, QPushButton, QScrollBar,
+                               QShortcut, QTextEdit, QVBoxLayout, QWidget)
+
+
+CHUNK_SIZE = 1 << 22  # bytes indexed / searched between checks for cancellation
+LINE_STRIDE = 64  # lines per checkpoint of a LineIndex
+MAX_LINE_LENGTH = 10000  # bytes shown of a line, the rest is cut off
+
+
+class LineIndex(object):
+    """
+    Where the lines of a file start, for going to a line without reading all those before it.
+
+    Only every `LINE_STRIDE`th line's start is kept (a checkpoint), which for a file of many short lines is a fraction
+    of the memory of keeping them all. Other lines are found by stepping from the checkpoint before them, which is at
+    most `LINE_STRIDE` - 1 finds of a newline. The start of each line after one of `MAX_LINE_LENGTH` bytes or more is
+    kept too, so that stepping never crosses such a line: a file of a few huge lines is never scanned end to end.
+
+    Lines are as a QPlainTextEdit would show them, so a file ending in a newline ends in an empty line.
+    """
+
+    def __init__(self):
+        self.checkpoints = array('q', [0])  # start of line 0, LINE_STRIDE, 2 * LINE_STRIDE, ...
+        self.line_count = 1  # indexed so far
+        self.starts_after_long_lines: Dict[int, int] = {}  # {line after one of MAX_LINE_LENGTH bytes or more: start}
+        self.complete = False
+
+    def build(self, data: bytes, chunk_size: int = CHUNK_SIZE, cancelled: Callable[[], bool] = lambda: False,
+              progress: Callable[[int], None] = lambda line_count: None):
+        """
+        Indexes `data` a chunk at a time. Safe to read from another thread meanwhile, up to `line_count`.
+
+        :param data: The file's bytes, e.g. an mmap.
+        :param chunk_size: Roughly how many bytes to index per chunk.
+        :param cancelled: Checked before each chunk. Stops indexing when it returns True.
+        :param progress: Called with the lines indexed so far after each chunk.
+        """
+        start = line_start = 0  # of the chunk, and of the line it starts in
+        while start < len(data) and not cancelled():
+            end = min(start + chunk_size, len(data))
+            last_newline = data.rfind(b'\n', start, end)
+            if last_newline == -1:  # in a line longer than a chunk
+                start = end
+                continue
+            lines = data[start:last_newline + 1].split(b'\n')
+            lines.pop()  # the empty string after the last newline
+            # Each line's length, plus its newline, summed up from `start` is where the next line starts.
+            line_starts = islice(accumulate(map((1).__add__, map(len, lines)), initial=start), 1, None)
+            self.checkpoints.extend(islice(line_starts, -self.line_count % LINE_STRIDE, None, LINE_STRIDE))
+            if start - line_start + len(lines[0]) >= MAX_LINE_LENGTH or max(map(len, lines)) >= MAX_LINE_LENGTH:
+                next_start = start
+                for n, line in enumerate(lines):
+                    next_start += len(line) + 1
+                    if len(line) + (start - line_start if n == 0 else 0) >= MAX_LINE_LENGTH:
+                        self.starts_after_long_lines[self.line_count + n] = next_start
+            self.line_count += len(lines)
+            start = line_start = last_newline + 1
+            progress(self.line_count)
+        self.complete = not cancelled()
+
+    def line_start(self, data: bytes, line: int) -> int:
+        """Offset of the start of `line`, which must be less than `line_count`."""
+        known = line - line % LINE_STRIDE
+        start = self.checkpoints[line // LINE_STRIDE]
+        if self.starts_after_long_lines:
+            for n in range(line, known, -1):
+                if n in self.starts_after_long_lines:
+                    known, start = n, self.starts_after_long_lines[n]
+                    break
+        for _ in range(line - known):
+            start = data.find(b'\n', start) + 1
+        return start
+
+    def line_at(self, data: bytes, offset: int) -> int:
+        """Number of the line `offset` is in, which must be indexed."""
+        i = bisect_right(self.checkpoints, offset) - 1
+        return i * LINE_STRIDE + data[self.checkpoints[i]:offset].count(b'\n')
+
+
+def _chunks(data: bytes, start: int, end: int, chunk_size: int, backward: bool) -> Iterator[Tuple[int, int]]:
+    """Splits [`start`, `end`) into ranges that end / start at newlines, in order or in reverse."""
+    if backward:
+        while end > start:
+            chunk_start = data.rfind(b'\n', start, max(end - chunk_size, start))
+            chunk_start = start if chunk_start == -1 else chunk_start
+            yield chunk_start, end
+            end = chunk_start
+    else:
+        while start < end:
+            chunk_end = data.find(b'\n', min(start + chunk_size, end), end)
+            chunk_end = end if chunk_end == -1 else chunk_end
+            yield start, chunk_end
+            start = chunk_end
+
+
+def find_in_mapped(data: bytes, pattern: Pattern, position: int, backward: bool = False, chunk_size: int = CHUNK_SIZE,
+                   cancelled: Callable[[], bool] = lambda: False) -> Optional[Tuple[int, int]]:
+    """
+    Finds the next (or previous) match of `pattern` from `position`, wrapping around, searching `data` in place.
+
+    Searching a chunk at a time, in chunks that end at newlines, finds the same as searching all at once for patterns
+    that don't match newlines, while letting a search of a huge file be cancelled.
+
+    :param data: The file's bytes, e.g. an mmap.
+    :param pattern: A bytes regex, not matching newlines.
+    :param position: Offset to search from: matches start at or after it, or for `backward`, end at or before it.
+    :param backward: Find the previous match rather than the next.
+    :param chunk_size: Roughly how many bytes to search per chunk.
+    :param cancelled: Checked before each chunk. Stops the search when it returns True.
+    :return: (start, end) offsets of the match, or None if there are none, or the search was cancelled.
+    """
+    if backward:
+        ranges = [(0, position), (position, len(data))]
+    else:
+        ranges = [(position, len(data)), (0, position)]
+    for start, end in ranges:
+        for chunk_start, chunk_end in _chunks(data, start, end, chunk_size, backward):
+            if cancelled():
+                return None
+            if backward:
+                match = None
+                for match in pattern.finditer(data, chunk_start, chunk_end):
+                    pass
+            else:
+                match = pattern.search(data, chunk_start, chunk_end)
+            if match is not None:
+                return match.span()
+    return None
+
+
+class _Task(QObject):
+    """
+    Runs `function(cancelled, progress)` on a worker thread, emitting its progress and its result.
+
+    As with `BackgroundFind`, the signals are queued to the receivers' thread, and after `cancel` neither is emitted.
+    """
+
+    progress = Signal(int)
+    done = Signal(object)
+
+    def __init__(self, function: Callable[[Callable[[], bool], Callable[[int], None]], object]):
+        super().__init__()
+        self.function = function
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def cancel(self):
+        self._cancelled.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def _run(self):
+        result = self.function(self._cancelled.is_set, self._report_progress)
+        if not self._cancelled.is_set():
+            self.done.emit(result)
+
+    def _report_progress(self, value: int):
+        if not self._cancelled.is_set():
+            self.progress.emit(value)
+
+
+class LargeFileViewer(QWidget):
+    """
+    Read-only window onto a file too large to load into a QPlainTextEdit.
+
+    The file is memory mapped, so only the pages looked at are read in, and lines are indexed (see `LineIndex`) on a
+    worker thread. The text edit holds just the lines in view, which the scroll bar, counting lines, chooses. Text is
+    decoded as UTF-8.
+
+    Find searches the mapped bytes on a worker thread, for the Find text as UTF-8. Not matching case only folds ASCII
+    letters, as with any bytes regex.
+    """
+
+    def __init__(self, file_name: str, parent: QWidget = None):
+        """
+        :param file_name: The file to view.
+        :raises OSError: The file can't be opened or mapped.
+        """
+        super().__init__(parent)
+        self.setAttribute(Qt.WA_DeleteOnClose)
+        self.cur_file = QFileInfo(file_name).canonicalFilePath()
+        with open(file_name, 'rb') as f:
+            # An empty file can't be mapped, but then there is nothing to map.
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if QFileInfo(file_name).size() else b''
+        self.line_index = LineIndex()
+        self.shown_lines = []  # (start offset, bytes shown) of each line in the text edit
+        self.match: Optional[Tuple[int, int]] = None
+        self.find_task: Optional[_Task] = None
+
+        self.setWindowTitle("{} (read-only)".format(QFileInfo(file_name).fileName()))
+        self.text_edit = QPlainTextEdit(readOnly=True, undoRedoEnabled=False, lineWrapMode=QPlainTextEdit.NoWrap,
+                                        verticalScrollBarPolicy=Qt.ScrollBarAlwaysOff)
+        self.text_edit.installEventFilter(self)
+        self.text_edit.viewport().installEventFilter(self)
+        self.scroll_bar = QScrollBar(Qt.Vertical)
+        self.scroll_bar.valueChanged.connect(self.show_lines)
+        self.find_line_edit = QLineEdit(placeholderText="Find", returnPressed=self.next)
+        self.match_case_check_box = QCheckBox("Match Case")
+        self.prev_button = QPushButton("Previous", clicked=self.prev, enabled=False)
+        self.next_button = QPushButton("Next", clicked=self.next, enabled=False)
+        self.status_label = QLabel("Indexing...")
+        QShortcut(QKeySequence.Find, self, activated=self.find_line_edit.setFocus)
+
+        find_layout = QHBoxLayout()
+        for widget in (self.find_line_edit, self.match_case_check_box, self.prev_button, self.next_button):
+            find_layout.addWidget(widget)
+        text_layout = QHBoxLayout(spacing=0)
+        text_layout.addWidget(self.text_edit)
+        text_layout.addWidget(self.scroll_bar)
+        layout = QVBoxLayout(self)
+        layout.addLayout(find_layout)
+        layout.addLayout(text_layout)
+        layout.addWidget(self.status_label)
+
+        self.index_task = _Task(lambda cancelled, progress: self.line_index.build(self.data, cancelled=cancelled,
+                                                                                  progress=progress))
+        self.index_task.progress.connect(self.handle_index_progress)
+        self.index_task.done.connect(self.handle_index_done)
+        self.index_task.start()
+        self.show_lines()
+
+    def visible_line_count(self) -> int:
+        return max(1, self.text_edit.viewport().height() // self.text_edit.fontMetrics().lineSpacing())
+
+    def update_scroll_bar(self):
+        visible = self.visible_line_count()
+        self.scroll_bar.setPageStep(visible)
+        self.scroll_bar.setMaximum(max(0, self.line_index.line_count - visible))
+
+    def show_lines(self):
+        """Puts the lines in view from the scroll bar's position into the text edit, and the current match's selection."""
+        top = self.scroll_bar.value()
+        count = min(self.visible_line_count(), self.line_index.line_count - top)
+        start = self.line_index.line_start(self.data, top)
+        self.shown_lines = []
+        texts = []
+        for n in range(count):
+            end = self.data.find(b'\n', start, start + MAX_LINE_LENGTH)
+            shown_end = min(start + MAX_LINE_LENGTH, len(self.data)) if end == -1 else end
+            self.shown_lines.append((start, shown_end - start))
+            texts.append(self.data[start:shown_end].decode('utf-8', 'replace'))
+            if end != -1:
+                start = end + 1
+            elif top + n + 1 < self.line_index.line_count:  # cut off: the index knows where the rest ends
+                start = self.line_index.line_start(self.data, top + n + 1)
+            else:  # the last line, or the last indexed yet
+                break
+        self.text_edit.setPlainText('\n'.join(texts))
+        self.select_match()
+
+    def select_match(self):
+        """Selects the current match in the text edit, if it's in view."""
+        self.text_edit.setExtraSelections([])
+        if self.match is None:
+            return
+        match_start, match_end = self.match
+        for n, (start, length) in enumerate(self.shown_lines):
+            if start <= match_start and match_end <= start + length:
+                break
+        else:
+            return
+
+        def document_position(offset: int) -> int:  # counting UTF-16 units
+            return len(self.data[start:offset].decode('utf-8', 'replace').encode('utf-16-le')) // 2
+
+        position = self.text_edit.document().findBlockByNumber(n).position()
+        cursor = QTextCursor(self.text_edit.document())
+        cursor.setPosition(position + document_position(match_start))
+        cursor.setPosition(position + document_position(match_end), QTextCursor.KeepAnchor)
+        self.text_edit.setTextCursor(cursor)
+        selection = QTextEdit.ExtraSelection()
+        selection.cursor = cursor
+        selection.format.setBackground(self.palette().highlight())
+        selection.format.setForeground(self.palette().highlightedText())
+        self.text_edit.setExtraSelections([selection])
+
+    def handle_index_progress(self, line_count: int):
+        self.update_scroll_bar()
+        self.status_label.setText("Indexing... {:,} lines".format(line_count))
+        if len(self.shown_lines) < min(self.visible_line_count(), line_count - self.scroll_bar.value()):
+            self.show_lines()  # There's more to see than was indexed when last shown.
+
+    def handle_index_done(self):
+        self.handle_index_progress(self.line_index.line_count)
+        self.status_label.setText("{:,} lines".format(self.line_index.line_count))
+        self.prev_button.setEnabled(True)
+        self.next_button.setEnabled(True)
+
+    def next(self):
+        position = self.match[1] if self.match else self.line_index.line_start(self.data, self.scroll_bar.value())
+        self.find(position, backward=False)
+
+    def prev(self):
+        position = self.match[0] if self.match else self.line_index.line_start(self.data, self.scroll_bar.value())
+        self.find(position, backward=True)
+
+    def find(self, position: int, backward: bool):
+        if not self.line_index.complete or not self.find_line_edit.text():
+            return
+        self.cancel_find()
+        flags = 0 if self.match_case_check_box.isChecked() else re.IGNORECASE
+        pattern = re.compile(re.escape(self.find_line_edit.text().encode('utf-8')), flags)
+        self.status_label.setText("Searching...")
+        self.find_task = _Task(lambda cancelled, progress: find_in_mapped(self.data, pattern, position, backward,
+                                                                          cancelled=cancelled))
+        self.find_task.done.connect(self.handle_found)
+        self.find_task.start()
+
+    def handle_found(self, match: Optional[Tuple[int, int]]):
+        self.find_task = None
+        if match is None:
+            self.status_label.setText("No matches found")
+            return
+        self.status_label.setText("{:,} lines".format(self.line_index.line_count))
+        self.match = match
+        line = self.line_index.line_at(self.data, match[0])
+        top = self.scroll_bar.value()
+        if not top <= line < top + self.visible_line_count():
+            self.scroll_bar.setValue(line - self.visible_line_count() // 3)
+        self.select_match()
+
+    def cancel_find(self):
+        if self.find_task is not None:
+            self.find_task.cancel()
+            self.find_task = None
+
+    def eventFilter(self, watched: QObject, event: QEvent) -> bool:
+        """Scrolls by the scroll bar, as the text edit only has the lines in view to scroll through."""
+        if event.type() == QEvent.Wheel:
+            self.scroll_bar.setValue(self.scroll_bar.value() - event.angleDelta().y() // 40)  # 3 lines per notch
+            return True
+        if event.type() == QEvent.KeyPress and event.key() in (Qt.Key_PageUp, Qt.Key_PageDown):
+            action = QScrollBar.SliderPageStepAdd if event.key() == Qt.Key_PageDown else QScrollBar.SliderPageStepSub
+            self.scroll_bar.triggerAction(action)
+            return True
+        return super().eventFilter(watched, event)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.update_scroll_bar()
+        self.show_lines()
+
+    def closeEvent(self, event):
+        self.cancel_find()
+        self.index_task.cancel()
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        super().closeEvent(event)
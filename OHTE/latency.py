@@ -0,0 +1,119 @@
+import json
+import math
+import time
+from array import array
+from typing import Dict, List
+
+
+# Stages timed, named after what they time. Each includes any stage it calls.
+KEY_PRESS = 'keyPressEvent'
+PROCESS_PREVIOUS_WORD = 'process_previous_word'
+MAP_STRING_TO_WORD = 'map_string_to_word'
+SETUP_WORDCHECK = 'setup_wordcheck_for_word_under_cursor'
+STAGES = (KEY_PRESS, PROCESS_PREVIOUS_WORD, MAP_STRING_TO_WORD, SETUP_WORDCHECK)
+
+CAPACITY = 4096  # latest samples kept per stage
+PERCENTILES = (50, 95, 99)
+
+
+class _Timer(object):
+    __slots__ = ('recorder', 'stage', 'start')
+
+    def __init__(self, recorder: 'LatencyRecorder', stage: str):
+        self.recorder = recorder
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.recorder.record(self.stage, time.perf_counter() - self.start)
+
+
+class _NoTimer(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_no_timer = _NoTimer()
+
+
+def percentile(sorted_samples: List[float], p: float) -> float:
+    """Nearest-rank percentile of non-empty, sorted samples."""
+    return sorted_samples[max(math.ceil(p / 100 * len(sorted_samples)) - 1, 0)]
+
+
+class LatencyRecorder(object):
+    """
+    Opt-in timings of the stages of handling a keystroke, for finding out where typing lags.
+
+    Off by default, when `time` costs a method call and nothing is recorded. When on, each stage keeps its latest
+    `capacity` durations in a ring buffer, so memory stays fixed however long the app runs, and the percentiles
+    describe recent typing rather than the whole session.
+    """
+
+    def __init__(self, capacity: int = CAPACITY):
+        self.enabled = False
+        self.capacity = capacity
+        self._samples: Dict[str, array] = {}  # {stage: durations in seconds}, a ring buffer once full
+        self._counts: Dict[str, int] = {}  # {stage: samples ever recorded}
+
+    def time(self, stage: str):
+        """
+        Context manager recording how long its block takes, if enabled.
+
+        :param stage: One of STAGES, or any name.
+        """
+        return _Timer(self, stage) if self.enabled else _no_timer
+
+    def record(self, stage: str, seconds: float):
+        samples = self._samples.get(stage)
+        if samples is None:
+            samples = self._samples[stage] = array('d')
+            self._counts[stage] = 0
+        count = self._counts[stage]
+        if count < self.capacity:
+            samples.append(seconds)
+        else:
+            samples[count % self.capacity] = seconds
+        self._counts[stage] = count + 1
+
+    def reset(self):
+        self._samples.clear()
+        self._counts.clear()
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Per stage recorded: 'count' of samples ever recorded, and the 'p50', 'p95', 'p99' and 'max' in ms of those
+        kept.
+        """
+        stats = {}
+        for stage, samples in self._samples.items():
+            ms = sorted(s * 1000 for s in samples)
+            stage_stats = {'count': self._counts[stage]}
+            for p in PERCENTILES:
+                stage_stats['p{}'.format(p)] = percentile(ms, p)
+            stage_stats['max'] = ms[-1]
+            stats[stage] = stage_stats
+        return stats
+
+    def export(self, file_name: str):
+        """
+        Writes the `stats`, and the samples kept (ms, oldest first), as JSON.
+
+        :raises OSError: If the file can't be written.
+        """
+        samples = {}
+        for stage, stage_samples in self._samples.items():
+            start = self._counts[stage] % self.capacity if self._counts[stage] > self.capacity else 0
+            samples[stage] = [s * 1000 for s in stage_samples[start:] + stage_samples[:start]]
+        with open(file_name, 'w') as f:
+            json.dump({'capacity': self.capacity, 'stats': self.stats(), 'samples_ms': samples}, f, indent=1)
+
+
+recorder = LatencyRecorder()  # shared by all text edits
@@ -0,0 +1,83 @@
+from PySide2.QtCore import Qt, QSettings
+from PySide2.QtWidgets import (QDialog, QCheckBox, QDialogButtonBox, QFileDialog, QMessageBox, QPushButton,
+                               QTableWidget, QTableWidgetItem, QVBoxLayout)
+
+from OHTE.latency import LatencyRecorder, STAGES, PERCENTILES
+
+
+class LatencyDialog(QDialog):
+    """
+    Shows the keystroke latency a `LatencyRecorder` measured, per stage, and exports it to JSON.
+
+    Recording is switched on and off here, and stays as set across launches (the 'record_latency' setting).
+    """
+
+    columns = ['Count'] + ['p{} (ms)'.format(p) for p in PERCENTILES] + ['Max (ms)']
+
+    def __init__(self, recorder: LatencyRecorder, parent=None):
+        """
+        :param recorder: The recorder to show, and switch on and off.
+        :param parent: QWidget parent
+        """
+        super().__init__(parent)
+        self.setWindowTitle("Keystroke Latency")
+        self.recorder = recorder
+
+        self.record_check_box = QCheckBox("Record keystroke latency")
+        self.record_check_box.setChecked(recorder.enabled)
+        self.record_check_box.toggled.connect(self.set_recording)
+
+        self.table = QTableWidget(len(STAGES), len(self.columns))
+        self.table.setHorizontalHeaderLabels(self.columns)
+        self.table.setVerticalHeaderLabels(list(STAGES))
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+
+        btn_box = QDialogButtonBox(QDialogButtonBox.Close)
+        self.refresh_btn: QPushButton = btn_box.addButton("Refresh", QDialogButtonBox.ActionRole)
+        self.reset_btn: QPushButton = btn_box.addButton("Reset", QDialogButtonBox.ResetRole)
+        self.export_btn: QPushButton = btn_box.addButton("Export...", QDialogButtonBox.ActionRole)
+        self.refresh_btn.clicked.connect(self.refresh)
+        self.reset_btn.clicked.connect(self.reset)
+        self.export_btn.clicked.connect(self.export)
+        btn_box.rejected.connect(self.reject)
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.record_check_box)
+        layout.addWidget(self.table)
+        layout.addWidget(btn_box)
+        self.setLayout(layout)
+
+        self.refresh()
+
+    def set_recording(self, checked: bool):
+        self.recorder.enabled = checked
+        QSettings('PMA', 'OneHandTextEdit').setValue('record_latency', checked)
+
+    def refresh(self):
+        """Fills the table in with the stats as they are now. Stages without samples are left blank."""
+        stats = self.recorder.stats()
+        for row, stage in enumerate(STAGES):
+            stage_stats = stats.get(stage)
+            for column, key in enumerate(['count'] + ['p{}'.format(p) for p in PERCENTILES] + ['max']):
+                if stage_stats is None:
+                    text = ''
+                elif key == 'count':
+                    text = '{:,}'.format(stage_stats[key])
+                else:
+                    text = '{:.2f}'.format(stage_stats[key])
+                item = QTableWidgetItem(text)
+                item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, column, item)
+
+    def reset(self):
+        self.recorder.reset()
+        self.refresh()
+
+    def export(self):
+        file_name, _ = QFileDialog.getSaveFileName(self, "Export Latency", 'latency.json', "JSON files (*.json)")
+        if not file_name:
+            return
+        try:
+            self.recorder.export(file_name)
+        except OSError as e:
+            QMessageBox.warning(self, "OneHandTextEdit", "Cannot write file {}:\n{}.".format(file_name, e.strerror))
@@ -1,28 +1,171 @@
 import sys
 import functools
-import json
-from typing import Dict
+from typing import Dict, List, Optional
 
-from PySide2.QtWidgets import QApplication
-from PySide2.QtCore import QStandardPaths, QDir
+from PySide2.QtWidgets import QApplication, QMessageBox
+from PySide2.QtCore import QStandardPaths, QDir, QFileInfo, QTimer
 
 from OHTE.main_window import MainWindow
 from OHTE.regex_map import Entry
+from OHTE.dict_file import open_dict_file, write_dict_file, convert_json_dict
+from OHTE.dict_journal import DictJournal
+from OHTE.dictionary_store import DictionaryStore
+from OHTE.autosave import find_journals, replay_journal, remove_journal
 
 
-def save_dictionary(file_name: str, dict_src: str, regex_map: Dict[str, Entry]):
-    """Saves the dictionary if user modified it. Connected to aboutToQuit signal."""
-    if MainWindow.dict_modified:
+DICT_FILE_NAME = 'regex_map.bin'
+LEGACY_DICT_FILE_NAME = 'regex_map.json'
+JOURNAL_FILE_NAME = 'regex_map.journal'
+COMPACT_AFTER = 200  # journaled changes
+COMPACTION_POLL_INTERVAL = 1000  # ms
+RECOVERY_DIR_NAME = 'recovery'
+
+
+def locate_dictionary(file_name: str, legacy_file_name: str) -> str:
+    """
+    Finds the dictionary to load: the user's saved copy if there is one, else the default.
+
+    A dictionary saved in the old JSON format is converted to the binary format once, next to the original, so that
+    users keep the words they added / deleted / set as default. Later launches find the converted file directly.
+
+    :param file_name: Bare file name of the binary dictionary.
+    :param legacy_file_name: Bare file name of the old JSON dictionary.
+    :return: Path of a binary dictionary file.
+    """
+    dict_src: str = QStandardPaths.locate(QStandardPaths.AppDataLocation, file_name)
+    if dict_src:
+        return dict_src
+
+    legacy_src: str = QStandardPaths.locate(QStandardPaths.AppDataLocation, legacy_file_name)
+    if legacy_src:
+        dict_src = QFileInfo(legacy_src).dir().filePath(file_name)
+        convert_json_dict(legacy_src, dict_src)
+        return dict_src
+
+    # TODO Change to app's packaged resource for deploy.
+    if not QFileInfo(file_name).exists() and QFileInfo(legacy_file_name).exists():
+        convert_json_dict(legacy_file_name, file_name)
+    return file_name
+
+
+def app_data_file_path(file_name: str) -> str:
+    """Path for `file_name` in the app data location, creating the location if needed. Empty string if impossible."""
+    app_data_loc: str = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)
+    if app_data_loc:  # Qt found a place we could save (may not exist)
+        dir_exists = QDir().mkpath(app_data_loc)
+        if dir_exists:  # Exists / created
+            abs_dir = QDir(app_data_loc)
+            return abs_dir.filePath(file_name)
+    return ''
+
+
+def save_dictionary(file_name: str, dict_src: str, dictionary: DictionaryStore):
+    """
+    Saves the dictionary if user modified it. Connected to aboutToQuit signal.
+    Only used if there is nowhere to keep a `DictJournal`, which otherwise saves changes as they are made.
+    Entries that didn't change are copied over from `dict_src` as they are (see `write_dict_file`). Saved over the file
+    it's mapped from, the dictionary lets go of it, so it can't be used after, which is fine on quitting.
+    """
+    if dictionary.dirty:
         if dict_src == file_name:  # TODO: change for deploy? check sig too
-            app_data_loc: str = QStandardPaths.writableLocation(QStandardPaths.AppDataLocation)
-            if app_data_loc:  # Qt found a place we could save (may not exist)
-                dir_exists = QDir().mkpath(app_data_loc)
-                if dir_exists:  # Exists / created
-                    abs_dir = QDir(app_data_loc)
-                    dict_src = abs_dir.filePath(file_name)
+            dict_src = app_data_file_path(file_name) or dict_src
+
+        write_dict_file(dictionary.regex_map, dict_src)
+        dictionary.mark_clean()
+
+
+def open_journal(regex_map: Dict[str, Entry], dict_src: str) -> Optional[DictJournal]:
+    """
+    Opens the user's dictionary journal and replays it over `regex_map`. Compacts it in the background if it's long;
+    see `finish_dict_compaction`.
+
+    :param regex_map: The base dictionary, as loaded from `dict_src`.
+    :param dict_src: The base dictionary's file.
+    :return: The journal, or None if there is no writable app data location to keep one in.
+    """
+    journal_src = app_data_file_path(JOURNAL_FILE_NAME)
+    if not journal_src:
+        return
+
+    journal = DictJournal(journal_src)
+    if journal.replay(regex_map) >= COMPACT_AFTER:
+        journal.compact(dict_src, app_data_file_path(DICT_FILE_NAME))
+    return journal
 
-        with open(dict_src, 'w') as f:
-            json.dump(regex_map, f)
+
+def install_dict_compaction():
+    """
+    Moves into place the base dictionary of a compaction that couldn't be while the old one was mapped, as on Windows
+    (see `DictJournal.install_compaction`). Call before locating the dictionary.
+    """
+    journal_src = app_data_file_path(JOURNAL_FILE_NAME)
+    if journal_src:
+        DictJournal(journal_src).install_compaction(app_data_file_path(DICT_FILE_NAME))
+
+
+def finish_dict_compaction(journal: DictJournal, dictionary: DictionaryStore) -> bool:
+    """
+    Once the journal's background compaction is done, moves the new base dictionary into place and remaps `dictionary`
+    onto it, with the changes made since replayed over it.
+
+    :return: False while the compaction is still running.
+    """
+    if journal.compaction_thread is not None and journal.compaction_thread.is_alive():
+        return False
+    dict_src = journal.finish_compaction()
+    if dict_src:
+        regex_map = open_dict_file(dict_src)
+        journal.replay(regex_map)
+        dictionary.remap(regex_map)
+    return True
+
+
+def watch_dict_compaction(journal: DictJournal, dictionary: DictionaryStore):
+    """Calls `finish_dict_compaction` every so often until it is done."""
+    timer = QTimer(QApplication.instance(), interval=COMPACTION_POLL_INTERVAL)
+
+    def poll():
+        if finish_dict_compaction(journal, dictionary):
+            timer.stop()
+            timer.deleteLater()
+
+    timer.timeout.connect(poll)
+    timer.start()
+
+
+def recovery_dir_path() -> str:
+    """The directory for documents' recovery journals, in the app data location, created if needed. Empty if none."""
+    recovery_dir = app_data_file_path(RECOVERY_DIR_NAME)
+    if recovery_dir and QDir().mkpath(recovery_dir):
+        return recovery_dir
+    return ''
+
+
+def recover_documents(dictionary: DictionaryStore, dict_src: str, dict_journal: Optional[DictJournal],
+                      recovery_dir: str) -> List[MainWindow]:
+    """
+    Offers to recover the unsaved changes of each window that wasn't closed, e.g. as the app crashed, from its
+    recovery journal. Journals are removed once recovered or declined.
+
+    :return: A window for each document recovered, not yet shown.
+    """
+    windows = []
+    for journal_name in find_journals(recovery_dir):
+        recovered = replay_journal(journal_name)
+        if recovered is not None:
+            file_name, text = recovered
+            name = QFileInfo(file_name).fileName() if file_name else "an untitled document"
+            ret = QMessageBox.question(None, "OneHandTextEdit",
+                                       "OneHandTextEdit quit with unsaved changes to {}.\n"
+                                       "Do you want to recover them?".format(name),
+                                       QMessageBox.Yes | QMessageBox.No)
+            if ret == QMessageBox.Yes:
+                window = MainWindow(dictionary, dict_src=dict_src, dict_journal=dict_journal,
+                                    recovery_dir=recovery_dir)
+                window.recover(file_name, text)
+                windows.append(window)
+        remove_journal(journal_name)
+    return windows
 
 
 def main():
@@ -31,20 +174,29 @@ def main():
     QApplication.setApplicationName("OneHandTextEdit")
     QApplication.setOrganizationName("PMA")
 
-    file_name = 'regex_map.json'
-    dict_src: str = QStandardPaths.locate(QStandardPaths.AppDataLocation, file_name)
-    if not dict_src:
-        dict_src = file_name  # TODO Change to app's packaged resource for deploy.
-    with open(dict_src) as f:
-        regex_map: dict = json.load(f)
+    install_dict_compaction()
+    dict_src = locate_dictionary(DICT_FILE_NAME, LEGACY_DICT_FILE_NAME)
+    regex_map = open_dict_file(dict_src)
+    dict_journal = open_journal(regex_map, dict_src)
+    dictionary = DictionaryStore(regex_map)  # Replayed changes are in the journal, so not dirty.
 
-    app.aboutToQuit.connect(functools.partial(save_dictionary, file_name, dict_src, regex_map))
+    if dict_journal is not None:
+        app.aboutToQuit.connect(dict_journal.close)
+        if dict_journal.compaction_thread is not None:
+            watch_dict_compaction(dict_journal, dictionary)
+    else:
+        app.aboutToQuit.connect(functools.partial(save_dictionary, DICT_FILE_NAME, dict_src, dictionary))
 
-    main_win = MainWindow(regex_map, dict_src=dict_src)
+    recovery_dir = recovery_dir_path()
+    recovered = recover_documents(dictionary, dict_src, dict_journal, recovery_dir) if recovery_dir else []
+    MainWindow.window_list.extend(recovered)
+    for window in recovered:
+        window.show()
+
+    main_win = MainWindow(dictionary, dict_src=dict_src, dict_journal=dict_journal, recovery_dir=recovery_dir)
     main_win.show()
     sys.exit(app.exec_())
 
 
 if __name__ == '__main__':
     main()
-
@@ -1,38 +1,60 @@
-import json
 import functools
-from typing import Callable, Union, List
+from typing import Callable, Dict, Union, List, Optional
 
-from PySide2.QtCore import QFile, QSaveFile, QFileInfo, QPoint, QSettings, QSize, Qt, QTextStream, QRegExp
+from PySide2.QtCore import QFile, QFileInfo, QPoint, QSettings, QSize, Qt, QRegExp
 from PySide2.QtGui import QKeySequence, QRegExpValidator, QTextCursor, QPixmap
 from PySide2.QtWidgets import (QAction, QApplication, QFileDialog, QMainWindow, QMessageBox, QDialog, QTextEdit,
-                               QDockWidget, QFontDialog, QLabel)
+                               QDockWidget, QFontDialog, QLabel, QProgressBar, QProgressDialog, QPushButton)
 from PySide2.QtPrintSupport import QPrinter, QPrintDialog, QPrintPreviewDialog
 
 from OHTE.textedit import MyPlainTextEdit
 from OHTE.validating_dialog import ValidatingDialog
 from OHTE.plaintext_find_replace_dialog import PlainTextFindReplaceDialog
-from OHTE.regex_map import add_word_to_dict, del_word_from_dict
+from OHTE.markdown_preview import MarkdownPreview
+from OHTE.file_loader import FileLoader
+from OHTE.file_saver import FileSaver
+from OHTE.autosave import Autosave
+from OHTE.large_file_viewer import LargeFileViewer
+from OHTE.latency_dialog import LatencyDialog
+from OHTE import latency
+from OHTE.regex_map import Entry, add_word_to_dict, del_word_from_dict
+from OHTE.dictionary_store import DictionaryStore
+from OHTE.dict_file import open_dict_file
+from OHTE.dict_journal import DictJournal, ADD, DELETE, SET_DEFAULT
 
 
 class MainWindow(QMainWindow):
     sequence_number = 1
     window_list = []
-    dict_modified = False
     max_recent_files = 5
+    large_file_size = 256 * 1024 * 1024  # bytes, from which opening offers the read-only LargeFileViewer
 
-    def __init__(self, regex_map, file_name='', dict_src='regex_map.json'):
+    def __init__(self, dictionary: Union[DictionaryStore, Dict[str, Entry]], file_name='', dict_src='regex_map.bin',
+                 dict_journal: Optional[DictJournal] = None, recovery_dir: str = ''):
+        """
+        :param dictionary: The store shared by all windows. A plain regex map is put in a store of its own.
+        """
         super().__init__()
 
         self.setAttribute(Qt.WA_DeleteOnClose)
         self.is_untitled = True
         self.cur_file = ''
         self.dict_src = dict_src
-        self.regex_map = regex_map
-        self.text_edit = MyPlainTextEdit(regex_map)
+        self.dictionary = dictionary if isinstance(dictionary, DictionaryStore) else DictionaryStore(dictionary)
+        self.dict_journal = dict_journal
+        self.recovery_dir = recovery_dir  # existing directory for recovery journals. No autosave if empty.
+        self.text_edit = MyPlainTextEdit(self.dictionary)
         self.mode_label = QLabel('Insert Mode')
         self.mode_label.setAlignment(Qt.AlignRight | Qt.AlignVCenter)  # Prevents minor shift on toggling.
         self.md_text_edit = QTextEdit()
         self.md_text_edit.setReadOnly(True)
+        self.file_loader: Optional[FileLoader] = None
+        self.file_saver: Optional[FileSaver] = None
+        self.saving_revision = 0  # the document's, when the save in progress took its snapshot
+        self.autosave = Autosave(self.text_edit.document(), recovery_dir, parent=self) if recovery_dir else None
+        self.md_preview = MarkdownPreview(self.text_edit.document(), self.md_text_edit.document(), parent=self)
+        self.md_preview.updated.connect(self.sync_md_cursor)
+        self.text_edit.cursorPositionChanged.connect(lambda: self.md_preview.live and self.sync_md_cursor())
         self.setCentralWidget(self.text_edit)
 
         self.create_actions()
@@ -53,9 +75,14 @@ class MainWindow(QMainWindow):
             self.load_file(file_name)
         else:
             self.set_current_file('')
+            self.restart_autosave()
 
     def closeEvent(self, event):
-        if self.maybe_save():
+        if self.maybe_save() and self.finish_saving():
+            if self.file_loader is not None:
+                self.file_loader.cancel()
+            if self.autosave is not None:
+                self.autosave.discard()
             self.write_settings()
             event.accept()
         else:
@@ -66,15 +93,30 @@ class MainWindow(QMainWindow):
 
     def update_markdown_viewer(self):
         """Updates contents and viewport of the dock widget."""
-        self.md_text_edit.document().setMarkdown(self.text_edit.document().toPlainText())
+        self.md_preview.update()
+        self.sync_md_cursor()
+
+    def sync_md_cursor(self):
+        """Moves the markdown viewer's cursor, and so its viewport, to what was rendered from the text cursor's line."""
+        cursor = self.text_edit.textCursor()
+        md_block = self.md_text_edit.document().findBlockByNumber(self.md_preview.preview_block(cursor.blockNumber()))
         md_cur = self.md_text_edit.textCursor()
-        md_cur.movePosition(QTextCursor.End)
-        # This strategy could be problematic for large documents, as the lengths diverge. Not especially testable.
-        md_cur.setPosition(min(md_cur.position(), self.text_edit.textCursor().position()))  # len(md) <= len(plaintext)
+        md_cur.setPosition(md_block.position() + min(cursor.positionInBlock(), md_block.length() - 1))
         self.md_text_edit.setTextCursor(md_cur)
 
+    def handle_md_dock_visibility_changed(self, visible: bool):
+        """Catches the preview up when shown (precluding slowdowns while hidden), and keeps it live if enabled."""
+        self.md_preview.live = visible and self.md_live_act.isChecked()
+        if visible:
+            self.update_markdown_viewer()
+
+    def set_md_live_preview(self, checked: bool):
+        self.md_preview.live = checked and self.md_dock.isVisible()
+        if self.md_preview.live:
+            self.md_preview.schedule_update()
+
     def new_file(self):
-        other = MainWindow(self.regex_map)
+        other = MainWindow(self.dictionary, dict_journal=self.dict_journal, recovery_dir=self.recovery_dir)
         MainWindow.window_list.append(other)
         other.move(self.x() + 40, self.y() + 40)
         other.show()
@@ -82,6 +124,7 @@ class MainWindow(QMainWindow):
     def open_file(self, file_name: str):
         """
         Handles opening a file: checking if already open, if we need a new MainWindow, or can safely overwrite.
+        Files of `large_file_size` or more can be opened read-only in a LargeFileViewer instead.
         :param file_name: A canonical (or absolute?) file path.
         :return:
         """
@@ -92,10 +135,23 @@ class MainWindow(QMainWindow):
             existing.activateWindow()
             return
 
+        size = QFileInfo(file_name).size()
+        if size >= MainWindow.large_file_size:
+            ret = QMessageBox.question(self, "OneHandTextEdit",
+                                       "{} is {:,} MB.\nOpen it read-only in the large file viewer?".format(
+                                           QFileInfo(file_name).fileName(), size // (1024 * 1024)),
+                                       QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel)
+            if ret == QMessageBox.Cancel:
+                return
+            elif ret == QMessageBox.Yes:
+                self.open_large_file_viewer(file_name)
+                return
+
         if self.is_untitled and self.text_edit.document().isEmpty() and not self.isWindowModified():
             self.load_file(file_name)
         else:
-            other = MainWindow(self.regex_map, file_name)
+            other = MainWindow(self.dictionary, file_name, dict_journal=self.dict_journal,
+                               recovery_dir=self.recovery_dir)
             if other.is_untitled:  # impossible?
                 del other
                 return
@@ -104,6 +160,19 @@ class MainWindow(QMainWindow):
             other.move(self.x() + 40, self.y() + 40)
             other.show()
 
+    def open_large_file_viewer(self, file_name: str):
+        """Opens a file read-only in a LargeFileViewer window, which memory maps it rather than loading it."""
+        try:
+            viewer = LargeFileViewer(file_name)
+        except OSError as e:
+            QMessageBox.warning(self, "OneHandTextEdit", "Cannot read file {}:\n{}.".format(file_name, e.strerror))
+            return
+
+        MainWindow.window_list.append(viewer)
+        viewer.resize(self.size())
+        viewer.move(self.x() + 40, self.y() + 40)
+        viewer.show()
+
     def open_recent(self):
         """Only use as slot for QAction with data() set to a canonical (or absolute?) file name."""
         # ref: https://stackoverflow.com/questions/21974449/extract-menu-action-data-in-receiving-function-or-slot
@@ -270,6 +339,14 @@ class MainWindow(QMainWindow):
         self.find_and_replace_act = QAction("Find and Replace...", self, triggered=self.show_find_and_replace_dialog)
         self.find_and_replace_act.setShortcuts([QKeySequence.Find, QKeySequence(Qt.CTRL + Qt.SHIFT + Qt.Key_J)])
 
+        self.coerce_document_act = QAction("Coerce &Document", self,
+                                           statusTip="Coerce every word of the document, as if it were typed",
+                                           triggered=self.coerce_document)
+
+        self.coerce_selection_act = QAction("Coerce Se&lection", self, enabled=False,
+                                            statusTip="Coerce every word of the selection, as if it were typed",
+                                            triggered=self.coerce_selection)
+
         # About
         self.about_act = QAction("&About", self,
                                  statusTip="Show the application's About box",
@@ -279,6 +356,10 @@ class MainWindow(QMainWindow):
                                     statusTip="Show the Qt library's About box",
                                     triggered=QApplication.instance().aboutQt)
 
+        self.latency_act = QAction("Keystroke &Latency...", self,
+                                   statusTip="Record how long keystrokes take to handle, and show or export the stats",
+                                   triggered=self.show_latency_dialog)
+
         # View
         self.zoom_in_act = QAction("Zoom In", self,
                                    triggered=self.text_edit.zoomIn,
@@ -288,6 +369,11 @@ class MainWindow(QMainWindow):
                                     triggered=self.text_edit.zoomOut,
                                     shortcut=QKeySequence.ZoomOut)
 
+        self.md_live_act = QAction("Live Markdown Preview", self,
+                                   statusTip="Update the Markdown Viewer as you type",
+                                   checkable=True, checked=True)
+        self.md_live_act.toggled.connect(self.set_md_live_preview)
+
         # Format
         self.md_font_act = QAction("Markdown Font...", self, triggered=self.set_markdown_font)
 
@@ -309,6 +395,7 @@ class MainWindow(QMainWindow):
         # Connections
         self.text_edit.copyAvailable.connect(self.cut_act.setEnabled)
         self.text_edit.copyAvailable.connect(self.copy_act.setEnabled)
+        self.text_edit.copyAvailable.connect(self.coerce_selection_act.setEnabled)
         self.text_edit.undoAvailable.connect(self.undo_act.setEnabled)
         self.text_edit.redoAvailable.connect(self.redo_act.setEnabled)
 
@@ -349,6 +436,9 @@ class MainWindow(QMainWindow):
         self.edit_menu.addAction(self.select_all_act)
         self.edit_menu.addSeparator()
         self.edit_menu.addAction(self.find_and_replace_act)
+        self.edit_menu.addSeparator()
+        self.edit_menu.addAction(self.coerce_document_act)
+        self.edit_menu.addAction(self.coerce_selection_act)
 
         self.format_menu = self.menuBar().addMenu("For&mat")
         self.font_submenu = self.format_menu.addMenu("&Font")
@@ -369,6 +459,8 @@ class MainWindow(QMainWindow):
         self.help_menu = self.menuBar().addMenu("&Help")
         self.help_menu.addAction(self.about_act)
         self.help_menu.addAction(self.about_Qt_act)
+        self.help_menu.addSeparator()
+        self.help_menu.addAction(self.latency_act)
 
     def create_dock_widget(self):
         """
@@ -377,17 +469,25 @@ class MainWindow(QMainWindow):
         """
         dock = QDockWidget("Markdown Viewer", self)
         dock.setWidget(self.md_text_edit)
-        dock.visibilityChanged.connect(lambda visible: visible and self.update_markdown_viewer())  # precludes slowdowns
+        dock.visibilityChanged.connect(self.handle_md_dock_visibility_changed)
+        self.md_dock = dock
         self.addDockWidget(Qt.BottomDockWidgetArea, dock)
         dock_act = dock.toggleViewAction()
         dock_act.setShortcuts([QKeySequence(Qt.CTRL + Qt.SHIFT + Qt.Key_M),
                                QKeySequence(Qt.CTRL + Qt.SHIFT + Qt.Key_C)])
         self.view_menu.addSeparator()  # Does nothing on Mac
         self.view_menu.addAction(dock_act)
+        self.view_menu.addAction(self.md_live_act)
         dock.close()
 
     def create_status_bar(self):
         self.statusBar().showMessage("Ready")
+        self.load_progress_bar = QProgressBar(maximumWidth=150)
+        self.load_cancel_button = QPushButton("Cancel", clicked=self.cancel_loading)
+        self.statusBar().addPermanentWidget(self.load_progress_bar)
+        self.statusBar().addPermanentWidget(self.load_cancel_button)
+        self.load_progress_bar.hide()
+        self.load_cancel_button.hide()
         self.statusBar().addPermanentWidget(self.mode_label)
 
     def read_settings(self):
@@ -396,6 +496,8 @@ class MainWindow(QMainWindow):
         size = settings.value('size', QSize(400, 400))
         md_font = settings.value('md_font', self.md_text_edit.document().defaultFont())
         self.md_text_edit.document().setDefaultFont(md_font)
+        self.md_live_act.setChecked(settings.value('md_live_preview', True, type=bool))
+        latency.recorder.enabled = settings.value('record_latency', False, type=bool)
         self.move(pos)
         self.resize(size)
 
@@ -404,6 +506,7 @@ class MainWindow(QMainWindow):
         settings.setValue('pos', self.pos())
         settings.setValue('size', self.size())
         settings.setValue('md_font', self.md_text_edit.document().defaultFont())
+        settings.setValue('md_live_preview', self.md_live_act.isChecked())
 
     def maybe_save(self):
         if self.text_edit.document().isModified():
@@ -413,56 +516,103 @@ class MainWindow(QMainWindow):
                     QMessageBox.Cancel)
 
             if ret == QMessageBox.Save:
-                return self.save()
+                return self.save(blocking=True)
             elif ret == QMessageBox.Cancel:
                 return False
 
         return True
 
-    def save(self):
+    def save(self, blocking=False):
         if self.is_untitled:
-            return self.save_as()
+            return self.save_as(blocking)
         else:
-            return self.save_file(self.cur_file)
+            return self.save_file(self.cur_file, blocking)
 
-    def save_as(self):
+    def save_as(self, blocking=False):
         file_name, _ = QFileDialog.getSaveFileName(self, "Save As", self.cur_file)
         if not file_name:
             return False
 
-        return self.save_file(file_name)
+        return self.save_file(file_name, blocking)
 
-    def save_file(self, file_name):
+    def save_file(self, file_name, blocking=False):
         """
+        Saves the document. Only the snapshot of its text is taken here; it's encoded and written on a worker thread
+        (see `FileSaver`), so typing carries on meanwhile. The file name and unmodified state are set once the file
+        is on disk, and the latter only if the document wasn't edited since the snapshot.
 
         :param file_name: A canonical file path or whatever QFileDialog.getSaveFileName returns.
-        :return: boolean for use in closeEvent method.
+        :param blocking: Wait for the save to finish, e.g. before closing.
+        :return: boolean for use in closeEvent method. Without `blocking`, True once the save has started.
         """
-        error = None
-
-        QApplication.setOverrideCursor(Qt.WaitCursor)
-        file = QSaveFile(file_name)
-        if file.open(QFile.WriteOnly | QFile.Text):
-            outstr = QTextStream(file)
-            outstr << self.text_edit.toPlainText()
-            if not file.commit():
-                error = "Cannot write file {}:\n{}.".format(file_name, file.errorString())
-        else:
-            error = "Cannot open file {}:\n{}.".format(file_name, file.errorString())
-        QApplication.restoreOverrideCursor()
+        self.finish_saving()  # Saves are written one at a time, in order.
+
+        self.file_saver = FileSaver(file_name, self.text_edit.toPlainText())
+        self.saving_revision = self.text_edit.document().revision()
+        saver = self.file_saver
+        saver.finished.connect(lambda: self.handle_save_finished(saver))
+        self.statusBar().showMessage("Saving...")
+        saver.start()
+        if blocking:
+            return self.finish_saving()
+        return True
+
+    def finish_saving(self) -> bool:
+        """Waits for a save in progress, if any. :return: False if it failed."""
+        if self.file_saver is None:
+            return True
+        self.file_saver.wait()
+        return self.handle_save_finished(self.file_saver)
 
-        if error:
-            QMessageBox.warning(self, "OneHandTextEdit", error)
+    def handle_save_finished(self, saver: FileSaver) -> bool:
+        """
+        :param saver: The save that finished.
+        :return: Whether it succeeded.
+        """
+        if saver is not self.file_saver:  # already handled, on waiting for it
+            return not saver.error
+        self.file_saver = None
+
+        if saver.error:
+            QMessageBox.warning(self, "OneHandTextEdit", saver.error)
             return False
 
-        self.set_current_file(file_name)
+        edited = self.text_edit.document().revision() != self.saving_revision
+        self.set_current_file(saver.file_name)
+        if edited:
+            self.text_edit.document().setModified(True)
+            self.setWindowModified(True)
+        self.restart_autosave()
         self.statusBar().showMessage("File saved", 2000)
         return True
 
+    def restart_autosave(self):
+        """Starts the recovery journal over, from the file as saved or, if there are unsaved changes, the text."""
+        if self.autosave is not None:
+            self.autosave.restart('' if self.is_untitled else self.cur_file)
+
+    def recover(self, file_name: str, text: str):
+        """
+        Puts text recovered from a recovery journal in the window, as unsaved changes to `file_name`.
+
+        :param file_name: The file the text was being edited from, or '' if untitled or it's gone.
+        :param text: The recovered text.
+        """
+        self.text_edit.setPlainText(text)
+        self.set_current_file(file_name if QFileInfo(file_name).exists() else '')
+        self.text_edit.document().setModified(True)
+        self.setWindowModified(True)
+        self.restart_autosave()
+        if self.autosave is not None:
+            self.autosave.finish_compaction()  # Journaled anew, so the journal recovered from can go.
+
     def load_file(self, file_name):
         """
         Load file into current instance.
 
+        The file is read in chunks as the event loop runs (see `FileLoader`), with progress and a Cancel button in the
+        status bar. Until it's all in, the text is read-only and can't be saved. Small files are in on return.
+
         :param file_name: whatever QFileDialog.getOpenFileName returns (abs or canonical path?), or canonical
         :return:
         """
@@ -472,14 +622,52 @@ class MainWindow(QMainWindow):
                                 "Cannot read file {}:\n{}.".format(file_name, file.errorString()))
             return
 
-        instr = QTextStream(file)
-        QApplication.setOverrideCursor(Qt.WaitCursor)
-        self.text_edit.setPlainText(instr.readAll())
-        QApplication.restoreOverrideCursor()
-
+        if self.autosave is not None:
+            self.autosave.pause()
+        self.text_edit.clear()
         self.set_current_file(file_name)
+        self.text_edit.setReadOnly(True)
+        self.save_act.setEnabled(False)
+        self.save_as_act.setEnabled(False)
+        self.statusBar().showMessage("Loading...")
+
+        self.file_loader = FileLoader(file, self.text_edit.document(), parent=self)
+        self.file_loader.progress.connect(self.handle_load_progress)
+        self.file_loader.finished.connect(self.handle_load_finished)
+        self.file_loader.start()
+        if self.file_loader is not None:  # more to come
+            self.load_progress_bar.show()
+            self.load_cancel_button.show()
+
+    def handle_load_progress(self, bytes_read: int, file_size: int):
+        self.load_progress_bar.setMaximum(file_size)  # 0 for unknown sizes, which shows a busy indicator.
+        self.load_progress_bar.setValue(min(bytes_read, file_size))
+        self.text_edit.document().setModified(False)
+        self.setWindowModified(False)
+
+    def handle_load_finished(self):
+        self.end_loading()
+        self.restart_autosave()
         self.statusBar().showMessage("File loaded", 2000)
 
+    def cancel_loading(self):
+        """Stops loading the file, leaving an empty untitled document, so that a partial file can't be saved over it."""
+        self.file_loader.cancel()
+        self.end_loading()
+        self.text_edit.clear()
+        self.set_current_file('')
+        self.restart_autosave()
+        self.statusBar().showMessage("Loading cancelled", 2000)
+
+    def end_loading(self):
+        self.file_loader.deleteLater()
+        self.file_loader = None
+        self.load_progress_bar.hide()
+        self.load_cancel_button.hide()
+        self.text_edit.setReadOnly(False)
+        self.save_act.setEnabled(True)
+        self.save_as_act.setEnabled(True)
+
     def set_current_file(self, file_name: str):
         """Sets cur_file to a canonical file path if file exists, otherwise a default placeholder bare file name.
            Updates window title and resets widget to unmodified.
@@ -545,7 +733,7 @@ class MainWindow(QMainWindow):
         canonical_file_path = QFileInfo(file_name).canonicalFilePath()
 
         for widget in QApplication.instance().topLevelWidgets():
-            if isinstance(widget, MainWindow) and widget.cur_file == canonical_file_path:
+            if isinstance(widget, (MainWindow, LargeFileViewer)) and widget.cur_file == canonical_file_path:
                 return widget
 
         return
@@ -565,8 +753,43 @@ class MainWindow(QMainWindow):
 
     def show_find_and_replace_dialog(self):
         find_replace_dialog = PlainTextFindReplaceDialog(self.text_edit, parent=self)
+        find_replace_dialog.setAttribute(Qt.WA_DeleteOnClose)  # A new one is made each time.
         find_replace_dialog.show()
 
+    def coerce_document(self):
+        self.coerce(0, self.text_edit.document().characterCount() - 1)
+
+    def coerce_selection(self):
+        cursor = self.text_edit.textCursor()
+        self.coerce(cursor.selectionStart(), cursor.selectionEnd())
+
+    def coerce(self, start: int, end: int):
+        """
+        Coerces the words between `start` and `end` as one undoable edit (see `MyPlainTextEdit.coerce`), showing its
+        progress if it takes a while.
+        """
+        if self.text_edit.isReadOnly():  # e.g. while a file loads
+            return
+
+        progress_dialog = QProgressDialog("Coercing...", "Cancel", 0, end - start, self)
+        progress_dialog.setWindowModality(Qt.WindowModal)
+        progress_dialog.setMinimumDuration(500)
+
+        def progress(done: int, total: int) -> bool:
+            progress_dialog.setValue(done)  # Processes events, being modal.
+            return not progress_dialog.wasCanceled()
+
+        count = self.text_edit.coerce(start, end, progress)
+        progress_dialog.reset()
+        if count is None:
+            self.statusBar().showMessage("Coercion cancelled", 2000)
+        else:
+            self.statusBar().showMessage("Coerced {} words".format(count), 2000)
+
+    def show_latency_dialog(self):
+        latency_dialog = LatencyDialog(latency.recorder, parent=self)
+        latency_dialog.show()
+
     def show_add_word_dialog(self):
         self.show_validating_dialog("Add word:", self.handle_add_word)
 
@@ -575,30 +798,45 @@ class MainWindow(QMainWindow):
 
     def handle_add_word(self, word: str):
         """
-        Adds word to dictionary and marks dictionary as modified.
+        Adds word to dictionary and journals the change.
         :param word: Word to add to dictionary.
         :return:
         """
-        added: bool = add_word_to_dict(word, self.regex_map)
+        added: bool = add_word_to_dict(word, self.dictionary)
         if added:
-            MainWindow.dict_modified = True
+            self.record_dict_change(ADD, word)
         else:
             QMessageBox.information(self, "One Hand Text Edit", "Word already in your dictionary")
 
     def handle_delete_word(self, word: str):
         """
-        Deletes word from dictionary and marks dictionary as modified.
+        Deletes word from dictionary and journals the change.
         :param word: Word to remove from dictionary.
         :return:
         """
-        deleted: bool = del_word_from_dict(word, self.regex_map)
+        deleted: bool = del_word_from_dict(word, self.dictionary)
         if deleted:
-            MainWindow.dict_modified = True
+            self.record_dict_change(DELETE, word)
         else:
             QMessageBox.information(self, "One Hand Text Edit", "Word not found in dictionary")
 
-    def handle_entry_default_set(self):
-        MainWindow.dict_modified = True
+    def handle_entry_default_set(self, word: str):
+        self.record_dict_change(SET_DEFAULT, word)
+
+    def record_dict_change(self, op: str, word: str):
+        """
+        Saves a dictionary change to the journal, if there is one.
+        :param op: Journal operation (see `dict_journal.py`).
+        :param word: Word the operation was performed with.
+        :return:
+        """
+        if self.dict_journal is None:
+            return
+
+        try:
+            self.dict_journal.record(op, word)
+        except OSError as e:
+            QMessageBox.warning(self, "OneHandTextEdit", "Cannot save dictionary change:\n{}.".format(e))
 
 
 if __name__ == '__main__':
@@ -607,10 +845,9 @@ if __name__ == '__main__':
 
     app = QApplication(sys.argv)
 
-    dict_src = 'regex_map.json'
-    with open(dict_src) as f:
-        regx_map: dict = json.load(f)
+    dict_src = 'regex_map.bin'
+    regx_map = open_dict_file(dict_src)
 
-    mainWin = MainWindow(regx_map, dict_src=dict_src)
+    mainWin = MainWindow(DictionaryStore(regx_map), dict_src=dict_src)
     mainWin.show()
     sys.exit(app.exec_())
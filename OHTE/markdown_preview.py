@@ -0,0 +1,241 @@
+import re
+from bisect import bisect_right
+from itertools import accumulate
+from typing import List, Optional, Tuple
+
+from PySide2.QtCore import QObject, QTimer, Signal
+from PySide2.QtGui import QTextDocument, QTextCursor, QTextBlockFormat, QTextCharFormat, QTextDocumentFragment
+
+
+# Rendered as a paragraph between segments, to tell which preview blocks came from which segment. Removed after.
+SEGMENT_SEPARATOR = '⁣OHTE⁣'
+
+_fence_pattern = re.compile(r' {0,3}(`{3,}|~{3,})')
+_list_item_pattern = re.compile(r' {0,3}([-+*]|\d{1,9}[.)])(\s|$)')
+_table_delimiter_pattern = re.compile(r'^ {0,3}\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?\s*$', re.M)
+_link_definition_pattern = re.compile(r'^ {0,3}\[[^\]]+\]:', re.M)
+
+
+def split_markdown(text: str) -> List[str]:
+    """
+    Splits markdown into top-level segments that render the same on their own as they do in the whole document.
+
+    A segment starts at an unindented line after a blank line, outside of fenced code, except that list items after
+    blank lines stay in the list they continue. Reference-style link definitions can be used from anywhere, so a
+    document with any is one segment.
+
+    :param text: Markdown source.
+    :return: The segments, each keeping its trailing newlines, so that `''.join(segments) == text`.
+    """
+    lines = text.split('\n')
+    if _link_definition_pattern.search(text):
+        starts = [0]
+    else:
+        starts = [0]
+        fence: Optional[str] = None
+        prev_blank = False
+        has_content = False  # in the current segment
+        is_list = False  # the current segment
+        for n, line in enumerate(lines):
+            if fence is not None:
+                stripped = line.strip()
+                if stripped.startswith(fence) and stripped == stripped[0] * len(stripped):
+                    fence = None
+                continue
+
+            if not line.strip():
+                prev_blank = True
+                continue
+
+            is_item = _list_item_pattern.match(line) is not None
+            if not has_content:
+                has_content = True
+                is_list = is_item
+            elif prev_blank and not line[0].isspace() and not (is_item and is_list):
+                starts.append(n)
+                is_list = is_item
+
+            fence_match = _fence_pattern.match(line)
+            if fence_match is not None:
+                fence = fence_match.group(1)
+            prev_blank = False
+
+    ends = starts[1:] + [len(lines)]
+    segments = ['\n'.join(lines[start:end]) + '\n' for start, end in zip(starts, ends)]
+    segments[-1] = segments[-1][:-1]
+    return segments
+
+
+def has_table(segment: str) -> bool:
+    return '|' in segment and _table_delimiter_pattern.search(segment) is not None
+
+
+def render_segments(segments: List[str]) -> Tuple[List[QTextDocumentFragment], List[int]]:
+    """
+    Renders markdown segments in one go, separately from one another.
+
+    :param segments: Markdown segments, from `split_markdown`.
+    :return: Per segment, its rendered blocks as a fragment starting with a block separator, and how many blocks.
+    """
+    doc = QTextDocument()
+    doc.setMarkdown('\n\n'.join([SEGMENT_SEPARATOR] + [part for seg in segments for part in (seg, SEGMENT_SEPARATOR)]))
+
+    fragments = []
+    counts = []
+    cursor = QTextCursor(doc)
+    block = doc.firstBlock()
+    start = block.position() + block.length() - 1
+    count = 0
+    prev = block
+    block = block.next()
+    while block.isValid():
+        if block.text() == SEGMENT_SEPARATOR:
+            cursor.setPosition(start)
+            cursor.setPosition(prev.position() + prev.length() - 1, QTextCursor.KeepAnchor)
+            fragments.append(cursor.selection())
+            counts.append(count)
+            start = block.position() + block.length() - 1
+            count = 0
+        else:
+            count += 1
+        prev = block
+        block = block.next()
+
+    return fragments, counts
+
+
+class MarkdownPreview(QObject):
+    """
+    Keeps a rendered markdown document in sync with a plain text markdown source, re-rendering only what changed.
+
+    The source is split into top-level segments (see `split_markdown`), and the preview is their rendered blocks in
+    order, plus one empty block at the end. On `update`, the segments that differ from last time are rendered and
+    patched into the preview in place of the old ones. Tables don't patch cleanly, so a change next to or in one
+    re-renders the whole document.
+
+    With `live` set, changes to the source schedule an `update` once typing pauses for `delay` ms.
+
+    Alongside, it keeps where each segment starts in both documents, so that `preview_block` can map a source block to
+    the preview block rendered from it by bisection rather than by guessing from character counts.
+    """
+
+    updated = Signal()
+
+    def __init__(self, source: QTextDocument, preview: QTextDocument, delay: int = 300, parent: QObject = None):
+        """
+        :param source: Document with the markdown as plain text.
+        :param preview: Document to render to. Its contents are replaced, and its undo/redo turned off, as nobody
+                        edits it.
+        :param delay: Debounce delay for live updates, in ms.
+        """
+        super().__init__(parent)
+        self.source = source
+        self.preview = preview
+        self.preview.setUndoRedoEnabled(False)  # Or each patch would be kept on its undo stack, forever.
+        self.live = False
+        self.segments: List[str] = []
+        self.block_counts: List[int] = []  # preview blocks per segment
+        self.block_starts: List[int] = [0]  # first preview block of each segment, plus the end
+        self.source_starts: List[int] = [0]  # first source block of each segment, plus the end
+        self.timer = QTimer(self, singleShot=True, interval=delay, timeout=self.update)
+        self.source.contentsChanged.connect(self.schedule_update)
+        self.clear()
+
+    def schedule_update(self):
+        if self.live:
+            self.timer.start()
+
+    def clear(self):
+        self.preview.clear()
+        self.segments = []
+        self.block_counts = []
+        self.block_starts = [0]
+        self.source_starts = [0]
+
+    def update(self):
+        """Renders the source's changes since the last update into the preview."""
+        self.timer.stop()
+        segments = split_markdown(self.source.toPlainText())
+        old = self.segments
+        if segments == old:
+            return
+
+        # Changed range: old[i:j] became segments[i:k]
+        i = 0
+        shortest = min(len(old), len(segments))
+        while i < shortest and old[i] == segments[i]:
+            i += 1
+        suffix = 0
+        while suffix < shortest - i and old[-1 - suffix] == segments[-1 - suffix]:
+            suffix += 1
+        j = len(old) - suffix
+        k = len(segments) - suffix
+
+        if j < len(old) and has_table(old[j]) or any(map(has_table, old[i:j])) or any(map(has_table, segments[i:k])):
+            self.clear()
+            i, j, k = 0, 0, len(segments)
+
+        self.replace_segments(i, j, segments[i:k])
+        self.updated.emit()
+
+    def replace_segments(self, i: int, j: int, segments: List[str]):
+        """Replaces the rendering of segments [i, j) with that of `segments`, laid out and repainted once."""
+        fragments, counts = render_segments(segments)
+        first = self.block_starts[i]
+        count = self.block_starts[j] - first
+
+        cursor = QTextCursor(self.preview)
+        cursor.beginEditBlock()
+        at_start = first == 0
+        if at_start:  # Fragments go after a block, so add one to start with and take it out after.
+            cursor.insertBlock()
+            first += 1
+
+        prev = self.preview.findBlockByNumber(first - 1)
+        if count:
+            last = self.preview.findBlockByNumber(first + count - 1)
+            cursor.setPosition(prev.position() + prev.length())
+            cursor.setPosition(last.position() + last.length(), QTextCursor.KeepAnchor)
+            cursor.removeSelectedText()
+
+        cursor.setPosition(prev.position() + prev.length() - 1)
+        for fragment in fragments:
+            cursor.insertFragment(fragment)
+
+        if at_start:
+            cursor.setPosition(0)
+            cursor.setPosition(1, QTextCursor.KeepAnchor)
+            cursor.removeSelectedText()
+
+        # The empty last block can pick up formats from its neighbours.
+        cursor.movePosition(QTextCursor.End)
+        if cursor.block().textList() is not None:
+            cursor.block().textList().remove(cursor.block())
+        cursor.setBlockFormat(QTextBlockFormat())
+        cursor.setBlockCharFormat(QTextCharFormat())
+        cursor.endEditBlock()
+
+        self.segments[i:j] = segments
+        self.block_counts[i:j] = counts
+        self.block_starts = [0] + list(accumulate(self.block_counts))
+        self.source_starts = [0] + list(accumulate(segment.count('\n') for segment in self.segments))
+
+    def preview_block(self, source_block: int) -> int:
+        """
+        Maps a source block number to the number of the preview block rendered from it, as of the last update.
+
+        The segment is found by bisection. Within it, lines map to blocks in proportion, which is exact for the common
+        one line per block (headings, list items, ...) and close for the rest, segments being short.
+
+        :param source_block: Block number in the source document.
+        :return: Block number in the preview document.
+        """
+        if not self.segments:
+            return 0
+        i = max(0, min(bisect_right(self.source_starts, source_block) - 1, len(self.segments) - 1))
+        count = self.block_counts[i]
+        if not count:
+            return min(self.block_starts[i], self.preview.blockCount() - 1)
+        lines = self.segments[i].rstrip('\n').count('\n') + 1  # not counting the blank lines after
+        offset = min(max(source_block - self.source_starts[i], 0), lines - 1)
+        return self.block_starts[i] + offset * count // lines
@@ -0,0 +1,125 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Iterable, Tuple
+
+
+class _Positions(object):
+    """Read-only sequence view of a MatchIndex's starts or ends, with the pending shift applied, for bisection."""
+
+    def __init__(self, index: 'MatchIndex', values: array):
+        self.index = index
+        self.values = values
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, i: int) -> int:
+        return self.values[i] + (self.index.gap_shift if i >= self.index.gap else 0)
+
+
+class MatchIndex(object):
+    """
+    Position-sorted spans of find matches, as two arrays of integers, searched by bisection.
+
+    Matches don't overlap, so sorting by start also sorts by end, and either array can be bisected. Holding integers
+    rather than a QTextCursor per match keeps a search for a common word cheap; cursors are made only for the matches
+    that need one.
+
+    Positions don't follow edits to the document by themselves, see `remove` and `replace`. An edit shifts every match
+    after it, so rather than rewriting them all, the shift is kept pending for the matches from index `gap` on, like
+    the gap of a gap buffer. Moving the gap to the next edit only touches the matches in between, which for nearby
+    edits (typing, stepping through replacements) is a few.
+    """
+
+    def __init__(self, spans: Iterable[Tuple[int, int]] = ()):
+        """
+        :param spans: (start, end) of each match, in document order.
+        """
+        self.starts = array('q')
+        self.ends = array('q')
+        self.gap = 0  # from this index on, stored positions are off by `gap_shift`
+        self.gap_shift = 0
+        self._start_positions = _Positions(self, self.starts)
+        self._end_positions = _Positions(self, self.ends)
+        self.extend(spans)
+
+    def extend(self, spans: Iterable[Tuple[int, int]]):
+        """Appends matches after the last one."""
+        for start, end in spans:
+            self.starts.append(start - self.gap_shift)
+            self.ends.append(end - self.gap_shift)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def span(self, i: int) -> Tuple[int, int]:
+        return self._start_positions[i], self._end_positions[i]
+
+    def index(self, start: int) -> int:
+        """
+        :param start: Start position of a match.
+        :return: Its index.
+        :raises ValueError: No match starts there.
+        """
+        i = bisect_left(self._start_positions, start)
+        if i == len(self.starts) or self._start_positions[i] != start:
+            raise ValueError("No match starts at {}".format(start))
+        return i
+
+    def next_index(self, position: int) -> int:
+        """Index of the first match ending after `position`, wrapping around to the first. -1 if there are none."""
+        if not self.starts:
+            return -1
+        i = bisect_right(self._end_positions, position)
+        return i if i < len(self.ends) else 0
+
+    def prev_index(self, position: int) -> int:
+        """Index of the last match ending before `position`, wrapping around to the last. -1 if there are none."""
+        i = bisect_left(self._end_positions, position) - 1
+        return i if i >= 0 else len(self.ends) - 1
+
+    def overlapping(self, start: int, end: int) -> range:
+        """Indices of the matches that overlap or touch [`start`, `end`]."""
+        return range(bisect_left(self._end_positions, start), bisect_right(self._start_positions, end))
+
+    def remove(self, i: int, shift: int = 0):
+        """
+        Removes match `i`, e.g. as it was replaced.
+
+        :param i: Index of the match.
+        :param shift: How far the text after it moved, i.e. len(replacement) - len(match). Added to later matches.
+        """
+        self._move_gap(i)
+        del self.starts[i]
+        del self.ends[i]
+        self.gap_shift += shift
+
+    def replace(self, start: int, end: int, spans: Iterable[Tuple[int, int]], shift: int):
+        """
+        Updates the matches for an edit: drops those starting in [`start`, `end`), which the edit may have broken, puts
+        `spans` in their place, and shifts the later ones.
+
+        :param start: Start of the region rescanned, in positions before and after the edit alike.
+        :param end: End of the region rescanned, in positions before the edit.
+        :param spans: The matches now in the region, in document order, in positions after the edit.
+        :param shift: Length the edit added less the length it removed.
+        """
+        i = bisect_left(self._start_positions, start)
+        j = bisect_left(self._start_positions, end, i)
+        self._move_gap(j)
+        self.gap_shift += shift
+        spans = list(spans)
+        self.starts[i:j] = array('q', [span[0] for span in spans])
+        self.ends[i:j] = array('q', [span[1] for span in spans])
+        self.gap = i + len(spans)
+
+    def _move_gap(self, i: int):
+        """Moves the gap to index `i`, applying or un-applying the pending shift to the matches in between."""
+        if self.gap_shift:
+            for j in range(self.gap, i):
+                self.starts[j] += self.gap_shift
+                self.ends[j] += self.gap_shift
+            for j in range(i, self.gap):
+                self.starts[j] -= self.gap_shift
+                self.ends[j] -= self.gap_shift
+        self.gap = i
@@ -1,24 +1,38 @@
+import re
 import sys
-from typing import List
+from typing import Callable, List, Optional, Union
 
 from PySide2.QtWidgets import (QDialog, QLabel, QLineEdit, QDialogButtonBox, QPushButton, QPlainTextEdit, QTextEdit,
                                QVBoxLayout, QHBoxLayout, QGridLayout, QCheckBox, QApplication)
 from PySide2.QtGui import QTextDocument, QTextCursor, QColor, QKeyEvent
-from PySide2.QtCore import Qt
+from PySide2.QtCore import Qt, QPoint, QTimer
+
+from OHTE.match_index import MatchIndex
+from OHTE.background_find import (BackgroundFind, find_pattern, find_spans, code_point_index, LITERAL, REGEX, BATCH,
+                                  BATCH_SEPARATOR)
+
+
+HIGHLIGHT_MARGIN = 100  # blocks above and below the viewport that get highlights, so short scrolls show them at once
+SEARCH_DELAY = 150  # ms the Find text and options must stay unchanged before they are searched for in the background
 
 
 class PlainTextFindReplaceDialog(QDialog):
     """
     Modeless, stay-above-parent dialog that supports find and replace.
 
-    Allows for searching case (in)sensitively, and whole-word.
+    Allows for searching case (in)sensitively, and whole-word. Besides literal text, finds regular expressions (with
+    group references in the replacement), or in batch mode any of several literals at once, each with its own
+    replacement.
     Find triggered by Enter / Shift+Enter, or corresponding button (Next / Previous), or if Replace clicked before
     Next / Previous.
-    Find wraps.
+    Find wraps. Matches are also counted as the user types, once typing pauses, on a worker thread, and ready for
+    Next / Previous.
+    Matches are kept as a `MatchIndex` of positions, with a QTextCursor made only for the current one.
     Highlights all matches, operating on the closest-to-user's-cursor selection first,
-    in the user-selected direction (Next / Previous).
-    Highlighting / found cursors retained on navigation back to text editor, and cleared on re-find/replace if
-    user modified the document.
+    in the user-selected direction (Next / Previous). Only matches in and around the viewport are highlighted at a time,
+    refreshed as it scrolls, so navigating costs the same however many matches there are.
+    Highlighting / found cursors retained on navigation back to text editor, and kept up to date as the user modifies
+    the document, by rescanning only the lines each edit touched.
     Presents an info label (e.g. "x of y", "No matches found", ...)
 
     While no members have a leading underscore, the only explicit public interface is the static method `find_all`.
@@ -37,8 +51,15 @@ class PlainTextFindReplaceDialog(QDialog):
         self.plain_text_edit = plain_text_edit
         self.cursors_needed = True
         self.find_flags = QTextDocument.FindFlags()
-        self.found_cursors: List[QTextCursor] = []
+        self.find_mode = LITERAL
+        self.pattern = None  # what `matches` were found with
+        self.matches = MatchIndex()
+        self.current_index = -1
         self.current_cursor = QTextCursor()
+        self.highlighting = False
+        self.background_find: Optional[BackgroundFind] = None
+        self.search_timer = QTimer(self, singleShot=True, interval=SEARCH_DELAY, timeout=self.search_in_background)
+        self.watching_document = False
 
         # UI
         layout = QVBoxLayout()
@@ -52,8 +73,17 @@ class PlainTextFindReplaceDialog(QDialog):
         options_layout = QHBoxLayout()
         self.match_case_check_box = QCheckBox("Match Case")
         self.whole_word_check_box = QCheckBox("Whole Word")
+        self.regex_check_box = QCheckBox("Regex")
+        self.regex_check_box.setToolTip("Find a regular expression, within lines.\n"
+                                        "Replace can refer to its groups as \\1 or \\g<name>.")
+        self.batch_check_box = QCheckBox("Batch")
+        self.batch_check_box.setToolTip("Find any of several terms, separated by {0}\n"
+                                        "Replace with one text for all, or one per term, also separated by {0}"
+                                        .format(BATCH_SEPARATOR))
         options_layout.addWidget(self.match_case_check_box)
         options_layout.addWidget(self.whole_word_check_box)
+        options_layout.addWidget(self.regex_check_box)
+        options_layout.addWidget(self.batch_check_box)
         options_layout.addStretch()
 
         self.found_info_label = QLabel()
@@ -94,9 +124,11 @@ class PlainTextFindReplaceDialog(QDialog):
         self.find_prev_btn.clicked.connect(self.prev)
         self.replace_btn.clicked.connect(self.replace)
         self.replace_all_btn.clicked.connect(self.replace_all)
-        self.plain_text_edit.document().contentsChanged.connect(self.set_cursors_needed_true)
         self.whole_word_check_box.stateChanged.connect(self.toggle_whole_word_flag)
         self.match_case_check_box.stateChanged.connect(self.toggle_match_case_flag)
+        self.regex_check_box.stateChanged.connect(self.toggle_regex_mode)
+        self.batch_check_box.stateChanged.connect(self.toggle_batch_mode)
+        self.set_watching_document(True)
 
     # SLOTS
     def next(self):
@@ -110,19 +142,14 @@ class PlainTextFindReplaceDialog(QDialog):
         if self.cursors_needed:
             self.init_find()
 
-        if not self.found_cursors:
+        if not self.matches:
             self.found_info_label.setText("No matches found")
             self.found_info_label.repaint()
             return
 
-        if self.current_cursor >= self.found_cursors[-1]:  # loop back to start. cursor equality based on position.
-            self.current_cursor = self.found_cursors[0]
-        else:
-            for cur in self.found_cursors:
-                if cur > self.current_cursor:  # next in order
-                    self.current_cursor = cur
-                    break
-
+        if self.current_index == -1:  # Start from the user's cursor.
+            self.current_cursor = self.plain_text_edit.textCursor()
+        self.set_current_index(self.matches.next_index(self.current_cursor.position()))  # loops back to start
         self.update_visuals()
 
     def prev(self):
@@ -136,19 +163,14 @@ class PlainTextFindReplaceDialog(QDialog):
         if self.cursors_needed:
             self.init_find()
 
-        if not self.found_cursors:
+        if not self.matches:
             self.found_info_label.setText("No matches found")
             self.found_info_label.repaint()
             return
 
-        if self.current_cursor <= self.found_cursors[0]:  # loop back to end.
-            self.current_cursor = self.found_cursors[-1]
-        else:
-            for cur in reversed(self.found_cursors):
-                if cur < self.current_cursor:  # prev in order
-                    self.current_cursor = cur
-                    break
-
+        if self.current_index == -1:  # Start from the user's cursor.
+            self.current_cursor = self.plain_text_edit.textCursor()
+        self.set_current_index(self.matches.prev_index(self.current_cursor.position()))  # loops back to end
         self.update_visuals()
 
     def replace(self):
@@ -159,32 +181,41 @@ class PlainTextFindReplaceDialog(QDialog):
         calls `next`.
         :return: Side effect: replaces word in text edit
         """
-        if self.cursors_needed:
+        if self.cursors_needed or self.current_index == -1:
             self.next()
             return
 
-        if not self.found_cursors:
+        if not self.check_batch_replacements():
             return
 
-        self.plain_text_edit.document().contentsChanged.disconnect(self.set_cursors_needed_true)  # don't dup work.
-        self.current_cursor.insertText(self.replace_line_edit.text())
-        self.plain_text_edit.document().contentsChanged.connect(self.set_cursors_needed_true)
-        self.found_cursors.remove(self.current_cursor)
+        start, end = self.matches.span(self.current_index)
+        replacement = self.replacement(start, end)
+        self.plain_text_edit.document().contentsChange.disconnect(self.handle_contents_change)  # don't dup work.
+        self.current_cursor.insertText(replacement)
+        self.plain_text_edit.document().contentsChange.connect(self.handle_contents_change)
+        self.matches.remove(self.current_index, len(replacement) - (end - start))
         self.next()
 
     def replace_all(self):
         """
-        Replaces all instances of Find's text with Replace's text.
+        Replaces all instances of Find's text with Replace's text, as one undo step.
 
         :return: Side effect: replaces words in text edit. Indicates success to user via info label on dialog.
         """
         if self.cursors_needed:
             self.init_find()
+        if not self.check_batch_replacements():
+            return
 
-        for cur in self.found_cursors:
-            cur.insertText(self.replace_line_edit.text())
+        replacement = self.replace_line_edit.text() if self.find_mode == LITERAL else self.replacement
+        self.plain_text_edit.document().contentsChange.disconnect(self.handle_contents_change)
+        count = self.replace_matches(self.plain_text_edit.document(), self.matches, replacement)
+        self.plain_text_edit.document().contentsChange.connect(self.handle_contents_change)
+        self.cursors_needed = True
+        self.highlighting = False
+        self.plain_text_edit.setExtraSelections([])
 
-        self.found_info_label.setText("Made {} replacements".format(len(self.found_cursors)))
+        self.found_info_label.setText("Made {} replacements".format(count))
         self.found_info_label.repaint()
 
     def handle_text_edited(self, text):
@@ -197,6 +228,7 @@ class PlainTextFindReplaceDialog(QDialog):
         self.found_info_label.clear()
 
         self.cursors_needed = True
+        self.schedule_search()
 
         find_enabled = text != ""
         self.find_next_btn.setEnabled(find_enabled)
@@ -207,8 +239,60 @@ class PlainTextFindReplaceDialog(QDialog):
         self.find_next_btn.setDefault(find_enabled)
         self.btn_box.button(QDialogButtonBox.Close).setDefault(not find_enabled)
 
-    def set_cursors_needed_true(self):
-        self.cursors_needed = True
+    def handle_contents_change(self, position: int, removed: int, added: int):
+        """
+        Updates the matches for an edit to the document, rescanning only the lines it touched.
+
+        Matches don't cross lines, so the ones in other lines can only have moved. The next Next / Previous starts from
+        the user's cursor, as after a fresh find.
+
+        :param position: Where the edit happened.
+        :param removed: Number of characters removed there.
+        :param added: Number of characters added there.
+        """
+        if self.background_find is not None:  # Its snapshot is stale, so let the next find start over.
+            self.cancel_background_find()
+            self.cursors_needed = True
+        if self.cursors_needed:
+            return
+
+        document = self.plain_text_edit.document()
+        first = document.findBlock(position)
+        last = document.findBlock(position + added)
+        if not last.isValid():
+            last = document.lastBlock()
+        lines = [first.text()]
+        block = first
+        while block != last:
+            block = block.next()
+            lines.append(block.text())
+        start = first.position()
+        end = last.position() + last.length() - 1
+
+        chunks = find_spans(self.pattern, '\n'.join(lines).replace('\xa0', ' '),
+                            bool(self.find_flags & QTextDocument.FindWholeWords))
+        spans = [(start + span_start, start + span_end) for chunk in chunks for span_start, span_end in chunk]
+        self.matches.replace(start, end - (added - removed), spans, added - removed)
+
+        self.current_index = -1
+        self.update_highlights()
+
+    def handle_background_find_progress(self, background_find: BackgroundFind, count: int):
+        if background_find is self.background_find:
+            self.found_info_label.setText("Searching... {} matches".format(count))
+
+    def handle_background_find_found(self, background_find: BackgroundFind, matches: MatchIndex):
+        """Takes the matches counted while typing for Next / Previous, unless something changed since."""
+        if background_find is not self.background_find:  # cancelled, but already queued
+            return
+        self.pattern = background_find.pattern
+        self.background_find = None
+        self.matches = matches
+        self.current_index = -1
+        self.cursors_needed = False
+        self.highlighting = False
+        self.plain_text_edit.setExtraSelections([])
+        self.found_info_label.setText("{} matches".format(len(matches)) if matches else "No matches found")
 
     def toggle_match_case_flag(self, state: int):
         self.found_info_label.clear()  # User will be performing a new search upon toggle, so want this reset.
@@ -218,6 +302,7 @@ class PlainTextFindReplaceDialog(QDialog):
             self.find_flags &= ~QTextDocument.FindCaseSensitively
         elif state == Qt.Checked:
             self.find_flags |= QTextDocument.FindCaseSensitively
+        self.schedule_search()
 
     def toggle_whole_word_flag(self, state: int):
         self.found_info_label.clear()  # User will be performing a new search upon toggle, so want this reset.
@@ -227,13 +312,106 @@ class PlainTextFindReplaceDialog(QDialog):
             self.find_flags &= ~QTextDocument.FindWholeWords
         elif state == Qt.Checked:
             self.find_flags |= QTextDocument.FindWholeWords
+        self.schedule_search()
+
+    def toggle_regex_mode(self, state: int):
+        self.set_find_mode(REGEX if state == Qt.Checked else LITERAL)
+
+    def toggle_batch_mode(self, state: int):
+        self.set_find_mode(BATCH if state == Qt.Checked else LITERAL)
     # END SLOTS
 
+    def set_find_mode(self, mode: int):
+        """Switches between LITERAL, REGEX and BATCH, keeping at most one of their check boxes checked."""
+        self.found_info_label.clear()  # User will be performing a new search upon toggle, so want this reset.
+        self.cursors_needed = True
+        self.find_mode = mode
+        for check_box, check_box_mode in [(self.regex_check_box, REGEX), (self.batch_check_box, BATCH)]:
+            check_box.blockSignals(True)
+            check_box.setChecked(mode == check_box_mode)
+            check_box.blockSignals(False)
+        self.schedule_search()
+
+    def compile_pattern(self):
+        """The pattern to find, or None if the Find text is not a valid regex, which the info label then says."""
+        try:
+            return find_pattern(self.find_line_edit.text(), self.find_flags, self.find_mode)
+        except re.error as e:
+            self.found_info_label.setText("Invalid regular expression: {}".format(e))
+            return None
+
+    def check_batch_replacements(self) -> bool:
+        """Whether the Replace text has one replacement, or one per term in batch mode. If not, says so."""
+        if self.find_mode != BATCH:
+            return True
+        count = len(self.replace_line_edit.text().split(BATCH_SEPARATOR))
+        if count in (1, len(self.find_line_edit.text().split(BATCH_SEPARATOR))):
+            return True
+        self.found_info_label.setText("Give one replacement, or one per term")
+        return False
+
+    def replacement(self, start: int, end: int) -> str:
+        """
+        The replacement for the match at [`start`, `end`): the Replace text, with a regex match's groups filled in, or
+        in batch mode, the one for the term matched.
+        """
+        text = self.replace_line_edit.text()
+        if self.find_mode == LITERAL or (self.find_mode == BATCH and BATCH_SEPARATOR not in text):
+            return text
+
+        block = self.plain_text_edit.document().findBlock(start)
+        line = block.text().replace('\xa0', ' ')
+        match_start = code_point_index(line, start - block.position())
+        if self.find_mode == REGEX:
+            match = self.pattern.match(line, match_start)
+            return match.expand(text) if match is not None else text
+        match_end = code_point_index(line, end - block.position())
+        return text.split(BATCH_SEPARATOR)[self.pattern.term_index(line[match_start:match_end])]
+
+    def schedule_search(self):
+        """
+        Drops any search in progress, and searches in the background once the Find text and options stay unchanged for
+        `SEARCH_DELAY` ms, so that fast typing doesn't snapshot the document on every keystroke. An invalid regex is
+        reported at once.
+        """
+        self.cancel_background_find()
+        if self.find_line_edit.text() and self.compile_pattern() is not None:
+            self.search_timer.start()
+
+    def search_in_background(self):
+        """Starts counting matches to the Find text on a worker thread, instead of any search in progress."""
+        self.cancel_background_find()
+        if not self.find_line_edit.text():
+            return
+        pattern = self.compile_pattern()
+        if pattern is None:
+            return
+        self.background_find = BackgroundFind(pattern, self.plain_text_edit.document().toPlainText(),
+                                              bool(self.find_flags & QTextDocument.FindWholeWords))
+        background_find = self.background_find
+        background_find.progress.connect(lambda count: self.handle_background_find_progress(background_find, count))
+        background_find.found.connect(lambda matches: self.handle_background_find_found(background_find, matches))
+        background_find.start()
+
+    def cancel_background_find(self):
+        """Drops the background search, scheduled or in progress. Doesn't wait for its thread."""
+        self.search_timer.stop()
+        if self.background_find is not None:
+            self.background_find.cancel()
+            self.background_find = None
+
     def init_find(self):
         """Sets up internal state for the case when cursors are needed (e.g. first find, user modifies doc...)"""
-        self.found_cursors = self.find_all(self.find_line_edit.text(), self.plain_text_edit.document(), self.find_flags)
+        self.cancel_background_find()
+        self.pattern = self.compile_pattern()
+        if self.pattern is None:
+            self.matches = MatchIndex()
+        else:
+            self.matches = self.find_matches(self.pattern, self.plain_text_edit.document(), self.find_flags)
+        self.current_index = -1
         self.cursors_needed = False
         self.current_cursor = self.plain_text_edit.textCursor()  # returns copy of
+        self.highlighting = False
         self.plain_text_edit.setExtraSelections([])
 
     def update_visuals(self):
@@ -242,8 +420,7 @@ class PlainTextFindReplaceDialog(QDialog):
         indicates index on dialog.
         """
         # x of y words indicator
-        idx = self.found_cursors.index(self.current_cursor) + 1
-        self.found_info_label.setText("{} of {} matches".format(idx, len(self.found_cursors)))
+        self.found_info_label.setText("{} of {} matches".format(self.current_index + 1, len(self.matches)))
         self.found_info_label.repaint()
 
         # move along text editor's viewport
@@ -251,20 +428,103 @@ class PlainTextFindReplaceDialog(QDialog):
         next_pte_cursor.clearSelection()
         self.plain_text_edit.setTextCursor(next_pte_cursor)
 
-        #highlighting
+        self.highlighting = True
+        self.update_highlights()
+
+    def update_highlights(self):
+        """Highlights the matches in the blocks in view, give or take `HIGHLIGHT_MARGIN`, and the current one."""
+        if not self.highlighting:
+            return
+
+        viewport = self.plain_text_edit.viewport()
+        document = self.plain_text_edit.document()
+        first_block = self.plain_text_edit.cursorForPosition(QPoint(0, 0)).blockNumber() - HIGHLIGHT_MARGIN
+        last_block = (self.plain_text_edit.cursorForPosition(QPoint(viewport.width(), viewport.height())).blockNumber()
+                      + HIGHLIGHT_MARGIN)
+        start = document.findBlockByNumber(max(first_block, 0)).position()
+        end_block = document.findBlockByNumber(min(last_block, document.blockCount() - 1))
+        end = end_block.position() + end_block.length() - 1
+
+        visible = self.matches.overlapping(start, end)
+        if self.current_index != -1 and self.current_index not in visible:
+            visible = sorted(list(visible) + [self.current_index])
+
         normal_color = QColor(Qt.yellow).lighter()
         current_color = QColor(Qt.magenta).lighter()
         extra_selections: List[QTextEdit.ExtraSelection] = []
-        for cur in self.found_cursors:
+        for i in visible:
             selection = QTextEdit.ExtraSelection()
-            selection.cursor = cur
-            if cur == self.current_cursor:
+            selection.cursor = self.current_cursor if i == self.current_index else self.match_cursor(i)
+            if i == self.current_index:
                 selection.format.setBackground(current_color)
             else:
                 selection.format.setBackground(normal_color)
             extra_selections.append(selection)
         self.plain_text_edit.setExtraSelections(extra_selections)
 
+    def set_current_index(self, i: int):
+        self.current_index = i
+        self.current_cursor = self.match_cursor(i)
+
+    def match_cursor(self, i: int) -> QTextCursor:
+        """A cursor selecting match `i`, as `find_all` would have returned it."""
+        start, end = self.matches.span(i)
+        cursor = QTextCursor(self.plain_text_edit.document())
+        cursor.setPosition(start)
+        cursor.setPosition(end, QTextCursor.KeepAnchor)
+        return cursor
+
+    @staticmethod
+    def replace_matches(document: QTextDocument, matches: MatchIndex,
+                        replacement: Union[str, Callable[[int, int], str]]) -> int:
+        """
+        Replaces every match in `document` with `replacement`, in one edit block.
+
+        `replacement` can also be a function of a match's (start, end), giving its replacement. It is called for every
+        match before any is replaced, so that it reads the text as it was matched, not as replaced after it.
+
+        Going from last to first, no edit moves a match yet to be replaced, so one cursor does for all of them. Within
+        the edit block, layout and `contentsChanged` happen once at the end, and it is undone as one step.
+
+        :return: Number of replacements made.
+        """
+        spans = [matches.span(i) for i in range(len(matches))]
+        if isinstance(replacement, str):
+            replacements = [replacement] * len(spans)
+        else:
+            replacements = [replacement(start, end) for start, end in spans]
+
+        cursor = QTextCursor(document)
+        cursor.beginEditBlock()
+        for (start, end), text in zip(reversed(spans), reversed(replacements)):
+            cursor.setPosition(start)
+            cursor.setPosition(end, QTextCursor.KeepAnchor)
+            cursor.insertText(text)
+        cursor.endEditBlock()
+        return len(matches)
+
+    @staticmethod
+    def find_matches(pattern, document: QTextDocument, flags=QTextDocument.FindFlags()) -> MatchIndex:
+        """
+        Like `find_all`, but returns the matches' positions rather than a cursor for each.
+
+        :param pattern: What to find, from `background_find.find_pattern`.
+        """
+        matches = MatchIndex()
+        for spans in find_spans(pattern, document.toPlainText(), bool(flags & QTextDocument.FindWholeWords)):
+            matches.extend(spans)
+        return matches
+
+    @staticmethod
+    def iter_find(text: str, document: QTextDocument, flags=QTextDocument.FindFlags()):
+        """Yields a cursor selecting each occurrence of `text` in `document`, in order."""
+        cursor = QTextCursor(document)  # default pos == 0
+        while True:
+            cursor = document.find(text, cursor, flags)
+            if cursor.isNull():
+                return
+            yield cursor
+
     @staticmethod
     def find_all(text: str, document: QTextDocument, flags=QTextDocument.FindFlags()) -> List[QTextCursor]:
         """
@@ -275,17 +535,34 @@ class PlainTextFindReplaceDialog(QDialog):
         :param flags: Conditions to set on the search: none or (whole word and/or match case)
         :return: Ordered list of all found instances.
         """
-        cursor = QTextCursor(document)  # default pos == 0
-        found: List[QTextCursor] = []
+        return list(PlainTextFindReplaceDialog.iter_find(text, document, flags))
 
-        while True:
-            cursor = document.find(text, cursor, flags)
-            if cursor.isNull():
-                return found
-            else:
-                found.append(cursor)
+    def set_watching_document(self, watching: bool):
+        """
+        Follows the document's edits and the text editor's scrolling, or stops, so that a closed dialog costs nothing
+        per keystroke.
+        """
+        if watching == self.watching_document:
+            return
+        self.watching_document = watching
+        contents_change = self.plain_text_edit.document().contentsChange
+        scrolled = self.plain_text_edit.verticalScrollBar().valueChanged
+        if watching:
+            contents_change.connect(self.handle_contents_change)
+            scrolled.connect(self.update_highlights)
+        else:
+            contents_change.disconnect(self.handle_contents_change)
+            scrolled.disconnect(self.update_highlights)
+
+    def showEvent(self, arg__1):
+        self.set_watching_document(True)
+        super().showEvent(arg__1)
 
     def done(self, arg__1: int):
+        self.cancel_background_find()
+        self.set_watching_document(False)
+        self.cursors_needed = True  # The matches go stale unwatched, should it be shown again.
+        self.highlighting = False
         self.plain_text_edit.setExtraSelections([])
         super().done(arg__1)
 
@@ -1,9 +1,10 @@
-from collections import defaultdict
-from typing import TypedDict, List, Optional, Dict
+from collections import defaultdict, OrderedDict
+from typing import TypedDict, List, Optional, Dict, Tuple
 import json
 import re
 import os
-import copy
+
+from OHTE.dict_file import write_dict_file
 
 
 class Entry(TypedDict):
@@ -78,6 +79,9 @@ letter_regex_map = {
     'B': 'b',
 }
 
+# `str.translate` table of `letter_regex_map`, so a word is mapped to its regex in one pass.
+lc_regex_table = str.maketrans(letter_regex_map)
+
 capitalized_symbol_map = {
     '<': ',',
     '>': '.',
@@ -92,24 +96,67 @@ letter_to_symbol_map = {
     'Z': '>',
     'A': ':'
 }
+letter_to_symbol_table = str.maketrans(letter_to_symbol_map)
+
+# Accounting for a=; z=. and x=, possibly at end of word (differentiating, e.g. 'pix' vs 'pi,')
+_root_pattern = re.compile(r'(?P<root>.+?)[.,;<>:]*$')
+_possessive_pattern = re.compile(r'\'[sl]$')
+
+
+class EntryView(object):
+    """
+    Read-only view of an Entry, as offered for a word in wordcheck mode.
+
+    `words` holds the Entry's words plus their capitalized variants (and, for a possessive view, every word with "'s"
+    appended). It is only worked out the first time it is read. A view reflects its Entry as it was when the view was
+    made; `map_word_to_entry` hands out cached views, but never one of an Entry since replaced (Entries are never
+    modified in place, see `add_word_to_dict`). A `DictionaryStore` also drops the views of each Entry it replaces.
+    The regex_map functions themselves leave the cache alone, so they can work on a private map in another thread.
+    """
+    __slots__ = ('entry', 'default', 'possessive', '_words')
+
+    def __init__(self, entry: Entry, possessive: bool = False):
+        self.entry = entry
+        self.possessive = possessive
+        self.default: str = entry['default'] + "'s" if possessive else entry['default']
+        self._words: Optional[Tuple[str, ...]] = None
+
+    @property
+    def words(self) -> Tuple[str, ...]:
+        """e.g. ["Fin", "fin", "fen"] --> ("Fin", "fin", "fen", "Fen") """
+        if self._words is None:
+            words = [wd + "'s" for wd in self.entry['words']] if self.possessive else self.entry['words']
+            self._words = tuple(dict.fromkeys(words + [wd.capitalize() for wd in words]))  # ordered dedup
+        return self._words
 
 
-def _handle_entry_caps(entry: Entry) -> Entry:
-    """e.g. ["Fin", "fin", "fen"] --> ["Fin", "fin", "fen", "Fen"] """
-    capitalized_words = [wd.capitalize() for wd in entry['words']]
-    deduped_cap_words = []
-    for wd in capitalized_words:
-        if wd not in deduped_cap_words:
-            deduped_cap_words.append(wd)
-    deduped_words = [wd for wd in deduped_cap_words if wd not in entry['words']]
-    entry['words'].extend(deduped_words)
+_ENTRY_VIEW_CACHE_SIZE = 4096
+_entry_views: 'OrderedDict[Tuple[str, bool], EntryView]' = OrderedDict()  # LRU, keyed by (regex, possessive)
 
-    return entry
+
+def _get_entry_view(regex: str, entry: Entry, possessive: bool = False) -> EntryView:
+    key = (regex, possessive)
+    view = _entry_views.get(key)
+    if view is not None and view.entry is entry:  # Different regex_maps can share keys.
+        _entry_views.move_to_end(key)
+        return view
+
+    view = EntryView(entry, possessive)
+    _entry_views[key] = view
+    if len(_entry_views) > _ENTRY_VIEW_CACHE_SIZE:
+        _entry_views.popitem(last=False)
+    return view
+
+
+def invalidate_entry_views(regex: str):
+    """Drops the cached `EntryView`s of the Entry at `regex`, e.g. once it's replaced. GUI thread only."""
+    _entry_views.pop((regex, False), None)
+    _entry_views.pop((regex, True), None)
 
 
 def set_entry_default(word: str, regex_map: Dict[str, Entry]) -> bool:
     """
-    Sets word as default for its Entry, if it exists. Mutates the regex_map.
+    Sets word as default for its Entry, if it exists. Mutates the regex_map, replacing the Entry.
 
     :param word: Presumed to derive from `PlainTextEdit.get_word_under_cursor()`
     :param regex_map: Dictionary to modify.
@@ -131,26 +178,28 @@ def set_entry_default(word: str, regex_map: Dict[str, Entry]) -> bool:
             return False
 
     uncapitalized_word = base_word[0].lower() if len(base_word) == 1 else base_word[0].lower() + base_word[1:]
-    if base_word in entry['words']:
-        entry['default'] = base_word
+    words = entry['words']
+    if base_word in words:
+        default = base_word
     # for auto-caps cases
-    elif uncapitalized_word in entry['words']:
-        entry['default'] = uncapitalized_word
+    elif uncapitalized_word in words:
+        default = uncapitalized_word
     # user forced something in
     else:
-        entry['default'] = base_word
-        entry['words'].append(base_word)
+        default = base_word
+        words = words + [base_word]
 
+    regex_map[regex] = {'default': default, 'words': words}
     return True
 
 
-def map_word_to_entry(raw_word: str, regex_map: Dict[str, Entry]) -> Optional[Entry]:
+def map_word_to_entry(raw_word: str, regex_map: Dict[str, Entry]) -> Optional[EntryView]:
     """
     Tries to map a word to an Entry.
 
     :param raw_word: pattern ~ r'([A-Za-z\'-]+)$' , w/o leading or trailing `'`
     :param regex_map: The dictionary of words grouped by their regexes {str: Entry}, to draw from.
-    :return: A deep copy of the Entry, if it exists, with upper case options appended for all lower cased words.
+    :return: A read-only view of the Entry, if it exists, with upper case options appended for all lower cased words.
     """
     if len(raw_word) == 0:
         return
@@ -158,23 +207,30 @@ def map_word_to_entry(raw_word: str, regex_map: Dict[str, Entry]) -> Optional[En
     regex: str = word_to_lc_regex(raw_word)
     entry: Optional[Entry] = regex_map.get(regex)
     if entry is not None:
-        entry_copy = copy.deepcopy(entry)
-        return _handle_entry_caps(entry_copy)
+        return _get_entry_view(regex, entry)
 
     # No word found. Check for possessives.
     if raw_word.endswith('\'s'):  # You could eff this up if you manually overwrote s with l.
         regex: str = word_to_lc_regex(raw_word[:-2])
         entry: Optional[Entry] = regex_map.get(regex)
         if entry is not None:
-            entry_copy = copy.deepcopy(entry)
-            entry_copy['default'] = entry_copy['default'] + "'s"
-            possessive_words = [word + "'s" for word in entry_copy['words']]
-            entry_copy['words'] = possessive_words
-            return _handle_entry_caps(entry_copy)
+            return _get_entry_view(regex, entry, possessive=True)
 
     return  # No matched, so return None.
 
 
+def _longest_key_prefix(regex: str, min_len: int, regex_map: Dict[str, Entry]) -> Optional[str]:
+    """The longest key of `regex_map`, at least `min_len` long, that `regex` starts with."""
+    key_index = getattr(regex_map, 'key_index', None)  # e.g. a `MappedRegexMap`'s
+    if key_index is not None:
+        return key_index.longest_prefix(regex, min_len)
+
+    for end in range(len(regex), min_len - 1, -1):
+        if regex[:end] in regex_map:
+            return regex[:end]
+    return
+
+
 def map_string_to_word(raw_word: str, regex_map: Dict[str, Entry]) -> Optional[str]:
     """
     Tries to map a string to an Entry, and takes its 'default' plus necessary punctuation.
@@ -189,33 +245,22 @@ def map_string_to_word(raw_word: str, regex_map: Dict[str, Entry]) -> Optional[s
 
     is_capitalized = raw_word[0].isupper() or raw_word[0] in capitalized_symbol_map
 
-    symbolized_word = raw_word
     # For left-handers. Gets coerced back as needed later.
-    for letter, symbol in letter_to_symbol_map.items():
-        symbolized_word = symbolized_word.replace(letter, symbol)
+    symbolized_word = raw_word.translate(letter_to_symbol_table)
 
-    # Accounting for a=; z=. and x=, possibly at end of word (differentiating, e.g. 'pix' vs 'pi,')
-    grouped_word_match = re.match(r'(?P<root>.+?)[.,;<>:]*$', symbolized_word)
+    grouped_word_match = _root_pattern.match(symbolized_word)
     root = grouped_word_match.group('root')
-    possible_word = symbolized_word
-    tail = ''
-    while len(possible_word) >= len(root):
-        regex: str = word_to_lc_regex(possible_word)
-        entry: Optional[Entry] = regex_map.get(regex)
-        if entry is not None:
-            default = entry['default']
-            word = default + tail
-            if is_capitalized:
-                return word.capitalize()
-            else:
-                return word
+    regex = _longest_key_prefix(word_to_lc_regex(symbolized_word), len(root), regex_map)
+    if regex is not None:
+        word = regex_map[regex]['default'] + symbolized_word[len(regex):]
+        if is_capitalized:
+            return word.capitalize()
         else:
-            tail = possible_word[-1] + tail
-            possible_word = possible_word[:-1]
+            return word
 
     # No word found. Check for possessives.
-    tail = tail[1:]  # Overshot in above while loop.
-    if re.search(r'\'[sl]$', root) is not None:
+    tail = symbolized_word[len(root):]
+    if _possessive_pattern.search(root) is not None:
         regex: str = word_to_lc_regex(root[:-2])
         entry: Optional[Entry] = regex_map.get(regex)
         if entry is not None:
@@ -229,9 +274,32 @@ def map_string_to_word(raw_word: str, regex_map: Dict[str, Entry]) -> Optional[s
     return  # No matched, so return None.
 
 
+def map_string_to_word_regexes(raw_word: str) -> List[str]:
+    """
+    The regexes whose Entries `map_string_to_word` may read to map `raw_word`, in any regex_map. Its result can only
+    change when one of these Entries is added, replaced or deleted.
+
+    :param raw_word: As for `map_string_to_word`.
+    """
+    if len(raw_word) == 0:
+        return []
+
+    symbolized_word = raw_word.translate(letter_to_symbol_table)
+    root = _root_pattern.match(symbolized_word).group('root')
+    regex = word_to_lc_regex(symbolized_word)
+    regexes = [regex[:end] for end in range(len(root), len(regex) + 1)]  # as `_longest_key_prefix` tries
+    if _possessive_pattern.search(root) is not None:
+        regexes.append(word_to_lc_regex(root[:-2]))
+    return regexes
+
+
 def add_word_to_dict(word: str, regex_map: Dict[str, Entry]) -> bool:
     """
     Add a word to a regex map dictionary. Mutates the regex_map to include word.
+
+    Entries are never modified in place: a changed Entry is a new one, assigned over the old. So an Entry, once handed
+    out, stays as it was, and a `DictionaryStore` sees every change as an assignment or deletion.
+
     :param word: Word to add to dictionary.
     :param regex_map: Dictionary to add word to.
     :return: True if word added. False if already exists.
@@ -240,7 +308,7 @@ def add_word_to_dict(word: str, regex_map: Dict[str, Entry]) -> bool:
     entry = regex_map.get(regex)
     if entry is not None:
         if word not in entry['words']:
-            entry['words'].append(word)
+            regex_map[regex] = {'default': entry['default'], 'words': entry['words'] + [word]}
             return True
     else:
         regex_map[regex]: Entry = {'default': word, 'words': [word]}
@@ -249,7 +317,7 @@ def add_word_to_dict(word: str, regex_map: Dict[str, Entry]) -> bool:
 
 def del_word_from_dict(word: str, regex_map: Dict[str, Entry]) -> bool:
     """
-    Deletes a word from a regex map dictionary. Mutates the regex_map to remove word.
+    Deletes a word from a regex map dictionary. Mutates the regex_map to remove word, replacing its Entry.
     :param word: Word to remove from dictionary.
     :param regex_map: Dictionary to remove word from.
     :return: True if word removed. False if not in dictionary.
@@ -260,11 +328,12 @@ def del_word_from_dict(word: str, regex_map: Dict[str, Entry]) -> bool:
     if entry is None or word not in entry['words']:
         return False
     else:
-        entry['words'].remove(word)
-        if len(entry['words']) == 0:
+        words = list(entry['words'])
+        words.remove(word)
+        if len(words) == 0:
             del regex_map[regex]
-        elif entry['default'] == word:
-            entry['default'] = entry['words'][0]
+        else:
+            regex_map[regex] = {'default': words[0] if entry['default'] == word else entry['default'], 'words': words}
         return True
 
 
@@ -274,18 +343,28 @@ def word_to_lc_regex(word: str) -> str:
        Note that these regexes are basically used as lookup keys, not for actual regexing.
        For instance, the caret and backslash characters, as is, will yield incorrect / invalid patterns.
     """
-    regex = ''
-    for i in word:
-        regex += letter_regex_map.get(i, i)  # Do I need to worry about "\" escaping for Qt?
+    return word.translate(lc_regex_table)  # Do I need to worry about "\" escaping for Qt?
+
+
+def words_to_lc_regexes(words: List[str]) -> List[str]:
+    """
+    Batch version of `word_to_lc_regex`, for mapping many words at once (e.g. building the dictionary).
 
-    return regex
+    All words are translated in a single call, rather than one call per word.
 
+    :param words: Words to map. Must not contain newlines (e.g. lines of a word list, stripped).
+    :return: The words' regexes, in the same order.
+    """
+    if not words:
+        return []
+    return '\n'.join(words).translate(lc_regex_table).split('\n')
 
-def create_regex_map(src: List[str], keep_capitals: List[bool], dest='regex_map.json'):
+
+def create_regex_map(src: List[str], keep_capitals: List[bool], dest='regex_map.bin'):
     """
     Takes a list of lists of dictionary words and converts it like,
     e.g.: {"^[a;][vn]$": {"default": "an", "words": ["an", "av"]}, [...]}
-    then dumps to a big json file.
+    then writes it out as a binary dictionary file (see `dict_file.py`), or as a big json file if `dest` ends in .json.
 
     :param src: List of source files of "{word}\n". Put in order of priority (first mapped word set as Entry default).
     :param keep_capitals: Defaults to / padded with True. Linked by index to src List.
@@ -310,16 +389,19 @@ def create_regex_map(src: List[str], keep_capitals: List[bool], dest='regex_map.
                         words[wd] = 1
 
     regex_words = defaultdict(list)
-    for word in list(words):  # Python 3.7+ preserves dict insertion order.
-        regex = word_to_lc_regex(word)
+    words = list(words)  # Python 3.7+ preserves dict insertion order.
+    for word, regex in zip(words, words_to_lc_regexes(words)):
         regex_words[regex].append(word)
 
     regex_map = dict()
     for regex, words in regex_words.items():
         regex_map[regex]: Entry = {'default': words[0], 'words': words}
 
-    with open(dest, 'w') as f:
-        json.dump(regex_map, f)
+    if dest.endswith('.json'):
+        with open(dest, 'w') as f:
+            json.dump(regex_map, f)
+    else:
+        write_dict_file(regex_map, dest)
 
 
 if __name__ == '__main__':
@@ -333,7 +415,8 @@ if __name__ == '__main__':
     countries_demonyms = os.path.join(dir_path, "countries_demonyms.txt")
     months_and_days = os.path.join(dir_path, 'months_and_days.txt')
     plurals = os.path.join(dir_path, 'BNC_curated_plurals.txt')
-    create_regex_map([common_words_path, COCA_path, contractions, countries_demonyms, months_and_days, plurals,
-                      '/usr/share/dict/words', '/usr/share/dict/propernames'],
-                     [True, True, True, True, True, False,
-                      False, True])
+    from OHTE.dict_builder import build_dict_file  # Streams and normalizes in parallel. Also a CLI.
+    build_dict_file([common_words_path, COCA_path, contractions, countries_demonyms, months_and_days, plurals,
+                     '/usr/share/dict/words', '/usr/share/dict/propernames'],
+                    [True, True, True, True, True, False,
+                     False, True])
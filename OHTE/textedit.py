@@ -1,14 +1,155 @@
 import sys
-import json
 import re
+import time
+import functools
 from enum import Enum
-from typing import Optional, Dict
+from typing import Optional, Dict, Callable, List, Pattern, Match, Tuple
 
 from PySide2.QtCore import Qt, Signal
 from PySide2.QtGui import QTextCursor, QKeyEvent, QColor
 from PySide2.QtWidgets import QApplication, QPlainTextEdit, QTextEdit
 
-from OHTE.regex_map import map_word_to_entry, map_string_to_word, letter_to_symbol_map, set_entry_default, Entry
+from OHTE.regex_map import (map_word_to_entry, map_string_to_word, letter_to_symbol_table, set_entry_default, Entry,
+                            EntryView)
+from OHTE.dict_file import open_dict_file
+from OHTE.background_find import code_point_index
+from OHTE.word_cache import WordCache
+from OHTE import latency
+from OHTE.latency import KEY_PRESS, PROCESS_PREVIOUS_WORD, MAP_STRING_TO_WORD, SETUP_WORDCHECK
+
+
+# Last line of Pattern matches closing parens of moderate complexity. Need to coerce post-parens punctuation.
+word_pattern = re.compile(r'''(?P<lead_symbols>[^\sA-Za-z,.;:<>]*)
+                              (?P<raw_word>[A-Za-z,.;:<>\'-]+?)
+                              (?P<end>[^A-Za-z,.;:<>]*|
+                              [!?\'"]*[]})]+[\'"]*(?P<end_punct_and_space>[.,;:azxA]+\s*))$''', re.X)
+autocaps_pattern = re.compile(r'(?P<prev_word>\S*?)(?P<junk>[\'\"]*)(?P<whitespace>\s*?)(?P<cur_word>\S+)$')
+
+# A match of the pattern can't start at or before a match of its barrier, so once a barrier is found in the tail, the
+# tail is known to hold the whole match. word_pattern only allows whitespace in its `end` group, never followed by a
+# letter; autocaps_pattern spans at most one run of whitespace.
+word_barrier = re.compile(r'\s[^A-Za-z,.;:<>]*[A-Za-z,.;:<>]')
+autocaps_barrier = re.compile(r'\s\S+\s')
+
+TAIL_WINDOW = 256  # chars before the cursor searched first for the word to coerce.
+PROGRESS_INTERVAL = 0.1  # seconds between progress reports of `MyPlainTextEdit.coerce`
+
+
+def search_tail(pattern: Pattern, barrier: Pattern, text_before: Callable[[int], str], length: int,
+                window: Optional[int] = None) -> Optional[Match]:
+    """
+    Same as `pattern.search(text)` for a `$`-anchored pattern, but only fetches and scans a bounded tail of `text`.
+
+    The tail is doubled until it contains a match of `barrier`, before which no match of `pattern` can start.
+
+    :param pattern: Compiled pattern ending in `$`.
+    :param barrier: Compiled pattern such that no match of `pattern` starts at or before the start of a `barrier` match.
+    :param text_before: Returns the last n characters of the text, given n <= `length`.
+    :param length: Length of the whole text, e.g. a paragraph up to the cursor.
+    :param window: Initial tail length. Defaults to TAIL_WINDOW.
+    :return: The match, with positions relative to the tail it was found in (`match.string`).
+    """
+    window = window or TAIL_WINDOW
+    while window < length:
+        tail = text_before(window)
+        if barrier.search(tail) is not None:
+            return pattern.search(tail)
+        window *= 2
+
+    return pattern.search(text_before(length))
+
+
+def cursor_text_before(cursor: QTextCursor, n: int) -> str:
+    """The `n` characters before `cursor`, read from the document without copying the whole block's text."""
+    tail_cursor = QTextCursor(cursor)
+    tail_cursor.clearSelection()
+    tail_cursor.setPosition(tail_cursor.position() - n, mode=QTextCursor.KeepAnchor)
+    return tail_cursor.selectedText()
+
+
+def previous_word_edits(text_before: Callable[[int], str], length: int, map_word: Callable[[str], Optional[str]],
+                        autocaps: bool = True) -> List[Tuple[int, str]]:
+    """
+    Works out how `MyPlainTextEdit.process_previous_word` coerces the word before the cursor.
+
+    Every edit overwrites as many characters as it writes, so none moves the text around it.
+
+    :param text_before: Returns the last n characters of the paragraph before the cursor, given n <= `length`.
+    :param length: The cursor's position in its paragraph.
+    :param map_word: Maps a raw word as `map_string_to_word` does, in the dictionary to coerce with.
+    :param autocaps: Capitalize the word if it starts a sentence.
+    :return: (characters back from the cursor it starts, text) of each overwrite, in the order to make them.
+    """
+    end_seq_match = search_tail(word_pattern, word_barrier, text_before, length)
+    if end_seq_match is None:  # No word to handle
+        return []
+    # Read before the closing parens below change the text.
+    autocaps_match = None
+    if autocaps:
+        autocaps_match = search_tail(autocaps_pattern, autocaps_barrier, text_before, length)
+
+    edits = []
+    # Handling closing parens
+    end_punct_and_space = end_seq_match.group('end_punct_and_space')
+    if end_punct_and_space is not None:
+        converted_string = end_punct_and_space.translate(letter_to_symbol_table)
+        edits.append((len(converted_string), converted_string))
+
+    # Handling word
+    match_len = len(end_seq_match[0]) - len(end_seq_match.group('lead_symbols'))  # how far back to send cursor
+    word = map_word(end_seq_match.group('raw_word'))
+    if word is None:  # Word not found in regex_map dictionary
+        return edits
+
+    # autocaps
+    if autocaps_match is not None:
+        prev_word = autocaps_match.group('prev_word')
+        if len(prev_word) == 0 or prev_word.endswith(('.', '?', '!')):
+            word = word.capitalize()
+
+    edits.append((match_len, word))
+    return edits
+
+
+_trigger_pattern = re.compile('[ /]')  # Characters whose keys coerce the word before them, besides Return.
+
+
+def coerce_paragraph(text: str, start: int, end: int, map_word: Callable[[str], Optional[str]],
+                     autocaps: bool = True) -> List[Tuple[int, str]]:
+    """
+    Coerces the words of a paragraph as typing `text[start:end]`, after `text[:start]`, would.
+
+    Each space and `/` typed coerces the word before it, through `previous_word_edits`, as does `end` itself if it ends
+    the paragraph (as typing Return would) or is followed by whitespace or `/`.
+
+    :param text: The paragraph, as typed.
+    :param start: Where typing starts.
+    :param end: Where typing ends.
+    :param map_word: As for `previous_word_edits`.
+    :param autocaps: As for `previous_word_edits`.
+    :return: (position in the paragraph, text) of each overwrite that changes it, in order and not overlapping.
+    """
+    coerced = list(text)
+    written = []  # (start, end) of each overwrite
+    triggers = [m.start() for m in _trigger_pattern.finditer(text, start, end)]
+    if end == len(text) or text[end].isspace() or text[end] == '/':
+        triggers.append(end)
+    for position in triggers:
+        text_before = lambda n, position=position: ''.join(coerced[position - n:position])
+        for back, word in previous_word_edits(text_before, position, map_word, autocaps):
+            coerced[position - back:position - back + len(word)] = word
+            written.append((position - back, position - back + len(word)))
+
+    edits = []
+    written.sort()
+    span_start, span_end = -1, -1
+    for write_start, write_end in written + [(len(text) + 1, len(text) + 1)]:
+        if write_start > span_end:  # Apart from the span so far, which is then final.
+            if span_end > span_start and text[span_start:span_end] != ''.join(coerced[span_start:span_end]):
+                edits.append((span_start, ''.join(coerced[span_start:span_end])))
+            span_start = write_start
+        span_end = max(span_end, write_end)
+    return edits
 
 
 class Mode(Enum):
@@ -18,7 +159,7 @@ class Mode(Enum):
 
 class MyPlainTextEdit(QPlainTextEdit):
 
-    entry_default_set = Signal()
+    entry_default_set = Signal(str)
     mode_toggled = Signal(str)
 
     def __init__(self, regex_map: Dict[str, Entry]):
@@ -27,14 +168,17 @@ class MyPlainTextEdit(QPlainTextEdit):
         self.regex_map = regex_map
         self.mode = Mode.INSERT
         self.wordcheck_cursor: QTextCursor = self.textCursor()
-        self.wordcheck_entry: Optional[Entry] = None
+        self.wordcheck_entry: Optional[EntryView] = None
         self.entry_idx = 0
         self.autocaps = True
+        self.latency = latency.recorder  # times keystrokes' stages, when enabled
+        # Shared with the other windows, and kept up to date, by a `DictionaryStore`. A plain dict goes uncached.
+        self.word_cache: Optional[WordCache] = getattr(regex_map, 'word_cache', None)
 
         self.cursorPositionChanged.connect(self.handle_cursor_position_changed)
 
     def next_word_replace(self):
-        next_word = self.wordcheck_entry['words'][self.entry_idx % len(self.wordcheck_entry['words'])]
+        next_word = self.wordcheck_entry.words[self.entry_idx % len(self.wordcheck_entry.words)]
         self.wordcheck_cursor.insertText(next_word)
         self.wordcheck_cursor.setPosition(self.wordcheck_cursor.position() - len(next_word))
         self.wordcheck_cursor.setPosition((self.wordcheck_cursor.position() + len(next_word)), mode=QTextCursor.KeepAnchor)
@@ -46,13 +190,13 @@ class MyPlainTextEdit(QPlainTextEdit):
         changed: bool = set_entry_default(word, self.regex_map)
         if changed:
             self.setup_wordcheck_for_word_under_cursor()
-            self.entry_default_set.emit()
+            self.entry_default_set.emit(word)
 
     def correct_index(self):
         """Pickup where you left off so the list cycling is sane."""
         if self.wordcheck_entry is not None:
             try:
-                self.entry_idx = self.wordcheck_entry['words'].index(self.wordcheck_cursor.selection().toPlainText())
+                self.entry_idx = self.wordcheck_entry.words.index(self.wordcheck_cursor.selection().toPlainText())
             except ValueError as e:
                 self.entry_idx = 0
         else:
@@ -97,6 +241,10 @@ class MyPlainTextEdit(QPlainTextEdit):
         return (front_word, back_word)
 
     def setup_wordcheck_for_word_under_cursor(self):
+        with self.latency.time(SETUP_WORDCHECK):
+            self._setup_wordcheck_for_word_under_cursor()
+
+    def _setup_wordcheck_for_word_under_cursor(self):
         if self.mode == Mode.WORDCHECK:
             self.wordcheck_cursor = self.textCursor()
             front_word, back_word = self.get_word_under_cursor(self.wordcheck_cursor)
@@ -112,7 +260,7 @@ class MyPlainTextEdit(QPlainTextEdit):
         if self.mode == Mode.WORDCHECK:
             self.setup_wordcheck_for_word_under_cursor()
 
-    def highlight_word(self, cursor: QTextCursor, entry: Optional[Entry]):
+    def highlight_word(self, cursor: QTextCursor, entry: Optional[EntryView]):
         selection = QTextEdit.ExtraSelection()
         normal_color = QColor(Qt.yellow).lighter()
         missing_color = QColor(Qt.magenta).lighter()
@@ -120,7 +268,7 @@ class MyPlainTextEdit(QPlainTextEdit):
 
         if entry is None:
             selection.format.setBackground(missing_color)
-        elif entry['default'] == cursor.selection().toPlainText():
+        elif entry.default == cursor.selection().toPlainText():
             selection.format.setBackground(default_color)
         else:
             selection.format.setBackground(normal_color)
@@ -131,46 +279,70 @@ class MyPlainTextEdit(QPlainTextEdit):
 
     def process_previous_word(self):
         """Overwrites the word before the cursor with the default mapping, if said mapping exists. """
-        cursor = self.textCursor()
-        text = cursor.block().text()[:cursor.positionInBlock()]  # Look b/w start of para and current pos.
-        # Last line of Pattern matches closing parens of moderate complexity. Need to coerce post-parens punctuation.
-        word_pattern = re.compile(r'''(?P<lead_symbols>[^\sA-Za-z,.;:<>]*)
-                                      (?P<raw_word>[A-Za-z,.;:<>\'-]+?)
-                                      (?P<end>[^A-Za-z,.;:<>]*|
-                                      [!?\'"]*[]})]+[\'"]*(?P<end_punct_and_space>[.,;:azxA]+\s*))$''', re.X)
-        end_seq_match = word_pattern.search(text)
-        if end_seq_match is None:  # No word to handle
-            return
-
-        # Handling closing parens
-        end_punct_and_space = end_seq_match.group('end_punct_and_space')
-        if end_punct_and_space is not None:
-            paren_cursor = self.textCursor()
-            converted_string = ''
-            for c in end_punct_and_space:
-                converted_string += letter_to_symbol_map.get(c, c)
-            paren_cursor.setPosition(paren_cursor.position() - len(converted_string), mode=QTextCursor.KeepAnchor)
-            paren_cursor.insertText(converted_string)
-
-        # Handling word
-        match_len = len(end_seq_match[0]) - len(end_seq_match.group('lead_symbols'))  # how far back to send cursor
-        raw_word = end_seq_match.group('raw_word')
-        word = map_string_to_word(raw_word, self.regex_map)
-        if word is None:  # Word not found in regex_map dictionary
-            return
-
-        # autocaps
-        if self.autocaps:
-            autocaps_match = re.search(r'(?P<prev_word>\S*?)(?P<junk>[\'\"]*)(?P<whitespace>\s*?)(?P<cur_word>\S+)$', text)
-            if autocaps_match is not None:
-                prev_word = autocaps_match.group('prev_word')
-                if len(prev_word) == 0 or prev_word.endswith(('.', '?', '!')):
-                    word = word.capitalize()
-
-        # Replace the old word
-        cursor.setPosition(cursor.position() - match_len)
-        cursor.setPosition((cursor.position() + len(word)), mode=QTextCursor.KeepAnchor)
-        cursor.insertText(word)
+        with self.latency.time(PROCESS_PREVIOUS_WORD):
+            cursor = self.textCursor()
+            position = cursor.position()
+            # Look b/w start of para and current pos, from the cursor back only as far as needed.
+            text_before = functools.partial(cursor_text_before, cursor)
+            for back, text in previous_word_edits(text_before, cursor.positionInBlock(), self.map_word, self.autocaps):
+                cursor.setPosition(position - back)
+                cursor.setPosition(position - back + len(text), mode=QTextCursor.KeepAnchor)
+                cursor.insertText(text)
+
+    def map_word(self, raw_word: str) -> Optional[str]:
+        """`map_string_to_word` in this editor's dictionary, through its `WordCache` if it has one."""
+        with self.latency.time(MAP_STRING_TO_WORD):
+            if self.word_cache is not None:
+                return self.word_cache.map_string_to_word(raw_word)
+            return map_string_to_word(raw_word, self.regex_map)
+
+    def coerce(self, start: int, end: int, progress: Callable[[int, int], bool] = None) -> Optional[int]:
+        """
+        Coerces every word between `start` and `end`, as typing the text there would have, in one undoable edit.
+
+        The text is read a paragraph at a time and each distinct raw word is only looked up once. Paragraphs are
+        coerced as by `coerce_paragraph`, so the one `end` falls in only up to it, and from `start` in the first, with
+        the words before it as context.
+
+        :param start: Document position.
+        :param end: Document position, from `start` on.
+        :param progress: Called every PROGRESS_INTERVAL seconds with (positions done, positions in all). Return False
+                         to cancel.
+        :return: Number of words (or runs of them) changed, or None if cancelled.
+        """
+        memo: Dict[str, Optional[str]] = {}
+
+        def map_word(raw_word: str) -> Optional[str]:
+            word = memo.get(raw_word, memo)
+            if word is memo:
+                word = memo[raw_word] = self.map_word(raw_word)
+            return word
+
+        edits = []  # (document position, text)
+        block = self.document().findBlock(start)
+        last_report = time.perf_counter()
+        while block.isValid() and block.position() <= end:
+            text = block.text()
+            # Positions count UTF-16 units, Python indexes code points.
+            block_start = code_point_index(text, max(start - block.position(), 0))
+            block_end = min(code_point_index(text, end - block.position()), len(text))
+            for i, word in coerce_paragraph(text, block_start, block_end, map_word, self.autocaps):
+                position = i if text.isascii() else len(text[:i].encode('utf-16-le')) // 2
+                edits.append((block.position() + position, word))
+            block = block.next()
+            if progress is not None and time.perf_counter() - last_report > PROGRESS_INTERVAL:
+                if not progress(min(block.position(), end) - start if block.isValid() else end - start, end - start):
+                    return None
+                last_report = time.perf_counter()
+
+        cursor = QTextCursor(self.document())
+        cursor.beginEditBlock()
+        for position, word in edits:  # Each the same length as what it overwrites, so positions stay put.
+            cursor.setPosition(position)
+            cursor.setPosition(position + len(word), mode=QTextCursor.KeepAnchor)
+            cursor.insertText(word)
+        cursor.endEditBlock()
+        return len(edits)
 
     def handle_wordcheck_key_events(self, e: QKeyEvent):
         """
@@ -264,7 +436,14 @@ class MyPlainTextEdit(QPlainTextEdit):
         self.mode_toggled.emit(self.mode.name.capitalize() + ' Mode')
 
     def keyPressEvent(self, e: QKeyEvent):
-        if self.mode == Mode.INSERT:
+        with self.latency.time(KEY_PRESS):
+            self._key_press_event(e)
+
+    def _key_press_event(self, e: QKeyEvent):
+        if self.isReadOnly():  # e.g. while a file loads. Both modes edit the text through cursors, so skip them.
+            super().keyPressEvent(e)
+
+        elif self.mode == Mode.INSERT:
             if e.key() in [Qt.Key_Space, Qt.Key_Return, Qt.Key_Slash] and e.modifiers() == Qt.NoModifier:
                 self.process_previous_word()
             super().keyPressEvent(e)
@@ -279,7 +458,7 @@ class MyPlainTextEdit(QPlainTextEdit):
             super().keyPressEvent(e)
 
     def keyReleaseEvent(self, e: QKeyEvent):
-        if self.mode == Mode.WORDCHECK:
+        if self.mode == Mode.WORDCHECK and not self.isReadOnly():
             if e.modifiers() in [Qt.NoModifier, Qt.ShiftModifier]:
                 self.handle_wordcheck_key_events(e)
             else:
@@ -290,8 +469,7 @@ class MyPlainTextEdit(QPlainTextEdit):
 
 if __name__ == "__main__":
     app = QApplication([])
-    with open('regex_map.json') as f:
-        regex_map: dict = json.load(f)
+    regex_map = open_dict_file('regex_map.bin')
     editor = MyPlainTextEdit(regex_map)
     editor.show()
     sys.exit(app.exec_())
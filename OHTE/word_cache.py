@@ -0,0 +1,83 @@
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from OHTE.regex_map import Entry, map_string_to_word, map_string_to_word_regexes
+
+
+CAPACITY = 4096  # raw words kept
+
+
+class WordCache(object):
+    """
+    Bounded LRU cache of `map_string_to_word` in one regex_map, keyed by the raw word as typed.
+
+    The raw word includes its capitalization (and trailing punctuation), so 'Thi' and 'thi' are cached apart, as
+    `map_string_to_word` maps them apart. A cached word stays valid until an Entry it was looked up through is added,
+    replaced or deleted; call `invalidate` with that Entry's regex (e.g. from `DictionaryStore.changed`) to drop just
+    the raw words that depend on it.
+    """
+
+    def __init__(self, regex_map: Dict[str, Entry], capacity: int = CAPACITY):
+        """
+        :param regex_map: Dictionary to look words up in, on a miss.
+        :param capacity: Most raw words kept. The least recently used is dropped first.
+        """
+        self.regex_map = regex_map
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._words: 'OrderedDict[str, Optional[str]]' = OrderedDict()  # {raw word: mapped word or None}
+        self._regexes: Dict[str, Tuple[str, ...]] = {}  # {raw word: `map_string_to_word_regexes`}
+        self._dependents: Dict[str, Set[str]] = {}  # {regex: raw words cached that depend on it}
+
+    def map_string_to_word(self, raw_word: str) -> Optional[str]:
+        """`regex_map.map_string_to_word`, cached."""
+        words = self._words
+        word = words.get(raw_word, words)
+        if word is not words:
+            words.move_to_end(raw_word)
+            self.hits += 1
+            return word
+
+        self.misses += 1
+        word = map_string_to_word(raw_word, self.regex_map)
+        words[raw_word] = word
+        regexes = self._regexes[raw_word] = tuple(dict.fromkeys(map_string_to_word_regexes(raw_word)))
+        for regex in regexes:
+            self._dependents.setdefault(regex, set()).add(raw_word)
+        if len(words) > self.capacity:
+            self._drop(next(iter(words)))
+        return word
+
+    def invalidate(self, regex: str):
+        """Drops the cached words that depend on the Entry at `regex`. Call whenever that Entry changes."""
+        for raw_word in list(self._dependents.get(regex, ())):
+            self._drop(raw_word)
+
+    def clear(self):
+        self._words.clear()
+        self._regexes.clear()
+        self._dependents.clear()
+
+    def _drop(self, raw_word: str):
+        del self._words[raw_word]
+        for regex in self._regexes.pop(raw_word):
+            dependents = self._dependents[regex]
+            dependents.discard(raw_word)
+            if not dependents:
+                del self._dependents[regex]
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of lookups answered from the cache, 0 before any."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        """'size', 'capacity', 'hits', 'misses' and 'hit_rate' since made or last `reset_stats`."""
+        return {'size': len(self._words), 'capacity': self.capacity, 'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hit_rate}
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
@@ -0,0 +1,99 @@
+"""
+Keystroke latency of word coercion in INSERT mode, against paragraphs from 100 to 100k characters long.
+
+Each sample types a word and times the `keyPressEvent` of the space after it, which runs `process_previous_word` and
+then inserts the space, and separately `process_previous_word` alone. "bounded tail" scans the tail of the paragraph
+as the editor does; "whole paragraph" makes the tail window as long as the paragraph, like scanning it all on every
+keystroke did before. What remains of the keystroke's growth with paragraph length is Qt laying out the paragraph.
+
+Run from the repository root:  python -m benchmarks.keystroke_latency_bench
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PySide2.QtCore import Qt, QEvent
+from PySide2.QtGui import QKeyEvent, QTextCursor
+from PySide2.QtWidgets import QApplication
+
+from OHTE import textedit
+from OHTE.textedit import MyPlainTextEdit
+from OHTE.regex_map import words_to_lc_regexes
+
+
+WORDS = ["the", "and", "it's", "then", "than", "hex", "ken", "den", "in", "on", "at", "it", "is", "he", "she"]
+
+
+def make_regex_map():
+    regex_map = {}
+    for regex, word in zip(words_to_lc_regexes(WORDS), WORDS):
+        entry = regex_map.setdefault(regex, {'default': word, 'words': []})
+        entry['words'].append(word)
+    return regex_map
+
+
+def make_paragraph(length: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    words = []
+    size = 0
+    while size < length:
+        word = rng.choice(WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return ' '.join(words)[:length] + ' '
+
+
+def time_keystrokes(editor: MyPlainTextEdit, paragraph: str, samples: int):
+    """Times `samples` spaces after a word at the end of `paragraph`. Returns (keystroke times, coercion times)."""
+    editor.setPlainText(paragraph)
+    editor.moveCursor(QTextCursor.End)
+    space = QKeyEvent(QEvent.KeyPress, Qt.Key_Space, Qt.NoModifier, ' ')
+    keystroke_times = []
+    coercion_times = []
+    for _ in range(samples):
+        editor.insertPlainText("thi")
+        start = time.perf_counter()
+        editor.keyPressEvent(space)
+        keystroke_times.append(time.perf_counter() - start)
+
+        editor.insertPlainText("thi")
+        start = time.perf_counter()
+        editor.process_previous_word()
+        coercion_times.append(time.perf_counter() - start)
+        editor.insertPlainText(" ")
+    return keystroke_times, coercion_times
+
+
+def summarize(times) -> str:
+    times = sorted(times)
+    return "{:9.1f} / {:8.1f}".format(statistics.median(times) * 1e6, times[int(0.95 * len(times))] * 1e6)
+
+
+def main(lengths=(100, 1000, 10000, 100000), samples: int = 200):
+    app = QApplication.instance() or QApplication([])
+    editor = MyPlainTextEdit(make_regex_map())
+    editor.autocaps = True
+    bounded_window = textedit.TAIL_WINDOW
+
+    print("{} keystrokes per paragraph; median / p95 in us".format(samples))
+    print("{:>8}  {:>9}  {:>20}  {:>20}".format("chars", "", "bounded tail", "whole paragraph"))
+    for length in lengths:
+        paragraph = make_paragraph(length)
+        keystroke_row = []
+        coercion_row = []
+        for window in [bounded_window, sys.maxsize]:
+            textedit.TAIL_WINDOW = window
+            keystroke_times, coercion_times = time_keystrokes(editor, paragraph, samples)
+            keystroke_row.append(summarize(keystroke_times))
+            coercion_row.append(summarize(coercion_times))
+        textedit.TAIL_WINDOW = bounded_window
+        print("{:>8}  {:>9}  {:>20}  {:>20}".format(length, "keystroke", *keystroke_row))
+        print("{:>8}  {:>9}  {:>20}  {:>20}".format("", "coercion", *coercion_row))
+
+
+if __name__ == '__main__':
+    main()
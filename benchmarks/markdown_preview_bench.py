@@ -0,0 +1,72 @@
+"""
+Markdown Viewer update time on a ~1 MB document: rendering it all, as every update did before, against patching in
+the one segment a keystroke changed.
+
+Run from the repository root:  python -m benchmarks.markdown_preview_bench
+"""
+import os
+import statistics
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PySide2.QtGui import QTextDocument, QTextCursor
+from PySide2.QtWidgets import QApplication
+
+from OHTE.markdown_preview import MarkdownPreview
+
+
+SECTION = """## Section {n}
+
+Some *emphasised* text, a [link](https://example.com) and `code`, in a paragraph that goes on for a while so that
+the document has realistic line lengths and block counts.
+
+- a list item
+- another, with **bold**
+
+```
+fenced code {n}
+```
+
+"""
+
+
+def make_document(size: int) -> str:
+    sections = []
+    length = 0
+    n = 0
+    while length < size:
+        sections.append(SECTION.format(n=n))
+        length += len(sections[-1])
+        n += 1
+    return ''.join(sections)
+
+
+def main(size: int = 1000000, samples: int = 20):
+    app = QApplication.instance() or QApplication([])
+    source = QTextDocument()
+    source.setPlainText(make_document(size))
+    preview = MarkdownPreview(source, QTextDocument())
+
+    start = time.perf_counter()
+    QTextDocument().setMarkdown(source.toPlainText())
+    print("setMarkdown, whole document: {:8.1f} ms".format((time.perf_counter() - start) * 1e3))
+
+    start = time.perf_counter()
+    preview.update()
+    print("first update, whole document: {:7.1f} ms".format((time.perf_counter() - start) * 1e3))
+
+    cursor = QTextCursor(source)
+    times = []
+    for i in range(samples):
+        cursor.setPosition(source.characterCount() * i // samples)
+        cursor.insertText("x")
+        start = time.perf_counter()
+        preview.update()
+        times.append(time.perf_counter() - start)
+    print("update after a keystroke:     {:7.1f} ms median, {:.1f} ms max".format(
+        statistics.median(times) * 1e3, max(times) * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,432 @@
+"""
+Benchmark suite for the regex_map engine and the editor's hot paths, on synthetic corpora from 1 KB to 100 MB.
+
+Each benchmark times one operation over a whole corpus, `--repeat` times, keeping the median and the minimum. Its
+setup (building the corpus, a document, a window...) isn't timed. Benchmarks that grow superlinearly or build a
+Python object per word stop at a smaller size, their `max_size`, so a full run ends in minutes.
+
+The corpus is pseudo-random English-like text (the same for a given size on every run), typed one-handed: every other
+letter of each word is its mirror image, as `map_string_to_word` and `process_previous_word` expect. It's laid out
+as Markdown, with headings, paragraphs and lists.
+
+Results are written as JSON, one timing per "benchmark/size". `compare` checks a run against a baseline, listing each
+timing's change and exiting with status 1 if any got slower by more than the threshold. Baselines are per machine:
+record one before upgrading (Qt, PySide, Python, or the code) and compare against it after.
+
+Run from the repository root:
+    python -m benchmarks.suite run -o baseline.json
+    python -m benchmarks.suite run --max-size 1M --compare baseline.json
+    python -m benchmarks.suite compare baseline.json results.json --threshold 0.2
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import statistics
+import tempfile
+from typing import Callable, List, NamedTuple, Optional
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import PySide2
+from PySide2.QtCore import QEvent, QStandardPaths, qVersion
+from PySide2.QtGui import QTextDocument
+from PySide2.QtWidgets import QApplication
+
+from OHTE.regex_map import (letter_regex_map, word_to_lc_regex, words_to_lc_regexes, map_string_to_word,
+                            map_word_to_entry, create_regex_map)
+from OHTE.textedit import MyPlainTextEdit
+from OHTE.word_cache import WordCache
+from OHTE.background_find import BackgroundFind, find_pattern, REGEX
+from OHTE.plaintext_find_replace_dialog import PlainTextFindReplaceDialog
+from OHTE.main_window import MainWindow
+
+
+SIZES = {'1K': 1 << 10, '10K': 10 << 10, '100K': 100 << 10, '1M': 1 << 20, '10M': 10 << 20, '100M': 100 << 20}
+VOCABULARY_SIZE = 5000
+THRESHOLD = 0.1  # fraction slower than the baseline that counts as a regression
+MIN_DELTA = 0.001  # seconds slower that count, so that noise in tiny timings doesn't
+
+
+def _mirror_table() -> dict:
+    """Maps each letter to the one the same finger types with the other hand, e.g. 'q' <-> 'p'."""
+    mirrors = {}
+    for key, regex in letter_regex_map.items():
+        if key != regex and key.isalpha():
+            mirrors[key] = regex
+            mirrors[regex] = key
+    return str.maketrans(mirrors)
+
+
+_mirror = _mirror_table()
+
+
+def make_vocabulary(seed: int = 0) -> List[str]:
+    """Distinct made-up words of 1 to 4 syllables, most frequent first."""
+    rng = random.Random(seed)
+    onsets = ['', 'b', 'c', 'd', 'f', 'g', 'h', 'l', 'm', 'n', 'p', 'r', 's', 't', 'v', 'w', 'st', 'th', 'ch', 'br']
+    vowels = ['a', 'e', 'i', 'o', 'u', 'ea', 'ou', 'y']
+    codas = ['', '', 'n', 'r', 's', 't', 'ck', 'ng', 'x', 'z']
+    words = dict.fromkeys(['the', 'and', 'a', 'in', 'it', "it's", 'is'])
+    while len(words) < VOCABULARY_SIZE:
+        words[''.join(rng.choice(onsets) + rng.choice(vowels) + rng.choice(codas)
+                      for _ in range(rng.randint(1, 4)))] = None
+    return list(words)
+
+
+def type_one_handed(word: str) -> str:
+    """`word` as typed with one hand: every other character mirrored."""
+    return ''.join(c.translate(_mirror) if i % 2 else c for i, c in enumerate(word))
+
+
+def make_regex_map(vocabulary: List[str]) -> dict:
+    regex_map = {}
+    for regex, word in zip(words_to_lc_regexes(vocabulary), vocabulary):
+        entry = regex_map.setdefault(regex, {'default': word, 'words': []})
+        entry['words'].append(word)
+    return regex_map
+
+
+class Corpus(object):
+    """Synthetic text of `size` characters, and what benchmarks derive from it, made on first use."""
+
+    def __init__(self, size: int, vocabulary: List[str], seed: int = 0):
+        self.size = size
+        self.vocabulary = vocabulary
+        self.seed = seed
+        self._text: Optional[str] = None
+        self._words: Optional[List[str]] = None
+        self._file_name: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        """Markdown-ish paragraphs of one-handed words, with punctuation, Zipf-distributed."""
+        if self._text is None:
+            rng = random.Random(self.seed)
+            typed = [type_one_handed(word) for word in self.vocabulary]
+            weights = [1 / rank for rank in range(1, len(typed) + 1)]
+            words = rng.choices(typed, weights, k=self.size // 5 + 10)
+            parts = []
+            length = 0
+            i = 0
+            while length < self.size:
+                kind = rng.random()
+                n = rng.randint(5, 60)
+                line = ' '.join(words[i:i + n])
+                i = (i + n) % (len(words) - 60)
+                if kind < 0.05:
+                    line = '## ' + line[:40] + '\n\n'
+                elif kind < 0.2:
+                    line = '- ' + line + '\n'
+                else:
+                    line = line.capitalize() + rng.choice(['.', '.', ',', '?', '!']) + '\n\n'
+                parts.append(line)
+                length += len(line)
+            self._text = ''.join(parts)[:self.size]
+        return self._text
+
+    @property
+    def words(self) -> List[str]:
+        if self._words is None:
+            self._words = [word.strip('#-.,?!') for word in self.text.split()]
+        return self._words
+
+    @property
+    def file_name(self) -> str:
+        """The text, saved in a temporary file."""
+        if self._file_name is None:
+            fd, self._file_name = tempfile.mkstemp(suffix='.md', prefix='ohte_bench_')
+            with os.fdopen(fd, 'w') as f:
+                f.write(self.text)
+        return self._file_name
+
+    def document(self) -> QTextDocument:
+        document = QTextDocument()
+        document.setPlainText(self.text)
+        return document
+
+    def close(self):
+        if self._file_name is not None:
+            os.remove(self._file_name)
+        self._text = self._words = self._file_name = None
+
+
+class Benchmark(NamedTuple):
+    name: str
+    run: Callable[[Corpus, dict], float]  # (corpus, dictionary) -> seconds the operation took
+    max_size: int
+
+
+def _timed(operation: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    operation()
+    return time.perf_counter() - start
+
+
+def bench_word_to_lc_regex(corpus: Corpus, regex_map: dict) -> float:
+    words = corpus.words
+    return _timed(lambda: [word_to_lc_regex(word) for word in words])
+
+
+def bench_map_string_to_word(corpus: Corpus, regex_map: dict) -> float:
+    words = corpus.words
+    return _timed(lambda: [map_string_to_word(word, regex_map) for word in words])
+
+
+def bench_map_string_to_word_cached(corpus: Corpus, regex_map: dict) -> float:
+    """Through a `WordCache` of the default size, as typing looks words up."""
+    words = corpus.words
+    cache = WordCache(regex_map)
+    return _timed(lambda: [cache.map_string_to_word(word) for word in words])
+
+
+def bench_map_word_to_entry(corpus: Corpus, regex_map: dict) -> float:
+    words = corpus.words
+    return _timed(lambda: [map_word_to_entry(word, regex_map) for word in words])
+
+
+def bench_create_regex_map(corpus: Corpus, regex_map: dict) -> float:
+    """From a word list the size of the corpus, of made-up compound words, mostly distinct as a dictionary's are."""
+    rng = random.Random(corpus.seed)
+    lines = []
+    length = 0
+    while length < corpus.size:
+        word = rng.choice(corpus.vocabulary) + rng.choice(corpus.vocabulary)
+        lines.append(word + '\n')
+        length += len(word) + 1
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, 'words.txt')
+        with open(src, 'w') as f:
+            f.writelines(lines)
+        return _timed(lambda: create_regex_map([src], [True], os.path.join(tmp, 'regex_map.bin')))
+
+
+def bench_coerce_document(corpus: Corpus, regex_map: dict) -> float:
+    """Types the corpus a word at a time, coercing each through `process_previous_word` as a space would."""
+    editor = MyPlainTextEdit(regex_map)
+    words = corpus.text.split(' ')
+    elapsed = 0.0
+    for word in words:
+        editor.insertPlainText(word)
+        elapsed += _timed(editor.process_previous_word)
+        editor.insertPlainText(' ')
+    return elapsed
+
+
+def _most_common_word(corpus: Corpus) -> str:
+    return type_one_handed(corpus.vocabulary[0])
+
+
+def bench_find_matches(corpus: Corpus, regex_map: dict) -> float:
+    """All matches of a word, as the Find dialog's `init_find` finds them for Find Next and the highlights."""
+    document = corpus.document()
+    word = _most_common_word(corpus)
+    return _timed(lambda: PlainTextFindReplaceDialog.find_matches(find_pattern(word), document))
+
+
+def bench_find_matches_regex(corpus: Corpus, regex_map: dict) -> float:
+    """As `bench_find_matches`, for the words starting with a common word's first letters, in regex mode."""
+    document = corpus.document()
+    text = r'\b' + _most_common_word(corpus)[:2] + r'\w*'
+    return _timed(lambda: PlainTextFindReplaceDialog.find_matches(find_pattern(text, mode=REGEX), document))
+
+
+def bench_background_find(corpus: Corpus, regex_map: dict) -> float:
+    """The Find dialog's running count of a word: from the snapshot of the text until the matches reach the GUI."""
+    document = corpus.document()
+    pattern = find_pattern(_most_common_word(corpus))
+
+    def search():
+        found = []
+        background_find = BackgroundFind(pattern, document.toPlainText())
+        background_find.found.connect(found.append)
+        background_find.start()
+        while not found:
+            QApplication.processEvents()
+
+    return _timed(search)
+
+
+def bench_find_all_legacy(corpus: Corpus, regex_map: dict) -> float:
+    """
+    The `QTextDocument.find` loop the Find dialog searched with before it searched a snapshot of the text. No longer
+    on any path users hit; kept to compare with `find_matches`.
+    """
+    document = corpus.document()
+    word = _most_common_word(corpus)
+    return _timed(lambda: PlainTextFindReplaceDialog.find_all(word, document))
+
+
+def bench_replace_all(corpus: Corpus, regex_map: dict) -> float:
+    editor = MyPlainTextEdit(regex_map)
+    editor.setPlainText(corpus.text)
+    dialog = PlainTextFindReplaceDialog(editor)
+    dialog.find_line_edit.setText(_most_common_word(corpus))
+    dialog.replace_line_edit.setText('replaced')
+    return _timed(dialog.replace_all)
+
+
+def bench_load_file(corpus: Corpus, regex_map: dict) -> float:
+    """Until the whole file is in, as `load_file` hands the rest to the event loop."""
+    window = MainWindow(regex_map)
+    file_name = corpus.file_name
+
+    def load():
+        window.load_file(file_name)
+        while window.file_loader is not None:
+            QApplication.processEvents()
+
+    elapsed = _timed(load)
+    window.deleteLater()
+    return elapsed
+
+
+def bench_save_file(corpus: Corpus, regex_map: dict) -> float:
+    window = MainWindow(regex_map)
+    window.text_edit.setPlainText(corpus.text)
+    with tempfile.TemporaryDirectory() as tmp:
+        elapsed = _timed(lambda: window.save_file(os.path.join(tmp, 'saved.md'), blocking=True))
+    window.deleteLater()
+    return elapsed
+
+
+def bench_update_markdown_viewer(corpus: Corpus, regex_map: dict) -> float:
+    """Rendering the whole document, as on first showing the Markdown Viewer."""
+    window = MainWindow(regex_map)
+    window.text_edit.setPlainText(corpus.text)
+    elapsed = _timed(window.update_markdown_viewer)
+    window.deleteLater()
+    return elapsed
+
+
+BENCHMARKS = [
+    Benchmark('word_to_lc_regex', bench_word_to_lc_regex, SIZES['10M']),
+    Benchmark('map_string_to_word', bench_map_string_to_word, SIZES['10M']),
+    Benchmark('map_string_to_word_cached', bench_map_string_to_word_cached, SIZES['10M']),
+    Benchmark('map_word_to_entry', bench_map_word_to_entry, SIZES['10M']),
+    Benchmark('create_regex_map', bench_create_regex_map, SIZES['10M']),
+    Benchmark('coerce_document', bench_coerce_document, SIZES['1M']),
+    Benchmark('find_matches', bench_find_matches, SIZES['10M']),
+    Benchmark('find_matches_regex', bench_find_matches_regex, SIZES['10M']),
+    Benchmark('background_find', bench_background_find, SIZES['10M']),
+    Benchmark('find_all_legacy', bench_find_all_legacy, SIZES['1M']),
+    Benchmark('replace_all', bench_replace_all, SIZES['10M']),
+    Benchmark('load_file', bench_load_file, SIZES['100M']),
+    Benchmark('save_file', bench_save_file, SIZES['100M']),
+    Benchmark('update_markdown_viewer', bench_update_markdown_viewer, SIZES['10M']),
+]
+
+
+def environment() -> dict:
+    return {
+        'python': platform.python_version(),
+        'pyside2': PySide2.__version__,
+        'qt': qVersion(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def run(names: List[str], sizes: List[str], repeat: int, log=print) -> dict:
+    """
+    Runs the benchmarks named, on each size up to its `max_size`.
+
+    :return: {'environment': ..., 'repeat': ..., 'results': {"name/size": {'median': s, 'min': s, 'size': chars}}}
+    """
+    app = QApplication.instance() or QApplication([])
+    QStandardPaths.setTestModeEnabled(True)  # Keeps the windows' settings and recent files out of the user's.
+    vocabulary = make_vocabulary()
+    regex_map = make_regex_map(vocabulary)
+    results = {}
+    for size_name in sizes:
+        corpus = Corpus(SIZES[size_name], vocabulary)
+        for benchmark in BENCHMARKS:
+            if benchmark.name not in names or corpus.size > benchmark.max_size:
+                continue
+            times = [benchmark.run(corpus, regex_map) for _ in range(repeat)]
+            key = '{}/{}'.format(benchmark.name, size_name)
+            results[key] = {'median': statistics.median(times), 'min': min(times), 'size': corpus.size}
+            log("{:<32} {:>12.6f} s".format(key, results[key]['median']))
+            app.sendPostedEvents(None, QEvent.DeferredDelete)  # Deletes the windows done with.
+        corpus.close()
+    return {'environment': environment(), 'repeat': repeat, 'results': results}
+
+
+def compare(baseline: dict, current: dict, threshold: float = THRESHOLD, min_delta: float = MIN_DELTA,
+            log=print) -> List[str]:
+    """
+    Lists each timing of `current` against `baseline`'s.
+
+    :param threshold: Fraction slower than the baseline that is a regression, e.g. 0.1 for 10%.
+    :param min_delta: Seconds slower that is a regression, however large the fraction.
+    :return: The keys of the timings that regressed.
+    """
+    regressions = []
+    log("{:<32} {:>12} {:>12} {:>8}".format("benchmark", "baseline s", "current s", "change"))
+    for key, result in current['results'].items():
+        base = baseline['results'].get(key)
+        if base is None:
+            log("{:<32} {:>12} {:>12.6f}".format(key, "-", result['median']))
+            continue
+        change = result['median'] / base['median'] - 1 if base['median'] else 0.0
+        regressed = change > threshold and result['median'] - base['median'] > min_delta
+        if regressed:
+            regressions.append(key)
+        log("{:<32} {:>12.6f} {:>12.6f} {:>+7.1%}{}".format(key, base['median'], result['median'], change,
+                                                           "  REGRESSION" if regressed else ""))
+    return regressions
+
+
+def _sizes_up_to(max_size: str) -> List[str]:
+    return [name for name, size in SIZES.items() if size <= SIZES[max_size]]
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.suite', description=__doc__.split('\n\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="run the benchmarks, writing their timings as JSON")
+    run_parser.add_argument('-o', '--output', help="JSON file for the results, e.g. a baseline")
+    run_parser.add_argument('-b', '--benchmark', action='append', choices=[b.name for b in BENCHMARKS],
+                            help="benchmark to run; repeat for several. Default: all")
+    run_parser.add_argument('--max-size', choices=list(SIZES), default='100M', help="largest corpus. Default: 100M")
+    run_parser.add_argument('--repeat', type=int, default=3, help="runs per timing, of which the median is kept")
+    run_parser.add_argument('--compare', metavar='BASELINE', help="then compare the results with a baseline")
+    run_parser.add_argument('--threshold', type=float, default=THRESHOLD)
+
+    compare_parser = commands.add_parser('compare', help="compare results with a baseline")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                                help="fraction slower that is a regression. Default: {}".format(THRESHOLD))
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        names = args.benchmark or [b.name for b in BENCHMARKS]
+        current = run(names, _sizes_up_to(args.max_size), args.repeat)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(current, f, indent=1)
+        if not args.compare:
+            return 0
+        baseline_file = args.compare
+    else:
+        with open(args.current) as f:
+            current = json.load(f)
+        baseline_file = args.baseline
+
+    with open(baseline_file) as f:
+        baseline = json.load(f)
+    regressions = compare(baseline, current, args.threshold)
+    if regressions:
+        print("{} regression(s) past {:.0%}".format(len(regressions), args.threshold))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,46 @@
+"""
+Microbenchmark of `word_to_lc_regex`: the translate-table implementation against the previous per-character loop.
+
+Run from the repository root:  python -m benchmarks.word_to_lc_regex_bench
+"""
+import random
+import string
+import timeit
+
+from OHTE.regex_map import letter_regex_map, word_to_lc_regex, words_to_lc_regexes
+
+
+def loop_word_to_lc_regex(word: str) -> str:
+    """The original implementation: string `+=` and a dict lookup per character."""
+    regex = ''
+    for i in word:
+        regex += letter_regex_map.get(i, i)
+
+    return regex
+
+
+def make_words(n: int, seed: int = 0):
+    rng = random.Random(seed)
+    letters = string.ascii_letters + ";:,.<>'-"
+    return [''.join(rng.choice(letters) for _ in range(rng.randint(1, 14))) for _ in range(n)]
+
+
+def main(n: int = 100000, repeat: int = 5):
+    words = make_words(n)
+    assert [loop_word_to_lc_regex(wd) for wd in words] == words_to_lc_regexes(words)
+
+    timings = [
+        ("per-character loop", lambda: [loop_word_to_lc_regex(wd) for wd in words]),
+        ("translate table", lambda: [word_to_lc_regex(wd) for wd in words]),
+        ("batch translate", lambda: words_to_lc_regexes(words)),
+    ]
+    baseline = None
+    print("{} words, best of {}".format(n, repeat))
+    for name, fn in timings:
+        per_key = min(timeit.repeat(fn, number=1, repeat=repeat)) / n
+        baseline = baseline or per_key
+        print("{:<20} {:8.3f} us/key  {:5.1f}x".format(name, per_key * 1e6, baseline / per_key))
+
+
+if __name__ == '__main__':
+    main()
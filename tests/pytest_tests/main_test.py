@@ -2,24 +2,131 @@ import pytest
 from unittest.mock import MagicMock, mock_open, patch
 
 from PySide2.QtCore import QStandardPaths, QDir
+from PySide2.QtWidgets import QMessageBox
 
 from OHTE.main_window import MainWindow
+from OHTE.dictionary_store import DictionaryStore
 from OHTE import main
 
 
+@pytest.fixture()
+def dictionary():
+    dictionary = DictionaryStore({})
+    dictionary['k'] = {'default': 'l', 'words': ['l']}
+    return dictionary
+
+
 class TestSave(object):
-    def test_saves_to_app_data_location(self, tmp_path):
-        open_spy = mock_open()
-        with patch('builtins.open', open_spy):
+    def test_saves_to_app_data_location(self, tmp_path, dictionary):
+        with patch('OHTE.main.write_dict_file') as write_spy:
             QStandardPaths.writableLocation = MagicMock(return_value=str(tmp_path))
-            MainWindow.dict_modified = True
-            main.save_dictionary('x.json', 'x.json', {'k': 'l'})
-        open_spy.assert_called_with(QDir(str(tmp_path)).filePath('x.json'), 'w')
+            main.save_dictionary('x.bin', 'x.bin', dictionary)
+        write_spy.assert_called_with(dictionary.regex_map, QDir(str(tmp_path)).filePath('x.bin'))
+        assert not dictionary.dirty
 
-    def test_saves_internally_if_unable_to_save_to_user_filesystem(self, tmp_path):
-        open_spy = mock_open()
-        with patch('builtins.open', open_spy):
+    def test_saves_internally_if_unable_to_save_to_user_filesystem(self, tmp_path, dictionary):
+        with patch('OHTE.main.write_dict_file') as write_spy:
             QStandardPaths.writableLocation = MagicMock(return_value=str(tmp_path))
-            MainWindow.dict_modified = True
-            main.save_dictionary('x.json', 'y.json', {'k': 'l'})  # gets you to the same place...
-        open_spy.assert_called_with('y.json', 'w')
+            main.save_dictionary('x.bin', 'y.bin', dictionary)  # gets you to the same place...
+        write_spy.assert_called_with(dictionary.regex_map, 'y.bin')
+
+    def test_unchanged_not_saved(self, dictionary):
+        dictionary.mark_clean()
+        with patch('OHTE.main.write_dict_file') as write_spy:
+            main.save_dictionary('x.bin', 'y.bin', dictionary)
+        write_spy.assert_not_called()
+
+
+class TestLocate(object):
+    def test_prefers_app_data_dictionary(self, tmp_path):
+        user_dict = str(tmp_path / 'x.bin')
+        with patch.object(QStandardPaths, 'locate', MagicMock(side_effect=[user_dict])), \
+                patch('OHTE.main.convert_json_dict') as convert_spy:
+            assert main.locate_dictionary('x.bin', 'x.json') == user_dict
+        convert_spy.assert_not_called()
+
+    def test_converts_legacy_json_dictionary_once(self, tmp_path):
+        legacy_dict = str(tmp_path / 'x.json')
+        with patch.object(QStandardPaths, 'locate', MagicMock(side_effect=['', legacy_dict])), \
+                patch('OHTE.main.convert_json_dict') as convert_spy:
+            dict_src = main.locate_dictionary('x.bin', 'x.json')
+        assert dict_src == QDir(str(tmp_path)).filePath('x.bin')
+        convert_spy.assert_called_once_with(legacy_dict, dict_src)
+
+    def test_falls_back_to_default_dictionary(self, tmp_path):
+        with patch.object(QStandardPaths, 'locate', MagicMock(return_value='')), \
+                patch('OHTE.main.convert_json_dict') as convert_spy:
+            assert main.locate_dictionary(str(tmp_path / 'x.bin'), str(tmp_path / 'x.json')) == str(tmp_path / 'x.bin')
+        convert_spy.assert_not_called()
+
+
+class TestJournal(object):
+    def test_no_journal_without_app_data_location(self):
+        QStandardPaths.writableLocation = MagicMock(return_value='')
+        assert main.open_journal({}, 'x.bin') is None
+
+    def test_replays_journal(self, tmp_path):
+        QStandardPaths.writableLocation = MagicMock(return_value=str(tmp_path))
+        (tmp_path / main.JOURNAL_FILE_NAME).write_text('["add", "cat"]\n')
+        regex_map = {}
+        journal = main.open_journal(regex_map, 'x.bin')
+        assert len(journal) == 1
+        assert regex_map == {'cat': {'default': 'cat', 'words': ['cat']}}
+
+    def test_remaps_compacted_dictionary(self, tmp_path):
+        QStandardPaths.writableLocation = MagicMock(return_value=str(tmp_path))
+        dict_src = str(tmp_path / main.DICT_FILE_NAME)
+        main.write_dict_file({'cat': {'default': 'cat', 'words': ['cat']}}, dict_src)
+        (tmp_path / main.JOURNAL_FILE_NAME).write_text('["add", "bob"]\n' * main.COMPACT_AFTER)
+        regex_map = main.open_dict_file(dict_src)
+        journal = main.open_journal(regex_map, dict_src)
+        dictionary = DictionaryStore(regex_map)
+        journal.record('add', 'may')  # while compacting
+        journal.compaction_thread.join()
+
+        assert main.finish_dict_compaction(journal, dictionary)
+        assert dictionary.regex_map is not regex_map
+        assert sorted(dictionary) == ['bwb', 'cat']
+        assert dictionary['cat']['words'] == ['cat', 'may']
+        assert len(journal) == 1
+        journal.close()
+
+    def test_installs_compaction_left_over(self, tmp_path):
+        QStandardPaths.writableLocation = MagicMock(return_value=str(tmp_path))
+        dict_src = str(tmp_path / main.DICT_FILE_NAME)
+        main.write_dict_file({'cat': {'default': 'cat', 'words': ['cat']}}, dict_src + '.compact')
+        (tmp_path / (main.JOURNAL_FILE_NAME + '.old')).write_text('["add", "cat"]\n')
+        main.install_dict_compaction()
+        assert sorted(main.open_dict_file(dict_src)) == ['cat']
+        assert list(tmp_path.iterdir()) == [tmp_path / main.DICT_FILE_NAME]
+
+
+class TestRecovery(object):
+    def test_recovers_unsaved_changes(self, tmp_path, qtbot):
+        crashed = MainWindow({}, recovery_dir=str(tmp_path))
+        qtbot.addWidget(crashed)
+        qtbot.keyClicks(crashed.text_edit, "unsaved")
+        crashed.autosave.flush()
+        crashed.autosave.finish_compaction()
+        crashed.autosave.lock.unlock()  # as if its process had gone
+
+        with patch.object(QMessageBox, 'question', MagicMock(return_value=QMessageBox.Yes)):
+            windows = main.recover_documents({}, 'x.bin', None, str(tmp_path))
+        assert len(windows) == 1
+        qtbot.addWidget(windows[0])
+        assert windows[0].text_edit.toPlainText() == "unsaved"
+        assert windows[0].isWindowModified()
+        assert main.find_journals(str(tmp_path)) == []  # only the recovered window's own, locked journal is left
+        assert len(list(tmp_path.glob('*.journal'))) == 1
+
+    def test_declined(self, tmp_path, qtbot):
+        crashed = MainWindow({}, recovery_dir=str(tmp_path))
+        qtbot.addWidget(crashed)
+        qtbot.keyClicks(crashed.text_edit, "unsaved")
+        crashed.autosave.flush()
+        crashed.autosave.finish_compaction()
+        crashed.autosave.lock.unlock()
+
+        with patch.object(QMessageBox, 'question', MagicMock(return_value=QMessageBox.No)):
+            assert main.recover_documents({}, 'x.bin', None, str(tmp_path)) == []
+        assert list(tmp_path.glob('*.journal')) == []
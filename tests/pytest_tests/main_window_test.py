@@ -5,13 +5,16 @@ import os.path
 from unittest.mock import MagicMock, patch
 
 from PySide2.QtWidgets import QToolButton, QMessageBox, QDockWidget, QLabel, QApplication, QDialog
-from PySide2.QtCore import Qt, QSettings
+from PySide2.QtCore import Qt, QSettings, QEvent
+from PySide2.QtGui import QTextCursor
 from PySide2.QtPrintSupport import QPrintDialog
 
 from OHTE.regex_map import create_regex_map
 from OHTE.main_window import MainWindow
 from OHTE.validating_dialog import ValidatingDialog
 from OHTE.textedit import Mode
+from OHTE.autosave import replay_journal
+from OHTE.large_file_viewer import LargeFileViewer, MAX_LINE_LENGTH
 
 
 # Mocking modal.
@@ -22,8 +25,6 @@ QPrintDialog.exec_ = MagicMock(return_value=QDialog.Accepted)
 
 @pytest.fixture()
 def main_win():
-    MainWindow.dict_modified = False
-
     src = 'test_words.txt'
     dest = 'test_out.json'
     words = ["may", "cat"]
@@ -44,7 +45,6 @@ def main_win():
 
 @pytest.fixture(scope="class")
 def mainwin_recentfiles():
-    MainWindow.dict_modified = False
     MainWindow.max_recent_files = 2
 
     # resetting recent files
@@ -93,6 +93,7 @@ class TestRecentFiles(object):
         qtbot.addWidget(mainwin_recentfiles)
         mainwin_recentfiles.text_edit.setPlainText('1')
         mainwin_recentfiles.save_as() # raises a modal
+        qtbot.waitUntil(lambda: mainwin_recentfiles.file_saver is None)
         act1 = mainwin_recentfiles.recent_file_acts[0]
         assert act1.isVisible()
         assert act1.data() == os.path.realpath('document1.txt')
@@ -109,6 +110,7 @@ class TestRecentFiles(object):
         win2 = MainWindow.window_list[0]
         win2.text_edit.setPlainText('2')
         win2.save_as()
+        qtbot.waitUntil(lambda: win2.file_saver is None)
         act1 = mainwin_recentfiles.recent_file_acts[0]  # check that it updates across open files
         assert act1.isVisible()
         assert act1.text() == 'document2.txt'
@@ -120,6 +122,7 @@ class TestRecentFiles(object):
         win3 = MainWindow.window_list[1]
         win3.text_edit.setPlainText('3')
         win3.save_as()
+        qtbot.waitUntil(lambda: win3.file_saver is None)
         act1 = mainwin_recentfiles.recent_file_acts[0]
         assert act1.isVisible()
         assert act1.text() == 'document3.txt'
@@ -163,33 +166,36 @@ class TestEntryDefaultSet(object):
     """Checks that everything is hooked up right from MainWindow down to the regex_map fn call."""
     def test_true(self, main_win, qtbot):
         with patch('OHTE.textedit.set_entry_default', return_value=True) as mock:
+            main_win.dict_journal = MagicMock()
             main_win.show()
             qtbot.addWidget(main_win)
             # main_win.text_edit.set_wordcheck_word_as_default = MagicMock()
             qtbot.keyClick(main_win.text_edit, Qt.Key_E, modifier=Qt.ControlModifier)
             assert main_win.text_edit.mode == Mode.WORDCHECK
             qtbot.keyClick(main_win.text_edit, Qt.Key_O)
-            assert MainWindow.dict_modified
+            assert main_win.dict_journal.record.called
 
     # checking other hotkey
     def test_true_b(self, main_win, qtbot):
         with patch('OHTE.textedit.set_entry_default', return_value=True) as mock:
+            main_win.dict_journal = MagicMock()
             main_win.show()
             qtbot.addWidget(main_win)
             # main_win.text_edit.set_wordcheck_word_as_default = MagicMock()
             qtbot.keyClick(main_win.text_edit, Qt.Key_E, modifier=Qt.ControlModifier)
             assert main_win.text_edit.mode == Mode.WORDCHECK
             qtbot.keyClick(main_win.text_edit, Qt.Key_W)
-            assert MainWindow.dict_modified
+            assert main_win.dict_journal.record.called
 
     def test_false(self, main_win, qtbot):
         with patch('OHTE.textedit.set_entry_default', return_value=False) as mock:
+            main_win.dict_journal = MagicMock()
             main_win.show()
             qtbot.addWidget(main_win)
             qtbot.keyClick(main_win.text_edit, Qt.Key_E, modifier=Qt.ControlModifier)
             assert main_win.text_edit.mode == Mode.WORDCHECK
             qtbot.keyClick(main_win.text_edit, Qt.Key_O)
-            assert not MainWindow.dict_modified
+            assert not main_win.dict_journal.record.called
 
 
 class TestMarkdownFont(object):
@@ -241,7 +247,12 @@ class TestAddWord(object):
         vd = main_win.findChildren(ValidatingDialog)[-1]
         qtbot.keyClicks(vd.line_edit, 'mat')
         qtbot.keyClick(vd, Qt.Key_Enter)
-        assert main_win.dict_modified
+        assert main_win.dictionary.dirty == {'cat'}
+
+    def test_add_word_journaled(self, main_win: MainWindow, qtbot):
+        main_win.dict_journal = MagicMock()
+        main_win.handle_add_word('mat')
+        main_win.dict_journal.record.assert_called_once_with('add', 'mat')
 
     def test_add_duplicate_word(self, main_win, qtbot):
         main_win.show()
@@ -251,7 +262,7 @@ class TestAddWord(object):
         qtbot.keyClicks(vd.line_edit, 'may')
         qtbot.keyClick(vd, Qt.Key_Enter)
         QMessageBox.information.assert_called()
-        assert not main_win.dict_modified
+        assert not main_win.dictionary.dirty
 
 
 class TestDelWord(object):
@@ -262,7 +273,13 @@ class TestDelWord(object):
         vd = main_win.findChildren(ValidatingDialog)[-1]
         qtbot.keyClicks(vd.line_edit, 'mat')
         qtbot.keyClick(vd, Qt.Key_Enter)
-        assert not main_win.dict_modified
+        assert not main_win.dictionary.dirty
+
+    def test_del_word_journaled(self, main_win: MainWindow, qtbot):
+        main_win.dict_journal = MagicMock()
+        main_win.handle_delete_word('mat')
+        main_win.handle_delete_word('may')
+        main_win.dict_journal.record.assert_called_once_with('del', 'may')
 
     def test_del_word(self, main_win, qtbot):
         main_win.show()
@@ -271,7 +288,7 @@ class TestDelWord(object):
         vd = main_win.findChildren(ValidatingDialog)[-1]
         qtbot.keyClicks(vd.line_edit, 'may')
         qtbot.keyClick(vd, Qt.Key_Enter)
-        assert main_win.dict_modified
+        assert main_win.dictionary.dirty == {'cat'}
 
 
 # Obsolete, with saving now in `main.py`
@@ -348,6 +365,34 @@ class TestFind(object):
         assert main_win.show_find_and_replace_dialog.call_count == 2
 
 
+class TestCoerce(object):
+    def test_document(self, main_win: MainWindow, qtbot):
+        qtbot.addWidget(main_win)
+        main_win.text_edit.setPlainText('cat zz\nmay')
+        main_win.coerce_document_act.trigger()
+        assert main_win.text_edit.toPlainText() == 'May zz\nMay'
+        assert main_win.statusBar().currentMessage() == 'Coerced 2 words'
+
+    def test_selection(self, main_win: MainWindow, qtbot):
+        qtbot.addWidget(main_win)
+        main_win.text_edit.setPlainText('cat cat cat')
+        assert not main_win.coerce_selection_act.isEnabled()
+        cursor = main_win.text_edit.textCursor()
+        cursor.setPosition(4)
+        cursor.setPosition(7, QTextCursor.KeepAnchor)
+        main_win.text_edit.setTextCursor(cursor)
+        assert main_win.coerce_selection_act.isEnabled()
+        main_win.coerce_selection_act.trigger()
+        assert main_win.text_edit.toPlainText() == 'cat may cat'
+
+    def test_read_only(self, main_win: MainWindow, qtbot):
+        qtbot.addWidget(main_win)
+        main_win.text_edit.setPlainText('cat')
+        main_win.text_edit.setReadOnly(True)
+        main_win.coerce_document_act.trigger()
+        assert main_win.text_edit.toPlainText() == 'cat'
+
+
 class TestPrint(object):
     def test_hookup(self, main_win, qtbot):
         main_win.show()
@@ -401,3 +446,202 @@ class TestMarkdownUpdate(object):
         qtbot.keyClicks(main_win.text_edit, "# hi")
         main_win.update_markdown_viewer()
         assert main_win.md_text_edit.textCursor().position() == 2
+
+    def test_live_preview(self, main_win: MainWindow, qtbot):
+        main_win.show()
+        qtbot.addWidget(main_win)
+        main_win.md_dock.show()
+        qtbot.keyClicks(main_win.text_edit, "# hi")
+        assert main_win.md_preview.timer.isActive()
+        qtbot.waitUntil(lambda: main_win.md_text_edit.document().firstBlock().text() == "hi")
+
+    def test_cursor_follows_source_line(self, main_win: MainWindow, qtbot):
+        main_win.show()
+        qtbot.addWidget(main_win)
+        main_win.md_dock.show()
+        main_win.text_edit.setPlainText("\n\n".join("para {}".format(n) for n in range(100)))
+        main_win.update_markdown_viewer()
+        main_win.text_edit.moveCursor(QTextCursor.End)
+        assert main_win.md_text_edit.textCursor().block().text() == "para 99"
+
+    def test_live_preview_off(self, main_win: MainWindow, qtbot):
+        main_win.show()
+        qtbot.addWidget(main_win)
+        main_win.md_live_act.setChecked(False)
+        main_win.md_dock.show()
+        qtbot.keyClicks(main_win.text_edit, "# hi")
+        assert not main_win.md_preview.timer.isActive()
+        main_win.md_live_act.setChecked(True)
+        assert main_win.md_preview.timer.isActive()
+        main_win.md_dock.close()
+        qtbot.keyClicks(main_win.text_edit, "!")
+        assert not main_win.md_preview.live
+
+
+class TestLoadFile(object):
+    @pytest.fixture()
+    def long_file(self):
+        file_name = 'test_long.txt'
+        with open(file_name, 'w') as f:
+            f.write(''.join("line {}\n".format(n) for n in range(100000)))
+        yield file_name
+        os.remove(file_name)
+
+    def test_small_file_loads_at_once(self, main_win: MainWindow, qtbot):
+        qtbot.addWidget(main_win)
+        with open('test_words.txt') as f:
+            text = f.read()
+        main_win.load_file('test_words.txt')
+        assert main_win.file_loader is None
+        assert main_win.text_edit.toPlainText() == text
+        assert not main_win.text_edit.isReadOnly()
+        assert not main_win.isWindowModified()
+
+    def test_long_file_loads_in_chunks(self, main_win: MainWindow, qtbot, long_file):
+        main_win.show()
+        qtbot.addWidget(main_win)
+        main_win.load_file(long_file)
+        assert main_win.file_loader is not None
+        assert 0 < main_win.text_edit.document().characterCount() < os.path.getsize(long_file)
+        assert main_win.text_edit.isReadOnly()
+        assert not main_win.save_act.isEnabled()
+        assert main_win.load_progress_bar.isVisible()
+
+        qtbot.waitUntil(lambda: main_win.file_loader is None)
+        with open(long_file) as f:
+            assert main_win.text_edit.toPlainText() == f.read()
+        assert not main_win.text_edit.isReadOnly()
+        assert main_win.save_act.isEnabled()
+        assert not main_win.load_progress_bar.isVisible()
+        assert not main_win.isWindowModified()
+        assert not main_win.text_edit.document().isUndoAvailable()
+        assert main_win.cur_file.endswith(long_file)
+
+    def test_cancel(self, main_win: MainWindow, qtbot, long_file):
+        main_win.show()
+        qtbot.addWidget(main_win)
+        main_win.load_file(long_file)
+        qtbot.mouseClick(main_win.load_cancel_button, Qt.LeftButton)
+        assert main_win.file_loader is None
+        assert main_win.text_edit.document().isEmpty()
+        assert main_win.is_untitled
+        assert not main_win.text_edit.isReadOnly()
+
+
+class TestLargeFileViewer(object):
+    @pytest.fixture()
+    def large_file(self, monkeypatch):
+        file_name = 'test_large.txt'
+        with open(file_name, 'w') as f:
+            f.write(''.join("line {}\n".format(n) for n in range(100000)))
+        monkeypatch.setattr(MainWindow, 'large_file_size', 1000)
+        yield file_name
+        os.remove(file_name)
+
+    def test_offered(self, main_win: MainWindow, qtbot, large_file, monkeypatch):
+        qtbot.addWidget(main_win)
+        monkeypatch.setattr(QMessageBox, 'question', MagicMock(return_value=QMessageBox.Yes))
+        main_win.open_file(large_file)
+        viewer = MainWindow.window_list.pop()
+        assert main_win.text_edit.document().isEmpty()
+        assert viewer.text_edit.document().firstBlock().text() == "line 0"
+        assert main_win.find_main_window(large_file) is viewer
+
+        qtbot.waitUntil(viewer.next_button.isEnabled)
+        assert viewer.status_label.text() == "100,001 lines"
+        viewer.find_line_edit.setText("LINE 99999")
+        viewer.next_button.click()
+        qtbot.waitUntil(lambda: viewer.find_task is None)
+        assert viewer.text_edit.textCursor().selectedText() == "line 99999"
+        assert viewer.scroll_bar.value() == viewer.scroll_bar.maximum()
+        viewer.close()
+        QApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+
+    def test_long_lines_cut_off(self, qtbot, tmp_path):
+        file_name = str(tmp_path / 'long_lines.txt')
+        with open(file_name, 'w') as f:
+            f.write("a" * 3 * MAX_LINE_LENGTH + "\nb\n" + "c" * 3 * MAX_LINE_LENGTH)
+        viewer = LargeFileViewer(file_name)
+        viewer.show()
+        qtbot.waitUntil(viewer.next_button.isEnabled)
+        assert viewer.text_edit.toPlainText() == "a" * MAX_LINE_LENGTH + "\nb\n" + "c" * MAX_LINE_LENGTH
+        assert viewer.line_index.starts_after_long_lines == {1: 3 * MAX_LINE_LENGTH + 1}
+        viewer.close()
+        QApplication.sendPostedEvents(None, QEvent.DeferredDelete)
+
+    def test_declined(self, main_win: MainWindow, qtbot, large_file, monkeypatch):
+        qtbot.addWidget(main_win)
+        monkeypatch.setattr(QMessageBox, 'question', MagicMock(return_value=QMessageBox.No))
+        main_win.open_file(large_file)
+        qtbot.waitUntil(lambda: main_win.file_loader is None)
+        assert main_win.text_edit.document().blockCount() == 100001
+
+
+class TestSaveFile(object):
+    def test_saves_in_background(self, main_win: MainWindow, qtbot, tmp_path):
+        qtbot.addWidget(main_win)
+        file_name = str(tmp_path / 'saved.txt')
+        main_win.text_edit.setPlainText("héllo\nworld")
+        assert main_win.save_file(file_name)
+        qtbot.waitUntil(lambda: main_win.file_saver is None)
+        with open(file_name, encoding='utf-8') as f:
+            assert f.read() == "héllo\nworld"
+        assert not main_win.isWindowModified()
+        assert main_win.cur_file == os.path.realpath(file_name)
+
+    def test_edits_during_save_stay_modified(self, main_win: MainWindow, qtbot, tmp_path):
+        qtbot.addWidget(main_win)
+        file_name = str(tmp_path / 'saved.txt')
+        main_win.text_edit.setPlainText("hello")
+        main_win.save_file(file_name)
+        qtbot.keyClicks(main_win.text_edit, "x")
+        qtbot.waitUntil(lambda: main_win.file_saver is None)
+        with open(file_name) as f:
+            assert f.read() == "hello"
+        assert main_win.isWindowModified()
+        assert main_win.text_edit.document().isModified()
+
+    def test_blocking(self, main_win: MainWindow, qtbot, tmp_path):
+        qtbot.addWidget(main_win)
+        file_name = str(tmp_path / 'saved.txt')
+        main_win.text_edit.setPlainText("hello")
+        assert main_win.save_file(file_name, blocking=True)
+        assert main_win.file_saver is None
+        assert not main_win.isWindowModified()
+
+    def test_failure(self, main_win: MainWindow, qtbot, tmp_path):
+        qtbot.addWidget(main_win)
+        main_win.text_edit.setPlainText("hello")
+        QMessageBox.warning.reset_mock()
+        assert not main_win.save_file(str(tmp_path / 'missing' / 'saved.txt'), blocking=True)
+        assert QMessageBox.warning.called
+        assert main_win.is_untitled
+        assert main_win.isWindowModified()
+
+
+class TestAutosave(object):
+    @pytest.fixture()
+    def autosave_win(self, main_win: MainWindow, tmp_path):
+        (tmp_path / 'recovery').mkdir()
+        win = MainWindow(main_win.dictionary, recovery_dir=str(tmp_path / 'recovery'))
+        win.autosave.finish_compaction()
+        return win
+
+    def test_journals_edits(self, autosave_win: MainWindow, qtbot, tmp_path):
+        qtbot.addWidget(autosave_win)
+        qtbot.keyClicks(autosave_win.text_edit, "abc")
+        autosave_win.autosave.flush()
+        assert replay_journal(autosave_win.autosave.journal_name) == ('', "abc")
+
+    def test_saving_restarts_journal(self, autosave_win: MainWindow, qtbot, tmp_path):
+        qtbot.addWidget(autosave_win)
+        qtbot.keyClicks(autosave_win.text_edit, "abc")
+        autosave_win.save_file(str(tmp_path / 'saved.txt'), blocking=True)
+        assert replay_journal(autosave_win.autosave.journal_name) is None  # nothing unsaved
+
+    def test_closing_discards_journal(self, autosave_win: MainWindow, qtbot, tmp_path):
+        qtbot.keyClicks(autosave_win.text_edit, "abc")
+        autosave_win.autosave.flush()
+        autosave_win.text_edit.document().setModified(False)  # as if discarded
+        autosave_win.close()
+        assert list((tmp_path / 'recovery').iterdir()) == []
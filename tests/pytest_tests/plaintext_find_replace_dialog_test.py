@@ -1,9 +1,11 @@
 import pytest
+import random
 from PySide2.QtCore import Qt
-from PySide2.QtGui import QTextDocument
+from PySide2.QtGui import QTextDocument, QTextCursor
 from PySide2.QtWidgets import QPushButton, QDialogButtonBox, QPlainTextEdit
 
 from OHTE.plaintext_find_replace_dialog import PlainTextFindReplaceDialog
+from OHTE.background_find import find_pattern, LITERAL
 
 @pytest.fixture()
 def stuff():
@@ -125,6 +127,49 @@ class TestNext(object):
         qtbot.mouseClick(d.find_next_btn, Qt.LeftButton)
         assert te.textCursor().position() == d.current_cursor.position()
 
+    def test_highlights_only_near_viewport(self, stuff, qtbot):
+        te: QPlainTextEdit = stuff[0]
+        d: PlainTextFindReplaceDialog = stuff[1]
+        qtbot.addWidget(te)
+        qtbot.addWidget(d)
+        te.show()
+
+        te.setPlainText("hi\n" * 5000)
+        qtbot.keyClicks(d.find_line_edit, "hi")
+        qtbot.mouseClick(d.find_next_btn, Qt.LeftButton)
+        es = te.extraSelections()
+        assert 0 < len(es) < 1000
+        assert es[0].cursor.selectionStart() == 0
+
+        te.verticalScrollBar().setValue(te.verticalScrollBar().maximum())
+        es = te.extraSelections()
+        assert 0 < len(es) < 1000
+        assert es[-1].cursor.selectionStart() == 3 * 4999
+        assert any(sel.cursor == d.current_cursor for sel in es)  # the current match stays highlighted
+
+    def test_matches_kept_through_edits(self, stuff, qtbot):
+        te: QPlainTextEdit = stuff[0]
+        d: PlainTextFindReplaceDialog = stuff[1]
+        qtbot.addWidget(te)
+        qtbot.addWidget(d)
+
+        rng = random.Random(0)
+        te.setPlainText("hi ahi hih\nhi hi\n\nhhi ii h" * 20)
+        qtbot.keyClicks(d.find_line_edit, "hi")
+        d.whole_word_check_box.setChecked(True)
+        qtbot.mouseClick(d.find_next_btn, Qt.LeftButton)
+        for _ in range(100):
+            cursor = QTextCursor(te.document())
+            cursor.setPosition(rng.randrange(te.document().characterCount()))
+            cursor.setPosition(min(cursor.position() + rng.randrange(4), te.document().characterCount() - 1),
+                               QTextCursor.KeepAnchor)
+            cursor.insertText(rng.choice(["", "h", "i", "hi", " ", "\n", "i\nh"]))
+            assert not d.cursors_needed
+            fresh = d.find_matches(find_pattern("hi", d.find_flags), te.document(), d.find_flags)
+            assert [d.matches.span(i) for i in range(len(d.matches))] == [fresh.span(i) for i in range(len(fresh))]
+        qtbot.mouseClick(d.find_next_btn, Qt.LeftButton)
+        assert d.current_cursor.selectedText().lower() == "hi"
+
 
 class TestPrev(object):
     def test_highlight_basic(self, stuff, qtbot):
@@ -237,6 +282,26 @@ class TestReplace(object):
         assert es[0].format.background().color().getRgb() != es[1].format.background().color().getRgb()
         assert es[2].format.background().color().getRgb() == es[1].format.background().color().getRgb()
 
+    def test_replace_steps_through_many(self, stuff, qtbot):
+        te: QPlainTextEdit = stuff[0]
+        d: PlainTextFindReplaceDialog = stuff[1]
+        qtbot.addWidget(te)
+        qtbot.addWidget(d)
+
+        te.setPlainText("hi " * 1000)
+        qtbot.keyClicks(d.find_line_edit, "hi")
+        qtbot.keyClicks(d.replace_line_edit, "hello")
+        qtbot.mouseClick(d.find_next_btn, Qt.LeftButton)
+        for _ in range(3):
+            qtbot.mouseClick(d.find_next_btn, Qt.LeftButton)
+        assert d.found_info_label.text() == "4 of 1000 matches"
+        qtbot.mouseClick(d.replace_btn, Qt.LeftButton)
+        qtbot.mouseClick(d.replace_btn, Qt.LeftButton)
+        assert d.found_info_label.text() == "4 of 998 matches"
+        assert te.toPlainText() == "hi " * 3 + "hello " * 2 + "hi " * 995
+        assert d.current_cursor.selectedText() == "hi"
+        assert d.current_cursor.selectionStart() == 9 + 12
+
 
 class TestReplaceAll(object):
     def test_replace_all(self, stuff, qtbot):
@@ -251,6 +316,122 @@ class TestReplaceAll(object):
         qtbot.mouseClick(d.replace_all_btn, Qt.LeftButton)
         assert te.toPlainText() == "l l"
 
+    def test_replace_all_is_one_undo_step(self, stuff, qtbot):
+        te: QPlainTextEdit = stuff[0]
+        d: PlainTextFindReplaceDialog = stuff[1]
+        qtbot.addWidget(te)
+        qtbot.addWidget(d)
+
+        text = "hi there, hi\nhi\n" * 500
+        te.setPlainText(text)
+        qtbot.keyClicks(d.find_line_edit, "hi")
+        qtbot.keyClicks(d.replace_line_edit, "hello")
+        qtbot.mouseClick(d.replace_all_btn, Qt.LeftButton)
+        assert te.toPlainText() == text.replace("hi", "hello")
+        assert d.found_info_label.text() == "Made 1500 replacements"
+        te.undo()
+        assert te.toPlainText() == text
+
+
+class TestModes(object):
+    def test_regex_replace_all_with_groups(self, stuff, qtbot):
+        te: QPlainTextEdit = stuff[0]
+        d: PlainTextFindReplaceDialog = stuff[1]
+        qtbot.addWidget(te)
+        qtbot.addWidget(d)
+
+        te.setPlainText("Smith, John\nDoe, Jane\nnot a name")
+        d.regex_check_box.setChecked(True)
+        qtbot.keyClicks(d.find_line_edit, r"^(\w+), (?P<first>\w+)$")
+        qtbot.keyClicks(d.replace_line_edit, r"\g<first> \1")
+        qtbot.mouseClick(d.replace_all_btn, Qt.LeftButton)
+        assert te.toPlainText() == "John Smith\nJane Doe\nnot a name"
+        assert d.found_info_label.text() == "Made 2 replacements"
+
+    def test_regex_replace_all_adjacent_matches(self, stuff, qtbot):
+        te: QPlainTextEdit = stuff[0]
+        d: PlainTextFindReplaceDialog = stuff[1]
+        qtbot.addWidget(te)
+        qtbot.addWidget(d)
+
+        te.setPlainText("ab12\ncd3e")
+        d.regex_check_box.setChecked(True)
+        qtbot.keyClicks(d.find_line_edit, r"[a-z]+|\d+")
+        qtbot.keyClicks(d.replace_line_edit, r"x\g<0>")
+        qtbot.mouseClick(d.replace_all_btn, Qt.LeftButton)
+        assert te.toPlainText() == "xabx12\nxcdx3xe"
+
+    def test_regex_replace(self, stuff, qtbot):
+        te: QPlainTextEdit = stuff[0]
+        d: PlainTextFindReplaceDialog = stuff[1]
+        qtbot.addWidget(te)
+        qtbot.addWidget(d)
+
+        te.setPlainText("a1 b22 c333")
+        d.regex_check_box.setChecked(True)
+        qtbot.keyClicks(d.find_line_edit, r"(\d)\d*")
+        qtbot.keyClicks(d.replace_line_edit, r"<\1>")
+        te.moveCursor(QTextCursor.Start)
+        qtbot.mouseClick(d.replace_btn, Qt.LeftButton)  # find next called
+        qtbot.mouseClick(d.replace_btn, Qt.LeftButton)
+        qtbot.mouseClick(d.replace_btn, Qt.LeftButton)
+        assert te.toPlainText() == "a<1> b<2> c333"
+        assert d.found_info_label.text() == "1 of 1 matches"
+
+    def test_invalid_regex(self, stuff, qtbot):
+        te: QPlainTextEdit = stuff[0]
+        d: PlainTextFindReplaceDialog = stuff[1]
+        qtbot.addWidget(te)
+        qtbot.addWidget(d)
+
+        te.setPlainText("a(b")
+        d.regex_check_box.setChecked(True)
+        qtbot.keyClicks(d.find_line_edit, "(")
+        assert d.found_info_label.text().startswith("Invalid regular expression")
+        qtbot.mouseClick(d.find_next_btn, Qt.LeftButton)
+        assert d.found_info_label.text() == "No matches found"
+
+    def test_batch_replace_all(self, stuff, qtbot):
+        te: QPlainTextEdit = stuff[0]
+        d: PlainTextFindReplaceDialog = stuff[1]
+        qtbot.addWidget(te)
+        qtbot.addWidget(d)
+
+        te.setPlainText("I'm Gonna say um, you know, I wanna\ngonna")
+        d.batch_check_box.setChecked(True)
+        qtbot.keyClicks(d.find_line_edit, "gonna|wanna|um, |you know, ")
+        qtbot.keyClicks(d.replace_line_edit, "going to|want to||")
+        qtbot.mouseClick(d.replace_all_btn, Qt.LeftButton)
+        assert te.toPlainText() == "I'm going to say I want to\ngoing to"
+        assert d.found_info_label.text() == "Made 5 replacements"
+
+    def test_batch_needs_matching_replacements(self, stuff, qtbot):
+        te: QPlainTextEdit = stuff[0]
+        d: PlainTextFindReplaceDialog = stuff[1]
+        qtbot.addWidget(te)
+        qtbot.addWidget(d)
+
+        te.setPlainText("a b c")
+        d.batch_check_box.setChecked(True)
+        qtbot.keyClicks(d.find_line_edit, "a|b|c")
+        qtbot.keyClicks(d.replace_line_edit, "x|y")
+        qtbot.mouseClick(d.replace_all_btn, Qt.LeftButton)
+        assert te.toPlainText() == "a b c"
+        assert d.found_info_label.text() == "Give one replacement, or one per term"
+        qtbot.keyClick(d.replace_line_edit, Qt.Key_Backspace)
+        qtbot.keyClick(d.replace_line_edit, Qt.Key_Backspace)
+        qtbot.mouseClick(d.replace_all_btn, Qt.LeftButton)
+        assert te.toPlainText() == "x x x"
+
+    def test_modes_exclusive(self, stuff, qtbot):
+        d: PlainTextFindReplaceDialog = stuff[1]
+        qtbot.addWidget(d)
+
+        d.regex_check_box.setChecked(True)
+        d.batch_check_box.setChecked(True)
+        assert not d.regex_check_box.isChecked()
+        d.batch_check_box.setChecked(False)
+        assert d.find_mode == LITERAL
 
 class TestInfoLabel(object):
     def test_replace_all_notifies_num_of_replacements(self, stuff, qtbot):
@@ -326,6 +507,40 @@ class TestInfoLabel(object):
         d.whole_word_check_box.setChecked(True)
         assert not d.found_info_label.text()
 
+    def test_counts_matches_while_typing(self, stuff, qtbot):
+        te: QPlainTextEdit = stuff[0]
+        d: PlainTextFindReplaceDialog = stuff[1]
+        qtbot.addWidget(te)
+        qtbot.addWidget(d)
+
+        te.setPlainText("hi hi hi\nhe")
+        qtbot.keyClicks(d.find_line_edit, "h")
+        qtbot.keyClicks(d.find_line_edit, "i")
+        qtbot.waitUntil(lambda: d.found_info_label.text() == "3 matches")
+        assert not d.cursors_needed
+        qtbot.mouseClick(d.find_next_btn, Qt.LeftButton)
+        assert d.found_info_label.text() == "1 of 3 matches"
+
+        d.whole_word_check_box.setChecked(True)
+        qtbot.keyClicks(d.find_line_edit, "x")
+        qtbot.waitUntil(lambda: d.found_info_label.text() == "No matches found")
+
+
+    def test_searches_once_typing_pauses(self, stuff, qtbot, monkeypatch):
+        te: QPlainTextEdit = stuff[0]
+        d: PlainTextFindReplaceDialog = stuff[1]
+        qtbot.addWidget(te)
+        qtbot.addWidget(d)
+
+        snapshots = []
+        te.setPlainText("hi hi hi\nhe")
+        monkeypatch.setattr(te.document(), 'toPlainText', lambda: snapshots.append(1) or "hi hi hi\nhe")
+        qtbot.keyClicks(d.find_line_edit, "hi")
+        d.whole_word_check_box.setChecked(True)
+        assert snapshots == []
+        qtbot.waitUntil(lambda: d.found_info_label.text() == "3 matches")
+        assert snapshots == [1]
+
 
 class TestClose(object):
     def test_clears_highlights_on_close(self, stuff, qtbot):
@@ -341,6 +556,26 @@ class TestClose(object):
         d.reject()
         assert not te.extraSelections()
 
+    def test_stops_following_edits_on_close(self, stuff, qtbot, monkeypatch):
+        te: QPlainTextEdit = stuff[0]
+        d: PlainTextFindReplaceDialog = stuff[1]
+        qtbot.addWidget(te)
+        qtbot.addWidget(d)
+
+        te.setPlainText("hi hi hi")
+        qtbot.keyClicks(d.find_line_edit, "hi")
+        qtbot.mouseClick(d.find_next_btn, Qt.LeftButton)
+        d.reject()
+        rescans = []
+        monkeypatch.setattr('OHTE.plaintext_find_replace_dialog.find_spans', lambda *args: rescans.append(args) or [])
+        QTextCursor(te.document()).insertText("hi ")
+        assert rescans == []
+
+        d.show()
+        qtbot.mouseClick(d.find_next_btn, Qt.LeftButton)  # finds afresh, then follows edits again
+        QTextCursor(te.document()).insertText("hi ")
+        assert len(rescans) == 2
+
 
 class TestFlags(object):
     def test_match_case_flag(self, stuff, qtbot):
@@ -0,0 +1,40 @@
+import unittest
+import random
+import re
+
+from OHTE.aho_corasick import AhoCorasick
+
+
+class TestAhoCorasick(unittest.TestCase):
+    def test_leftmost_longest(self):
+        automaton = AhoCorasick(["he", "she", "hers", "his"])
+        self.assertEqual([m.span() for m in automaton.finditer("ushers and his")], [(1, 4), (11, 14)])
+        self.assertEqual([m.term for m in automaton.finditer("ushers and his")], [1, 3])
+        self.assertEqual(AhoCorasick(["a", "ab", "abcd"]).search("xabcx").span(), (1, 3))
+
+    def test_same_as_regex_alternation(self):
+        rng = random.Random(0)
+        for _ in range(500):
+            terms = [''.join(rng.choice('abc') for _ in range(rng.randint(1, 4))) for _ in range(rng.randint(1, 5))]
+            text = ''.join(rng.choice('abcAB') for _ in range(30))
+            for case_sensitive in [True, False]:
+                automaton = AhoCorasick(terms, case_sensitive)
+                regex = re.compile('|'.join(sorted(map(re.escape, terms), key=len, reverse=True)),
+                                   0 if case_sensitive else re.IGNORECASE)
+                self.assertEqual([m.span() for m in automaton.finditer(text, 3, 25)],
+                                 [m.span() for m in regex.finditer(text, 3, 25)], msg=repr((terms, text)))
+
+    def test_case_insensitive(self):
+        automaton = AhoCorasick(["Gonna", "wanna"], case_sensitive=False)
+        self.assertEqual([m.span() for m in automaton.finditer("GONNA go, Wanna")], [(0, 5), (10, 15)])
+        self.assertEqual(automaton.term_index("WANNA"), 1)
+        self.assertIsNone(AhoCorasick(["Gonna"]).search("gonna"))
+
+    def test_ignores_empty_and_duplicate_terms(self):
+        automaton = AhoCorasick(["", "um", "um"])
+        self.assertEqual([m.term for m in automaton.finditer("um, um")], [1, 1])
+        self.assertIsNone(AhoCorasick([""]).search("abc"))
+
+
+if __name__ == '__main__':
+    unittest.main()
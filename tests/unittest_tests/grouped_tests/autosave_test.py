@@ -0,0 +1,105 @@
+import os
+import json
+import random
+import threading
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from PySide2.QtGui import QTextDocument, QTextCursor
+from PySide2.QtWidgets import QApplication
+
+from OHTE.autosave import Autosave, replay_journal, find_journals, TEXT
+
+app = QApplication.instance() or QApplication([])
+
+
+class TestAutosave(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.document = QTextDocument()
+        self.autosave = Autosave(self.document, self.dir.name)
+
+    def tearDown(self):
+        self.autosave.discard()
+        self.dir.cleanup()
+
+    def edit_randomly(self, rng: random.Random):
+        cursor = QTextCursor(self.document)
+        length = self.document.characterCount() - 1
+        start = rng.randint(0, length)
+        cursor.setPosition(start)
+        cursor.setPosition(rng.randint(start, min(start + 5, length)), QTextCursor.KeepAnchor)
+        cursor.insertText(''.join(rng.choice("ab\n é😀") for _ in range(rng.randint(0, 5))))
+
+    def test_replays_edits(self):
+        rng = random.Random(0)
+        self.document.setPlainText("start\ntext")
+        self.autosave.restart('')
+        for n in range(300):
+            self.edit_randomly(rng)
+            if n % 50 == 0:
+                self.document.setPlainText(self.document.toPlainText()[::-1])  # reports the whole document changed
+            if n % 7 == 0:
+                self.autosave.flush()
+        self.autosave.flush()
+        self.autosave.finish_compaction()
+        self.assertEqual(replay_journal(self.autosave.journal_name), ('', self.document.toPlainText()))
+
+    def test_compacts(self):
+        self.autosave.restart('')
+        with patch('OHTE.autosave.COMPACT_MIN_SIZE', 100):
+            for _ in range(20):
+                QTextCursor(self.document).insertText("ab")
+                self.autosave.flush()
+                QTextCursor(self.document).insertText("c")  # recorded while compacting
+            self.autosave.flush()
+            self.autosave.finish_compaction()
+        self.assertLess(os.path.getsize(self.autosave.journal_name), 400)
+        self.assertEqual(replay_journal(self.autosave.journal_name), ('', "cab" * 20))
+
+    def test_encodes_text_off_the_gui_thread(self):
+        threads = []
+        json_dumps = json.dumps
+
+        def dumps(record):
+            if record[0] == TEXT:
+                threads.append(threading.current_thread())
+            return json_dumps(record)
+
+        self.document.setPlainText("text")
+        with patch('OHTE.autosave.json.dumps', dumps):
+            self.autosave.restart('')
+            self.autosave.finish_compaction()
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.main_thread())
+        self.assertEqual(replay_journal(self.autosave.journal_name), ('', "text"))
+
+    def test_starts_from_saved_file(self):
+        file_name = os.path.join(self.dir.name, 'saved.txt')
+        with open(file_name, 'w') as f:
+            f.write("saved\n")
+        self.document.setPlainText("saved\n")
+        self.document.setModified(False)
+        self.autosave.restart(file_name)
+        self.assertIsNone(replay_journal(self.autosave.journal_name))  # nothing to recover
+
+        QTextCursor(self.document).insertText("un")
+        self.autosave.flush()
+        self.assertEqual(replay_journal(self.autosave.journal_name), (file_name, "unsaved\n"))
+
+        with open(file_name, 'w') as f:
+            f.write("changed on disk")
+        self.assertIsNone(replay_journal(self.autosave.journal_name))
+
+    def test_journal_locked_while_in_use(self):
+        self.autosave.restart('')
+        self.autosave.finish_compaction()
+        self.assertEqual(find_journals(self.dir.name), [])
+        self.autosave.lock.unlock()
+        self.assertEqual(find_journals(self.dir.name), [self.autosave.journal_name])
+
+    def test_discard(self):
+        self.autosave.restart('')
+        self.autosave.discard()
+        self.assertEqual(os.listdir(self.dir.name), [])
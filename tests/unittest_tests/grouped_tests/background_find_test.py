@@ -0,0 +1,72 @@
+import unittest
+import random
+from unittest.mock import patch
+
+from PySide2.QtGui import QTextDocument, QTextCursor
+from PySide2.QtWidgets import QApplication
+
+from OHTE.background_find import BackgroundFind, find_pattern, find_spans
+from OHTE.plaintext_find_replace_dialog import PlainTextFindReplaceDialog
+
+app = QApplication.instance() or QApplication([])
+
+
+def qt_spans(text: str, document: QTextDocument, flags) -> list:
+    return [(cur.selectionStart(), cur.selectionEnd())
+            for cur in PlainTextFindReplaceDialog.find_all(text, document, flags)]
+
+
+def our_spans(text: str, document: QTextDocument, flags, chunk_size=3) -> list:
+    spans = find_spans(find_pattern(text, flags), document.toPlainText(), bool(flags & QTextDocument.FindWholeWords),
+                       chunk_size)
+    return [span for chunk in spans for span in chunk]
+
+
+def all_flags() -> list:
+    """Every combination of the flags `find_spans` honours. ORed as ints, which every PySide2 build supports."""
+    case, whole = int(QTextDocument.FindCaseSensitively), int(QTextDocument.FindWholeWords)
+    return [QTextDocument.FindFlags(flags) for flags in (0, case, whole, case | whole)]
+
+
+class TestFindSpans(unittest.TestCase):
+    def test_same_as_document_find(self):
+        rng = random.Random(0)
+        flag_combinations = all_flags()
+        chars = "aAb _.\n1 é😀\u00a0"
+        for _ in range(200):
+            document = QTextDocument()
+            QTextCursor(document).insertText(''.join(rng.choice(chars) for _ in range(40)))
+            text = ''.join(rng.choice("aAb.1 ") for _ in range(rng.randint(1, 2)))
+            for flags in flag_combinations:
+                self.assertEqual(our_spans(text, document, flags), qt_spans(text, document, flags),
+                                 msg=repr((document.toPlainText(), text, int(flags))))
+
+    def test_cancelled(self):
+        self.assertEqual(list(find_spans(find_pattern("a"), "a\na\na", chunk_size=1, cancelled=lambda: True)), [])
+
+
+class TestBackgroundFind(unittest.TestCase):
+    def test_found(self):
+        results = []
+        background_find = BackgroundFind(find_pattern("hi"), "hi hi\nhi" * 1000)
+        background_find.found.connect(results.append)
+        background_find.start()
+        background_find._thread.join()
+        app.processEvents()
+        self.assertEqual(len(results[0]), 3000)
+        self.assertEqual(results[0].span(2), (6, 8))
+
+    def test_cancel(self):
+        results = []
+        background_find = BackgroundFind(find_pattern("hi"), "hi hi\n" * 100000)
+        background_find.found.connect(results.append)
+        background_find.start()
+        with patch.object(background_find._thread, 'join', side_effect=AssertionError("cancel waited")):
+            background_find.cancel()
+        background_find._thread.join()
+        app.processEvents()
+        self.assertEqual(results, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import os
+import json
+
+from OHTE.dict_builder import build_dict_file, main
+from OHTE.dict_file import open_dict_file
+from OHTE.regex_map import create_regex_map
+
+
+class TestBuilder(unittest.TestCase):
+    def setUp(self) -> None:
+        self.src = ['test_words1.txt', 'test_words2.txt']
+        self.dest = 'test_out.bin'
+        self.json_dest = 'test_out.json'
+        word_lists = [["may", "cat", "the", "a", "ax", "Hi", "hi", "cat"], ["A", "he", "May", "hi", "axe", "bob"]]
+        for file_name, words in zip(self.src, word_lists):
+            with open(file_name, 'w') as f:
+                for word in words:
+                    f.write("%s\n" % word)
+
+    def tearDown(self) -> None:
+        for file_name in self.src + [self.dest, self.json_dest]:
+            if os.path.exists(file_name):
+                os.remove(file_name)
+
+    def expected(self, keep_capitals):
+        create_regex_map(self.src, list(keep_capitals), self.json_dest)
+        with open(self.json_dest) as f:
+            return json.load(f)
+
+    def test_same_as_create_regex_map(self):
+        for keep_capitals in [[True, True], [True, False], [False]]:
+            for processes in [1, 2]:
+                with self.subTest(keep_capitals=keep_capitals, processes=processes):
+                    count = build_dict_file(self.src, keep_capitals, self.dest, processes=processes, chunk_size=3)
+                    built = dict(open_dict_file(self.dest).items())
+                    self.assertEqual(built, self.expected(keep_capitals))
+                    self.assertEqual(count, len(built))
+
+    def test_progress(self):
+        reports = []
+        build_dict_file(self.src, [True], self.dest, processes=1, chunk_size=4,
+                        progress=lambda read, total: reports.append((read, total)))
+        total = sum(os.path.getsize(file_name) for file_name in self.src)
+        self.assertEqual(len(reports), 4)
+        self.assertEqual(reports[-1], (total, total))
+        self.assertEqual(reports, sorted(reports))
+
+    def test_word_list_not_in_locale_encoding(self):
+        with open(self.src[1], 'wb') as f:
+            f.write("café\nna\xefve\nbob\n".encode('latin-1'))
+        first_list_count = build_dict_file(self.src[:1], [True], self.dest, processes=1)
+        for processes in [1, 2]:
+            with self.subTest(processes=processes):
+                self.assertEqual(build_dict_file(self.src, [True, True], self.dest, processes=processes),
+                                 first_list_count + 3)
+                self.assertEqual(open_dict_file(self.dest)['bwb'], {'default': 'bob', 'words': ['bob']})
+
+    def test_cli(self):
+        main([self.dest, '-w', self.src[0], '-l', self.src[1], '-j', '1', '-q'])
+        self.assertEqual(dict(open_dict_file(self.dest).items()), self.expected([True, False]))
+
+
+if __name__ == '__main__':
+    unittest.main()
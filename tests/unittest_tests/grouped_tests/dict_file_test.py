@@ -0,0 +1,146 @@
+import unittest
+from unittest.mock import patch
+import os
+import json
+
+from OHTE.dict_file import open_dict_file, write_dict_file, convert_json_dict, encode_entry, _KeyTable
+from OHTE.regex_map import (create_regex_map, map_string_to_word, add_word_to_dict, del_word_from_dict,
+                            set_entry_default)
+
+
+class TestRoundTrip(unittest.TestCase):
+    def setUp(self) -> None:
+        self.src = 'test_words.txt'
+        self.dest = 'test_out.bin'
+        words = ["may", "cat", "the", "a", "ax", "Hi", "hi"]
+        with open(self.src, 'w') as f:
+            for word in words:
+                f.write("%s\n" % word)
+        create_regex_map([self.src], [True], self.dest)
+        self.regex_map = open_dict_file(self.dest)
+
+    def tearDown(self) -> None:
+        os.remove(self.src)
+        os.remove(self.dest)
+
+    def test_lookups(self):
+        self.assertEqual(self.regex_map['cat'], {'default': 'may', 'words': ['may', 'cat']})
+        self.assertEqual(self.regex_map.get('ge'), {'default': 'Hi', 'words': ['Hi', 'hi']})
+        self.assertIsNone(self.regex_map.get('kwyjibo'))
+        self.assertNotIn('kwyjibo', self.regex_map)
+        self.assertEqual(len(self.regex_map), 5)
+        self.assertEqual(sorted(self.regex_map), ['a', 'ax', 'cat', 'ge', 'tge'])
+
+    def test_mapping_functions(self):
+        self.assertEqual(map_string_to_word('mat', self.regex_map), 'may')
+        self.assertEqual(map_string_to_word(';,', self.regex_map), 'ax')
+        self.assertEqual(map_string_to_word(';,.,;', self.regex_map), 'ax.,;')
+        self.assertEqual(map_string_to_word('ax:<>AZX', self.regex_map), 'ax:<>:><')
+        self.assertEqual(map_string_to_word('Catz', self.regex_map), 'May.')
+        self.assertIsNone(map_string_to_word('caz', self.regex_map))
+
+    def test_key_index_kept_current(self):
+        self.assertEqual(map_string_to_word('axz', self.regex_map), 'ax.')
+        add_word_to_dict('ax.', self.regex_map)
+        self.assertEqual(map_string_to_word('axz', self.regex_map), 'ax.')
+        self.assertEqual(map_string_to_word('axzz', self.regex_map), 'ax..')
+        del_word_from_dict('ax', self.regex_map)
+        del_word_from_dict('a', self.regex_map)
+        self.assertEqual(map_string_to_word('axz', self.regex_map), 'ax.')
+        self.assertIsNone(map_string_to_word('ax,', self.regex_map))
+        self.assertIsNone(map_string_to_word('a,', self.regex_map))
+
+    def test_entries_replaced(self):
+        entry = self.regex_map['cat']
+        self.assertTrue(set_entry_default('cat', self.regex_map))
+        self.assertEqual(self.regex_map['cat']['default'], 'cat')
+        self.assertEqual(entry['default'], 'may')
+
+    def test_add_and_delete(self):
+        add_word_to_dict('bob', self.regex_map)
+        self.assertEqual(self.regex_map['bwb'], {'default': 'bob', 'words': ['bob']})
+        self.assertEqual(len(self.regex_map), 6)
+        del_word_from_dict('a', self.regex_map)
+        self.assertNotIn('a', self.regex_map)
+        self.assertEqual(len(self.regex_map), 5)
+        del_word_from_dict('bob', self.regex_map)
+        self.assertEqual(len(self.regex_map), 4)
+        add_word_to_dict('a', self.regex_map)
+        self.assertEqual(len(self.regex_map), 5)
+        self.assertEqual(sorted(self.regex_map), ['a', 'ax', 'cat', 'ge', 'tge'])
+
+    def test_write_back(self):
+        add_word_to_dict('bob', self.regex_map)
+        del_word_from_dict('the', self.regex_map)
+        set_entry_default('cat', self.regex_map)
+        expected = dict(self.regex_map.items())
+        write_dict_file(self.regex_map, self.dest)
+        self.assertEqual(dict(open_dict_file(self.dest).items()), expected)
+
+    def test_write_back_lets_go_of_file(self):
+        add_word_to_dict('bob', self.regex_map)
+        closed_on_replace = []
+        replace = os.replace
+
+        def replace_spy(src, dest):
+            closed_on_replace.append(self.regex_map._mm.closed)
+            replace(src, dest)
+
+        with patch('OHTE.dict_file.os.replace', replace_spy):
+            write_dict_file(self.regex_map, self.dest)
+        self.assertEqual(closed_on_replace, [True])
+        self.assertIn('bwb', open_dict_file(self.dest))
+
+    def test_write_elsewhere_keeps_map(self):
+        other = self.dest + '.copy'
+        write_dict_file(self.regex_map, other)
+        os.remove(other)
+        self.assertEqual(self.regex_map['cat'], {'default': 'may', 'words': ['may', 'cat']})
+
+    def test_write_back_encodes_only_changes(self):
+        add_word_to_dict('bob', self.regex_map)
+        del_word_from_dict('the', self.regex_map)
+        set_entry_default('cat', self.regex_map)
+        self.regex_map.get('ge')  # decoded, but unchanged
+        with patch('OHTE.dict_file.encode_entry', wraps=encode_entry) as encode_spy:
+            records = list(self.regex_map.iter_records())
+        self.assertEqual(encode_spy.call_count, 2)
+        self.assertEqual([key for key, _ in records], [b'a', b'ax', b'bwb', b'cat', b'ge'])
+        self.assertEqual(records[3], (b'cat', b'cat\nmay\ncat'))
+
+
+    def test_key_index_reads_only_keys_searched(self):
+        write_dict_file({'k{:05}'.format(n): {'default': 'k', 'words': ['k']} for n in range(10000)}, self.dest)
+        regex_map = open_dict_file(self.dest)
+        reads = []
+        get_key = _KeyTable.__getitem__
+        with patch.object(_KeyTable, '__getitem__', lambda table, i: reads.append(i) or get_key(table, i)):
+            self.assertEqual(regex_map.key_index.longest_prefix('k01234zz'), 'k01234')
+            self.assertEqual(regex_map['k05000'], {'default': 'k', 'words': ['k']})
+        self.assertLess(len(reads), 30)
+
+class TestConversion(unittest.TestCase):
+    def setUp(self) -> None:
+        self.src = 'test_out.json'
+        self.dest = 'test_out.bin'
+        self.regex_map = {'cat': {'default': 'cat', 'words': ['may', 'cat']}, 'a': {'default': 'a', 'words': ['a']}}
+        with open(self.src, 'w') as f:
+            json.dump(self.regex_map, f)
+
+    def tearDown(self) -> None:
+        os.remove(self.src)
+        os.remove(self.dest)
+
+    def test_convert(self):
+        convert_json_dict(self.src, self.dest)
+        self.assertEqual(dict(open_dict_file(self.dest).items()), self.regex_map)
+
+    def test_rejects_other_files(self):
+        with open(self.dest, 'w') as f:
+            f.write("{}")
+        with self.assertRaises(ValueError):
+            open_dict_file(self.dest)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+from unittest.mock import patch
+import os
+
+from OHTE.dict_journal import DictJournal, ADD, DELETE, SET_DEFAULT
+from OHTE.dict_file import open_dict_file
+from OHTE import regex_map as regex_map_module
+from OHTE.regex_map import create_regex_map, map_word_to_entry
+
+
+class TestJournal(unittest.TestCase):
+    def setUp(self) -> None:
+        self.src = 'test_words.txt'
+        self.dest = 'test_out.bin'
+        self.journal_src = 'test_out.journal'
+        words = ["may", "cat", "the"]
+        with open(self.src, 'w') as f:
+            for word in words:
+                f.write("%s\n" % word)
+        create_regex_map([self.src], [True], self.dest)
+        self.journal = DictJournal(self.journal_src)
+
+    def tearDown(self) -> None:
+        self.journal.close()
+        for f in [self.src, self.dest, self.dest + '.compact', self.journal_src, self.journal.old_file_name]:
+            if os.path.exists(f):
+                os.remove(f)
+
+    def record_changes(self):
+        self.journal.record(ADD, 'bob')
+        self.journal.record(DELETE, 'the')
+        self.journal.record(SET_DEFAULT, 'Cat')
+        self.journal.close()
+
+    def test_replay(self):
+        self.record_changes()
+        regex_map = open_dict_file(self.dest)
+        self.assertEqual(DictJournal(self.journal_src).replay(regex_map), 3)
+        self.assertEqual(dict(regex_map.items()), {'bwb': {'default': 'bob', 'words': ['bob']},
+                                                   'cat': {'default': 'cat', 'words': ['may', 'cat']}})
+
+    def test_replay_missing_journal(self):
+        regex_map = open_dict_file(self.dest)
+        self.assertEqual(self.journal.replay(regex_map), 0)
+        self.assertEqual(len(regex_map), 2)
+
+    def test_ignores_torn_write(self):
+        self.record_changes()
+        with open(self.journal_src, 'a') as f:
+            f.write('["add", "ma')
+        regex_map = open_dict_file(self.dest)
+        self.assertEqual(DictJournal(self.journal_src).replay(regex_map), 3)
+
+    def test_compact(self):
+        self.record_changes()
+        expected = open_dict_file(self.dest)
+        self.journal.replay(expected)
+
+        self.journal.compact(self.dest, self.dest).join()
+        self.assertEqual(self.journal.finish_compaction(), self.dest)
+        self.assertFalse(os.path.exists(self.journal_src))
+        self.assertFalse(os.path.exists(self.journal.old_file_name))
+        self.assertEqual(dict(open_dict_file(self.dest).items()), dict(expected.items()))
+
+    def test_compact_keeps_new_changes(self):
+        self.record_changes()
+        thread = self.journal.compact(self.dest, self.dest)
+        self.journal.record(ADD, 'bwb')
+        self.assertEqual(self.journal.finish_compaction(), self.dest)
+        self.journal.close()
+
+        regex_map = open_dict_file(self.dest)
+        DictJournal(self.journal_src).replay(regex_map)
+        self.assertEqual(regex_map['bwb'], {'default': 'bob', 'words': ['bob', 'bwb']})
+
+    def test_compaction_left_for_next_launch_if_base_cannot_be_replaced(self):
+        self.record_changes()
+        expected = open_dict_file(self.dest)
+        self.journal.replay(expected)
+        self.journal.compact(self.dest, self.dest).join()
+        with patch('OHTE.dict_journal.os.replace', side_effect=PermissionError("mapped")):
+            self.assertEqual(self.journal.finish_compaction(), '')
+        self.assertTrue(os.path.exists(self.dest + '.compact'))
+        self.assertTrue(os.path.exists(self.journal.old_file_name))
+
+        journal = DictJournal(self.journal_src)
+        self.assertTrue(journal.install_compaction(self.dest))
+        self.assertFalse(os.path.exists(self.journal.old_file_name))
+        self.assertEqual(dict(open_dict_file(self.dest).items()), dict(expected.items()))
+        self.assertFalse(journal.install_compaction(self.dest))
+
+    def test_compact_nothing(self):
+        self.assertIsNone(self.journal.compact(self.dest, self.dest))
+        self.assertEqual(self.journal.finish_compaction(), '')
+
+    def test_compact_leaves_base_until_finished(self):
+        self.record_changes()
+        with open(self.dest, 'rb') as f:
+            base = f.read()
+        live = open_dict_file(self.dest)
+        map_word_to_entry('cat', live)
+        views = dict(regex_map_module._entry_views)
+
+        self.journal.compact(self.dest, self.dest).join()
+        with open(self.dest, 'rb') as f:
+            self.assertEqual(f.read(), base)
+        self.assertTrue(os.path.exists(self.journal.old_file_name))
+        self.assertEqual(regex_map_module._entry_views, views)
+        self.assertEqual(dict(live.items()), dict(open_dict_file(self.dest).items()))
+
+        self.journal.finish_compaction()
+        self.assertEqual(sorted(open_dict_file(self.dest)), ['bwb', 'cat'])
+        self.assertNotIn('bwb', live)  # still reads the base it mapped
+        self.assertFalse(os.path.exists(self.dest + '.compact'))
+
+
+if __name__ == '__main__':
+    unittest.main()
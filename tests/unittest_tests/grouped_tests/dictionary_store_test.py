@@ -0,0 +1,112 @@
+import unittest
+import os
+
+from OHTE.dictionary_store import DictionaryStore
+from OHTE.dict_file import open_dict_file
+from OHTE import regex_map as regex_map_module
+from OHTE.regex_map import (create_regex_map, map_string_to_word, map_word_to_entry, add_word_to_dict,
+                            del_word_from_dict, set_entry_default)
+
+
+class TestDictionaryStore(unittest.TestCase):
+    def setUp(self) -> None:
+        self.regex_map = {'cat': {'default': 'may', 'words': ['may', 'cat']}, 'a': {'default': 'a', 'words': ['a']}}
+        self.store = DictionaryStore(self.regex_map)
+        self.changes = []
+        self.store.changed.connect(self.changes.append)
+
+    def test_lookups(self):
+        self.assertEqual(map_string_to_word('mat', self.store), 'may')
+        self.assertEqual(map_word_to_entry('cat', self.store).words, ('may', 'cat', 'May', 'Cat'))
+        self.assertEqual(len(self.store), 2)
+        self.assertEqual(sorted(self.store), ['a', 'cat'])
+
+    def test_tracks_dirty_keys(self):
+        self.assertTrue(add_word_to_dict('bob', self.store))
+        self.assertTrue(del_word_from_dict('a', self.store))
+        self.assertTrue(set_entry_default('cat', self.store))
+        self.assertFalse(add_word_to_dict('cat', self.store))
+        self.assertEqual(self.store.dirty, {'bwb', 'a', 'cat'})
+        self.assertEqual(self.changes, ['bwb', 'a', 'cat'])
+        self.assertEqual(self.regex_map, {'cat': {'default': 'cat', 'words': ['may', 'cat']},
+                                          'bwb': {'default': 'bob', 'words': ['bob']}})
+        self.store.mark_clean()
+        self.assertFalse(self.store.dirty)
+
+    def test_snapshot(self):
+        snapshot = self.store.snapshot()
+        add_word_to_dict('bob', self.store)
+        add_word_to_dict('mat', self.store)
+        del_word_from_dict('a', self.store)
+        self.assertEqual(dict(snapshot.items()), {'cat': {'default': 'may', 'words': ['may', 'cat']},
+                                                  'a': {'default': 'a', 'words': ['a']}})
+        self.assertEqual(len(snapshot), 2)
+        self.assertNotIn('bwb', snapshot)
+        self.assertEqual(map_string_to_word('mat', snapshot), 'may')
+        self.assertEqual(self.store['cat']['words'], ['may', 'cat', 'mat'])
+
+    def test_snapshot_keeps_first_value(self):
+        snapshot = self.store.snapshot()
+        set_entry_default('cat', self.store)
+        set_entry_default('may', self.store)
+        self.assertEqual(snapshot['cat']['default'], 'may')
+        later = self.store.snapshot()
+        del_word_from_dict('cat', self.store)
+        self.assertEqual(later['cat']['words'], ['may', 'cat'])
+        self.assertEqual(snapshot['cat']['words'], ['may', 'cat'])
+
+    def test_dropped_snapshots_cost_nothing(self):
+        self.store.snapshot()
+        add_word_to_dict('bob', self.store)
+        self.assertEqual(len(self.store._snapshots), 0)
+
+    def test_drops_entry_views_of_changes(self):
+        map_word_to_entry('cat', self.store)
+        self.assertIn(('cat', False), regex_map_module._entry_views)
+        set_entry_default('cat', self.store)
+        self.assertNotIn(('cat', False), regex_map_module._entry_views)
+        self.assertEqual(map_word_to_entry('cat', self.store).default, 'cat')
+
+    def test_remap(self):
+        snapshot = self.store.snapshot()
+        regex_map = {'cat': {'default': 'cat', 'words': ['may', 'cat']}}
+        self.store.remap(regex_map)
+        self.assertIs(self.store.regex_map, regex_map)
+        self.assertIs(self.store.word_cache.regex_map, regex_map)
+        add_word_to_dict('bob', self.store)
+        self.assertIn('bwb', regex_map)
+        self.assertEqual(dict(snapshot.items()), {'cat': {'default': 'may', 'words': ['may', 'cat']},
+                                                  'a': {'default': 'a', 'words': ['a']}})
+
+
+class TestMappedStore(unittest.TestCase):
+    def setUp(self) -> None:
+        self.src = 'test_words.txt'
+        self.dest = 'test_out.bin'
+        with open(self.src, 'w') as f:
+            for word in ["may", "cat", "ax", "a"]:
+                f.write("%s\n" % word)
+        create_regex_map([self.src], [True], self.dest)
+        self.store = DictionaryStore(open_dict_file(self.dest))
+
+    def tearDown(self) -> None:
+        os.remove(self.src)
+        os.remove(self.dest)
+
+    def test_uses_key_index(self):
+        self.assertIs(self.store.key_index, self.store.regex_map.key_index)
+        self.assertEqual(map_string_to_word(';,.', self.store), 'ax.')
+        add_word_to_dict('ax.', self.store)
+        self.assertEqual(map_string_to_word(';,.', self.store), 'ax.')
+        self.assertEqual(map_string_to_word(';,..', self.store), 'ax..')
+
+    def test_snapshot(self):
+        snapshot = self.store.snapshot()
+        del_word_from_dict('ax', self.store)
+        self.assertNotIn('ax', self.store)
+        self.assertEqual(map_string_to_word(';,', snapshot), 'ax')
+        self.assertEqual(sorted(snapshot), ['a', 'ax', 'cat'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import unittest
+
+from PySide2.QtCore import QFile
+from PySide2.QtGui import QTextDocument
+from PySide2.QtWidgets import QApplication
+
+from OHTE.file_loader import FileLoader
+
+app = QApplication.instance() or QApplication([])
+
+
+class TestFileLoader(unittest.TestCase):
+    file_name = 'test_loader.txt'
+
+    def setUp(self):
+        self.text = ''.join("línea {} 😀\n".format(n) for n in range(50)) + "no newline at end"
+        with open(self.file_name, 'w', encoding='utf-8') as f:
+            f.write(self.text)
+        self.file = QFile(self.file_name)
+        self.file.open(QFile.ReadOnly | QFile.Text)
+        self.document = QTextDocument()
+        self.loader = FileLoader(self.file, self.document, chunk_size=100)
+        self.finished = []
+        self.first_chunk = self.text.encode('utf-8')[:100].decode('utf-8', 'ignore')  # less the split 😀
+        self.loader.finished.connect(lambda: self.finished.append(True))
+
+    def tearDown(self):
+        self.file.close()
+        os.remove(self.file_name)
+
+    def test_first_chunk_at_once(self):
+        self.loader.start()
+        self.assertTrue(self.loader.loading)
+        self.assertEqual(self.document.toPlainText(), self.first_chunk)
+
+    def test_loads_whole_file(self):
+        progress = []
+        self.loader.progress.connect(lambda bytes_read, size: progress.append((bytes_read, size)))
+        self.loader.start()
+        while self.loader.loading:
+            app.processEvents()
+        self.assertEqual(self.document.toPlainText(), self.text)
+        self.assertEqual(self.finished, [True])
+        self.assertEqual(progress[-1], (len(self.text.encode('utf-8')),) * 2)
+        self.assertTrue(self.document.isUndoRedoEnabled())
+        self.assertFalse(self.document.isUndoAvailable())
+        self.assertFalse(self.file.isOpen())
+
+    def test_whole_file_in_first_chunk(self):
+        self.loader.chunk_size = 10 ** 6
+        self.loader.start()
+        self.assertFalse(self.loader.loading)
+        self.assertEqual(self.finished, [True])
+        self.assertEqual(self.document.toPlainText(), self.text)
+
+    def test_cancel(self):
+        self.loader.start()
+        self.loader.cancel()
+        app.processEvents()
+        self.assertFalse(self.loader.loading)
+        self.assertEqual(self.finished, [])
+        self.assertEqual(self.document.toPlainText(), self.first_chunk)
+        self.assertTrue(self.document.isUndoRedoEnabled())
@@ -0,0 +1,41 @@
+import os
+import tempfile
+import unittest
+
+from PySide2.QtWidgets import QApplication
+
+from OHTE.file_saver import FileSaver
+
+app = QApplication.instance() or QApplication([])
+
+
+class TestFileSaver(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.file_name = os.path.join(self.dir.name, 'saved.txt')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_saves_in_chunks(self):
+        text = "línea 😀\n" * 10
+        saver = FileSaver(self.file_name, text, chunk_size=7)
+        saver.start()
+        self.assertEqual(saver.wait(), '')
+        with open(self.file_name, 'rb') as f:
+            self.assertEqual(f.read(), text.encode('utf-8'))
+
+    def test_replaces_whole_file(self):
+        with open(self.file_name, 'w') as f:
+            f.write("old text, longer than the new")
+        saver = FileSaver(self.file_name, "new")
+        saver.start()
+        saver.wait()
+        with open(self.file_name) as f:
+            self.assertEqual(f.read(), "new")
+        self.assertEqual(os.listdir(self.dir.name), ['saved.txt'])
+
+    def test_error(self):
+        saver = FileSaver(os.path.join(self.dir.name, 'missing', 'saved.txt'), "text")
+        saver.start()
+        self.assertTrue(saver.wait().startswith("Cannot open file"))
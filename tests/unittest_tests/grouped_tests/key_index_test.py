@@ -0,0 +1,65 @@
+import unittest
+import random
+
+from OHTE.key_index import KeyIndex
+
+
+class TestKeyIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        self.index = KeyIndex(['ax', 'a', 'tge', 'cat', 'ge'])
+
+    def test_longest_prefix(self):
+        self.assertEqual(self.index.longest_prefix('axzxa'), 'ax')
+        self.assertEqual(self.index.longest_prefix('azzz'), 'a')
+        self.assertEqual(self.index.longest_prefix('tgez'), 'tge')
+        self.assertEqual(self.index.longest_prefix('ca'), None)
+        self.assertEqual(self.index.longest_prefix(''), None)
+        self.assertEqual(self.index.longest_prefix('axz', min_len=3), None)
+        self.assertEqual(self.index.longest_prefix('axz', min_len=2), 'ax')
+
+    def test_add_and_remove(self):
+        self.index.add('axz')
+        self.index.add('axz')
+        self.assertEqual(len(self.index), 6)
+        self.assertEqual(self.index.longest_prefix('axzxa'), 'axz')
+        self.index.remove('axz')
+        self.index.remove('axz')
+        self.index.remove('ax')
+        self.assertEqual(len(self.index), 4)
+        self.assertNotIn('ax', self.index)
+        self.assertIn('a', self.index)
+        self.assertEqual(self.index.longest_prefix('axzxa'), 'a')
+
+    def test_same_as_brute_force(self):
+        rng = random.Random(0)
+        keys = {''.join(rng.choice('axz') for _ in range(rng.randint(1, 6))) for _ in range(60)}
+        index = KeyIndex(keys)
+        for _ in range(2000):
+            s = ''.join(rng.choice('axz') for _ in range(rng.randint(0, 8)))
+            min_len = rng.randint(1, 4)
+            prefixes = [s[:end] for end in range(len(s), min_len - 1, -1) if s[:end] in keys]
+            self.assertEqual(index.longest_prefix(s, min_len), prefixes[0] if prefixes else None, msg=s)
+
+
+    def test_base_with_overlay_same_as_brute_force(self):
+        rng = random.Random(1)
+        base = sorted({''.join(rng.choice('axz') for _ in range(rng.randint(1, 6))) for _ in range(60)})
+        keys = set(base)
+        index = KeyIndex(base=tuple(base))
+        for _ in range(2000):
+            key = ''.join(rng.choice('axz') for _ in range(rng.randint(1, 6)))
+            if rng.random() < 0.5:
+                index.add(key)
+                keys.add(key)
+            else:
+                index.remove(key)
+                keys.discard(key)
+            self.assertEqual(len(index), len(keys))
+            s = ''.join(rng.choice('axz') for _ in range(rng.randint(0, 8)))
+            prefixes = [s[:end] for end in range(len(s), 0, -1) if s[:end] in keys]
+            self.assertEqual(index.longest_prefix(s), prefixes[0] if prefixes else None, msg=s)
+            self.assertEqual(s in index, s in keys)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import re
+import random
+import unittest
+from unittest.mock import patch
+
+from OHTE.large_file_viewer import LineIndex, find_in_mapped, LINE_STRIDE
+
+
+class TestLineIndex(unittest.TestCase):
+    def test_same_as_splitting(self):
+        rng = random.Random(0)
+        for _ in range(50):
+            data = ''.join(rng.choice("ab\n") for _ in range(rng.randint(0, 3 * LINE_STRIDE))).encode()
+            index = LineIndex()
+            index.build(data, chunk_size=rng.randint(1, 10))
+            self.assertTrue(index.complete)
+
+            starts = [0] + [m.end() for m in re.finditer(b'\n', data)]
+            self.assertEqual(index.line_count, len(starts))
+            for line, start in enumerate(starts):
+                self.assertEqual(index.line_start(data, line), start)
+            for offset in range(len(data) + 1):
+                self.assertEqual(index.line_at(data, offset), data[:offset].count(b'\n'))
+
+    def test_steps_over_no_long_line(self):
+        rng = random.Random(0)
+        with patch('OHTE.large_file_viewer.MAX_LINE_LENGTH', 8):
+            for _ in range(50):
+                data = b'\n'.join(b'a' * rng.choice([0, 1, 2, 8, 30]) for _ in range(rng.randint(1, 3 * LINE_STRIDE)))
+                index = LineIndex()
+                index.build(data, chunk_size=rng.randint(1, 40))
+                searched = []
+                recorder = _FindRecorder(data, searched)
+
+                starts = [0] + [m.end() for m in re.finditer(b'\n', data)]
+                self.assertEqual(index.line_count, len(starts))
+                for line, start in enumerate(starts):
+                    self.assertEqual(index.line_start(recorder, line), start)
+                self.assertTrue(all(end - start <= 8 for start, end in searched), msg=data)
+
+    def test_cancelled(self):
+        index = LineIndex()
+        index.build(b"a\nb\n", cancelled=lambda: True)
+        self.assertFalse(index.complete)
+        self.assertEqual(index.line_count, 1)
+
+
+class _FindRecorder(object):
+    """Bytes that record how far each `find` of a newline went."""
+
+    def __init__(self, data: bytes, searched: list):
+        self.data = data
+        self.searched = searched
+
+    def find(self, sub: bytes, start: int) -> int:
+        found = self.data.find(sub, start)
+        self.searched.append((start, found))
+        return found
+
+
+class TestFindInMapped(unittest.TestCase):
+    data = b"cat\ndog cat\n\ncAt dog\n"
+    pattern = re.compile(b'cat', re.IGNORECASE)
+
+    def test_next(self):
+        for chunk_size in (1, 5, 100):
+            self.assertEqual(find_in_mapped(self.data, self.pattern, 0, chunk_size=chunk_size), (0, 3))
+            self.assertEqual(find_in_mapped(self.data, self.pattern, 3, chunk_size=chunk_size), (8, 11))
+            self.assertEqual(find_in_mapped(self.data, self.pattern, 11, chunk_size=chunk_size), (13, 16))
+            self.assertEqual(find_in_mapped(self.data, self.pattern, 16, chunk_size=chunk_size), (0, 3))  # wraps
+
+    def test_prev(self):
+        for chunk_size in (1, 5, 100):
+            self.assertEqual(find_in_mapped(self.data, self.pattern, 13, True, chunk_size=chunk_size), (8, 11))
+            self.assertEqual(find_in_mapped(self.data, self.pattern, 8, True, chunk_size=chunk_size), (0, 3))
+            self.assertEqual(find_in_mapped(self.data, self.pattern, 0, True, chunk_size=chunk_size), (13, 16))
+
+    def test_none(self):
+        self.assertIsNone(find_in_mapped(self.data, re.compile(b'cow'), 5))
+        self.assertIsNone(find_in_mapped(self.data, self.pattern, 5, cancelled=lambda: True))
@@ -0,0 +1,133 @@
+import unittest
+from unittest.mock import patch
+import os
+import json
+
+from PySide2.QtCore import Qt
+from PySide2.QtWidgets import QApplication, QFileDialog
+from PySide2.QtTest import QTest
+
+from OHTE.latency import (LatencyRecorder, percentile, KEY_PRESS, PROCESS_PREVIOUS_WORD, MAP_STRING_TO_WORD,
+                          SETUP_WORDCHECK)
+from OHTE.latency_dialog import LatencyDialog
+from OHTE.textedit import MyPlainTextEdit
+
+
+def setUpModule():
+    if QApplication.instance() is None:
+        app = QApplication([])
+
+
+class TestRecorder(unittest.TestCase):
+    def setUp(self) -> None:
+        self.recorder = LatencyRecorder(capacity=100)
+        self.recorder.enabled = True
+
+    def tearDown(self) -> None:
+        if os.path.exists('test_latency.json'):
+            os.remove('test_latency.json')
+
+    def test_percentile(self):
+        samples = list(range(1, 101))
+        self.assertEqual(percentile(samples, 50), 50)
+        self.assertEqual(percentile(samples, 99), 99)
+        self.assertEqual(percentile([3], 95), 3)
+
+    def test_stats(self):
+        for ms in range(1, 101):
+            self.recorder.record(KEY_PRESS, ms / 1000)
+        stats = self.recorder.stats()[KEY_PRESS]
+        self.assertEqual(stats['count'], 100)
+        self.assertAlmostEqual(stats['p50'], 50)
+        self.assertAlmostEqual(stats['p95'], 95)
+        self.assertAlmostEqual(stats['p99'], 99)
+        self.assertAlmostEqual(stats['max'], 100)
+
+    def test_ring_buffer_keeps_latest(self):
+        for ms in range(1, 251):
+            self.recorder.record(KEY_PRESS, ms / 1000)
+        stats = self.recorder.stats()[KEY_PRESS]
+        self.assertEqual(stats['count'], 250)
+        self.assertAlmostEqual(stats['p50'], 200)
+        self.recorder.export('test_latency.json')
+        with open('test_latency.json') as f:
+            exported = json.load(f)
+        samples = exported['samples_ms'][KEY_PRESS]
+        self.assertEqual(len(samples), 100)
+        self.assertAlmostEqual(samples[0], 151)
+        self.assertAlmostEqual(samples[-1], 250)
+        self.assertEqual(exported['stats'][KEY_PRESS]['count'], 250)
+
+    def test_disabled(self):
+        self.recorder.enabled = False
+        with self.recorder.time(KEY_PRESS):
+            pass
+        self.assertEqual(self.recorder.stats(), {})
+
+    def test_time(self):
+        with self.recorder.time(KEY_PRESS):
+            pass
+        self.recorder.reset()
+        with self.recorder.time(KEY_PRESS):
+            pass
+        self.assertEqual(self.recorder.stats()[KEY_PRESS]['count'], 1)
+
+
+class TestInstrumentedTextEdit(unittest.TestCase):
+    def setUp(self) -> None:
+        self.text_edit = MyPlainTextEdit({'tge': {'default': 'the', 'words': ['the']}})
+        self.text_edit.latency = LatencyRecorder()
+
+    def test_records_stages(self):
+        self.text_edit.latency.enabled = True
+        QTest.keyClicks(self.text_edit, 'tge')
+        QTest.keyClick(self.text_edit, Qt.Key_Space)
+        self.assertEqual(self.text_edit.toPlainText(), 'The ')
+        stats = self.text_edit.latency.stats()
+        self.assertEqual(stats[KEY_PRESS]['count'], 4)
+        self.assertEqual(stats[PROCESS_PREVIOUS_WORD]['count'], 1)
+        self.assertEqual(stats[MAP_STRING_TO_WORD]['count'], 1)
+        self.text_edit.handle_mode_toggle()
+        self.assertEqual(self.text_edit.latency.stats()[SETUP_WORDCHECK]['count'], 1)
+
+    def test_off_by_default(self):
+        QTest.keyClicks(self.text_edit, 'tge ')
+        self.assertEqual(self.text_edit.toPlainText(), 'The ')
+        self.assertEqual(self.text_edit.latency.stats(), {})
+
+
+class TestDialog(unittest.TestCase):
+    def setUp(self) -> None:
+        self.recorder = LatencyRecorder()
+        self.recorder.record(PROCESS_PREVIOUS_WORD, 0.0025)
+        self.dialog = LatencyDialog(self.recorder)
+
+    def tearDown(self) -> None:
+        if os.path.exists('test_latency.json'):
+            os.remove('test_latency.json')
+
+    def test_table(self):
+        row = 1
+        self.assertEqual(self.dialog.table.verticalHeaderItem(row).text(), PROCESS_PREVIOUS_WORD)
+        self.assertEqual(self.dialog.table.item(row, 0).text(), '1')
+        self.assertEqual(self.dialog.table.item(row, 1).text(), '2.50')
+        self.assertEqual(self.dialog.table.item(0, 1).text(), '')
+        self.dialog.reset_btn.click()
+        self.assertEqual(self.dialog.table.item(row, 0).text(), '')
+
+    def test_toggle_recording(self):
+        with patch('OHTE.latency_dialog.QSettings'):
+            self.dialog.record_check_box.setChecked(True)
+            self.assertTrue(self.recorder.enabled)
+            self.dialog.record_check_box.setChecked(False)
+        self.assertFalse(self.recorder.enabled)
+
+    def test_export(self):
+        with patch.object(QFileDialog, 'getSaveFileName', return_value=('test_latency.json', '')):
+            self.dialog.export_btn.click()
+        with open('test_latency.json') as f:
+            self.assertEqual(json.load(f)['stats'][PROCESS_PREVIOUS_WORD]['count'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
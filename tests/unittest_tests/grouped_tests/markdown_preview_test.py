@@ -0,0 +1,138 @@
+import unittest
+import random
+
+from PySide2.QtGui import QTextDocument, QTextFormat
+from PySide2.QtWidgets import QApplication
+
+from OHTE.markdown_preview import MarkdownPreview, split_markdown
+
+
+def setUpModule():
+    if QApplication.instance() is None:
+        app = QApplication([])
+
+
+def dump(doc: QTextDocument):
+    """Block texts and the formats markdown sets, for comparing renderings."""
+    blocks = []
+    block = doc.firstBlock()
+    while block.isValid():
+        block_format = block.blockFormat()
+        text_list = block.textList()
+        blocks.append((block.text(),
+                       text_list.format().style() if text_list else None,
+                       text_list.itemNumber(block) if text_list else None,
+                       block_format.headingLevel(),
+                       block_format.property(QTextFormat.BlockCodeFence),
+                       block_format.property(QTextFormat.BlockQuoteLevel),
+                       block_format.topMargin(),
+                       tuple((it.fragment().text(), it.fragment().charFormat().fontWeight()) for it in block)))
+        block = block.next()
+    return blocks
+
+
+class TestSplit(unittest.TestCase):
+    def test_segments(self):
+        text = "# Head\n\npara\nmore\n\n\n- a\n- b\n\n- c\n  d\n\n```\ncode\n\nmore\n```\n\n    indented\n\nlast\n"
+        segments = split_markdown(text)
+        self.assertEqual(''.join(segments), text)
+        self.assertEqual(segments, ["# Head\n\n", "para\nmore\n\n\n", "- a\n- b\n\n- c\n  d\n\n",
+                                    "```\ncode\n\nmore\n```\n\n    indented\n\n", "last\n"])
+
+    def test_edge_cases(self):
+        self.assertEqual(split_markdown(''), [''])
+        self.assertEqual(split_markdown('\n\nfirst\n\n1. one'), ['\n\nfirst\n\n', '1. one'])
+        self.assertEqual(split_markdown('~~~\n\n```\n\nx\n~~~~\n\ny'), ['~~~\n\n```\n\nx\n~~~~\n\n', 'y'])
+
+    def test_link_definitions(self):
+        text = "[a link][1]\n\npara\n\n[1]: http://example.com"
+        self.assertEqual(split_markdown(text), [text])
+
+
+class TestPreview(unittest.TestCase):
+    pieces = ["# Head", "para one\nline2", "- a\n- b\n\n- c", "```\ncode\n\nmore\n```", "1. x\n2. y", "> quote",
+              "| a | b |\n|---|---|\n| 1 | 2 |", "para **bold** end", "![img](x.png) and [link](http://x)",
+              "***", "last", "", "  indented\n  more", "* star", "3. three"]
+
+    def setUp(self) -> None:
+        self.source = QTextDocument()
+        self.preview = MarkdownPreview(self.source, QTextDocument())
+
+    def rendered_from_scratch(self):
+        preview = MarkdownPreview(self.source, QTextDocument())
+        preview.update()
+        return dump(preview.preview), preview.block_counts
+
+    def test_same_as_set_markdown(self):
+        text = '\n\n'.join(piece for piece in self.pieces if '|' not in piece)
+        self.source.setPlainText(text)
+        self.preview.update()
+        expected = QTextDocument()
+        expected.setMarkdown(text)
+        self.assertEqual(dump(self.preview.preview)[:-1], dump(expected))
+        self.assertEqual(self.preview.preview.lastBlock().text(), '')
+
+    def test_only_changes_rerendered(self):
+        self.source.setPlainText("# Head\n\npara one\n\n- a\n- b")
+        self.preview.update()
+        head = self.preview.preview.firstBlock()
+        self.assertEqual(self.preview.block_counts, [1, 1, 2])
+        self.source.setPlainText("# Head\n\npara two\n\nnew para\n\n- a\n- b")
+        self.preview.update()
+        self.assertEqual(self.preview.block_counts, [1, 1, 1, 2])
+        self.assertEqual(self.preview.block_starts, [0, 1, 2, 3, 5])
+        self.assertEqual(self.preview.preview.firstBlock(), head)
+        self.assertEqual((dump(self.preview.preview), self.preview.block_counts), self.rendered_from_scratch())
+
+    def test_keeps_no_undo_history(self):
+        for text in ["para one", "para two\n\nmore", "para three"]:
+            self.source.setPlainText(text)
+            self.preview.update()
+        self.assertEqual(self.preview.preview.availableUndoSteps(), 0)
+
+    def test_random_edits(self):
+        rng = random.Random(0)
+        segments = []
+        for _ in range(150):
+            edit = rng.random()
+            if edit < 0.4 and segments:
+                segments[rng.randrange(len(segments))] = rng.choice(self.pieces)
+            elif edit < 0.7 or not segments:
+                segments.insert(rng.randint(0, len(segments)), rng.choice(self.pieces))
+            else:
+                del segments[rng.randrange(len(segments))]
+            self.source.setPlainText('\n\n'.join(segments))
+            self.preview.update()
+            self.assertEqual((dump(self.preview.preview), self.preview.block_counts), self.rendered_from_scratch(),
+                             msg=repr(self.source.toPlainText()))
+
+    def test_preview_block(self):
+        self.source.setPlainText("# Head\n\npara one\nline2\n\n- a\n- b\n- c\n\n\nlast")
+        self.preview.update()
+        blocks = [self.preview.preview.findBlockByNumber(self.preview.preview_block(n)).text()
+                  for n in range(self.source.blockCount())]
+        self.assertEqual(blocks, ["Head", "Head", "para one line2", "para one line2", "para one line2",
+                                  "a", "b", "c", "c", "c", "last"])
+        self.assertEqual(self.preview.preview_block(100), self.preview.preview_block(10))
+
+    def test_preview_block_after_edits(self):
+        lines = ["# Head {}".format(n) if n % 2 else "" for n in range(200)]
+        self.source.setPlainText('\n'.join(lines))
+        self.preview.update()
+        self.source.setPlainText('\n'.join(lines[:50] + ["", "new para", ""] + lines[50:]))
+        self.preview.update()
+        self.assertEqual(self.preview.preview.findBlockByNumber(self.preview.preview_block(52)).text(), "new para")
+        self.assertEqual(self.preview.preview.findBlockByNumber(self.preview.preview_block(156)).text(), "Head 153")
+
+    def test_live(self):
+        self.source.setPlainText("para")
+        self.assertFalse(self.preview.timer.isActive())
+        self.preview.live = True
+        self.source.setPlainText("para two")
+        self.assertTrue(self.preview.timer.isActive())
+        self.preview.timer.timeout.emit()
+        self.assertEqual(self.preview.preview.firstBlock().text(), "para two")
+
+
+if __name__ == '__main__':
+    unittest.main()
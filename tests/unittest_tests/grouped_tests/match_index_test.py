@@ -0,0 +1,49 @@
+import unittest
+
+from OHTE.match_index import MatchIndex
+
+
+class TestMatchIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        self.index = MatchIndex([(0, 2), (3, 5), (10, 12)])
+
+    def test_navigation(self):
+        self.assertEqual(self.index.next_index(0), 0)
+        self.assertEqual(self.index.next_index(2), 1)  # from the end of match 0
+        self.assertEqual(self.index.next_index(4), 1)  # inside match 1
+        self.assertEqual(self.index.next_index(12), 0)  # wraps
+        self.assertEqual(self.index.prev_index(12), 1)
+        self.assertEqual(self.index.prev_index(6), 1)
+        self.assertEqual(self.index.prev_index(2), 2)  # wraps
+        self.assertEqual(MatchIndex().next_index(3), -1)
+        self.assertEqual(MatchIndex().prev_index(3), -1)
+
+    def test_index(self):
+        self.assertEqual(self.index.index(3), 1)
+        with self.assertRaises(ValueError):
+            self.index.index(4)
+
+    def test_overlapping(self):
+        self.assertEqual(list(self.index.overlapping(4, 9)), [1])
+        self.assertEqual(list(self.index.overlapping(5, 10)), [1, 2])
+        self.assertEqual(list(self.index.overlapping(6, 9)), [])
+        self.assertEqual(list(self.index.overlapping(0, 100)), [0, 1, 2])
+
+    def test_remove(self):
+        self.index.remove(1, shift=-1)
+        self.assertEqual(len(self.index), 2)
+        self.assertEqual(self.index.span(1), (9, 11))
+        self.index.remove(0)
+        self.assertEqual(self.index.span(0), (9, 11))
+
+    def test_replace(self):
+        self.index.replace(3, 6, [(3, 4), (5, 6)], shift=2)  # e.g. "ab" at 3 became "abab"
+        self.assertEqual([self.index.span(i) for i in range(len(self.index))], [(0, 2), (3, 4), (5, 6), (12, 14)])
+        self.index.replace(0, 3, [], shift=-1)
+        self.assertEqual([self.index.span(i) for i in range(len(self.index))], [(2, 3), (4, 5), (11, 13)])
+        self.assertEqual(self.index.next_index(5), 2)
+        self.assertEqual(list(self.index.overlapping(10, 20)), [2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,8 +2,8 @@ import unittest
 import os
 import json
 
-from OHTE.regex_map import (word_to_lc_regex, create_regex_map, map_word_to_entry, map_string_to_word,
-                            add_word_to_dict, del_word_from_dict, set_entry_default)
+from OHTE.regex_map import (word_to_lc_regex, words_to_lc_regexes, create_regex_map, map_word_to_entry,
+                            map_string_to_word, add_word_to_dict, del_word_from_dict, set_entry_default)
 
 
 class TestRegexMaker(unittest.TestCase):
@@ -20,6 +20,11 @@ class TestRegexMaker(unittest.TestCase):
     def test_raw_backslash(self):
         self.assertEqual(word_to_lc_regex(r'\n'), r'\v')
 
+    def test_batch(self):
+        words = ['AaA', ':<>', '', '2@', "it's"]
+        self.assertEqual(words_to_lc_regexes(words), [word_to_lc_regex(wd) for wd in words])
+        self.assertEqual(words_to_lc_regexes([]), [])
+
 
 class TestWordMapping(unittest.TestCase):
     @classmethod
@@ -77,29 +82,44 @@ class TestEntryMapping(unittest.TestCase):
         self.assertIsNone(map_word_to_entry('kwyjibo', self.regex_map))
         self.assertIsNone(map_word_to_entry('', self.regex_map))
 
-    def test_deepcopy(self):
+    def test_read_only(self):
         entry = map_word_to_entry(';,', self.regex_map)
-        entry['words'].append('hi')
-        self.assertNotEqual(entry, map_word_to_entry(';,', self.regex_map))
+        with self.assertRaises(AttributeError):
+            entry.words.append('hi')
+        with self.assertRaises(AttributeError):
+            entry.words = ['hi']
+        self.assertEqual(self.regex_map['ax']['words'], ['ax'])
+
+    def test_cached_until_modified(self):
+        entry = map_word_to_entry('may', self.regex_map)
+        self.assertIs(entry, map_word_to_entry('cat', self.regex_map))
+
+        add_word_to_dict('cay', self.regex_map)
+        added = map_word_to_entry('may', self.regex_map)
+        self.assertIsNot(entry, added)
+        self.assertEqual(added.words, ('may', 'cat', 'May', 'cay', 'Cat', 'Cay'))
+
+        del_word_from_dict('cay', self.regex_map)
+        self.assertEqual(map_word_to_entry('may', self.regex_map).words, ('may', 'cat', 'May', 'Cat'))
 
     def test_possessives(self):
         word = 'ax\'s'
         entry = map_word_to_entry(word, self.regex_map)
-        self.assertEqual(word, entry['default'])
-        self.assertEqual([word, word.capitalize()], entry['words'])
+        self.assertEqual(word, entry.default)
+        self.assertEqual((word, word.capitalize()), entry.words)
 
     def test_caps_stuff(self):
         entry = map_word_to_entry('may', self.regex_map)
-        self.assertEqual(entry['default'], 'may')
-        self.assertEqual(entry['words'], ['may', 'cat', 'May', 'Cat'])
+        self.assertEqual(entry.default, 'may')
+        self.assertEqual(entry.words, ('may', 'cat', 'May', 'Cat'))
 
         entry = map_word_to_entry('May', self.regex_map)
-        self.assertEqual(entry['default'], 'may')
-        self.assertEqual(entry['words'], ['may', 'cat', 'May', 'Cat'])
+        self.assertEqual(entry.default, 'may')
+        self.assertEqual(entry.words, ('may', 'cat', 'May', 'Cat'))
 
         entry = map_word_to_entry('Hi', self.regex_map)
-        self.assertEqual(entry['default'], 'Hi')
-        self.assertEqual(entry['words'], ['Hi', 'hi', 'he', 'He'])
+        self.assertEqual(entry.default, 'Hi')
+        self.assertEqual(entry.words, ('Hi', 'hi', 'he', 'He'))
 
 
 class TestRegexMapMaker(unittest.TestCase):
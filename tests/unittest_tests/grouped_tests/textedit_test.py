@@ -2,12 +2,15 @@ import unittest
 from unittest.mock import MagicMock
 import os
 import json
+import random
 
 from PySide2.QtCore import Qt
+from PySide2.QtGui import QTextCursor
 from PySide2.QtWidgets import QApplication
 from PySide2.QtTest import QTest
 
-from OHTE.textedit import MyPlainTextEdit, Mode
+from OHTE.textedit import (MyPlainTextEdit, Mode, search_tail, cursor_text_before, word_pattern, word_barrier,
+                            autocaps_pattern, autocaps_barrier, coerce_paragraph)
 from OHTE.regex_map import create_regex_map
 
 
@@ -105,6 +108,111 @@ class TestInsertMode(unittest.TestCase):
         QTest.keyClicks(self.editor, '"(\'thi?!\')".z  ')
         self.assertEqual(self.editor.textCursor().block().text(), '"(\'the?!\')"..  ')
 
+    def test_long_paragraph(self):
+        self.editor.autocaps = True
+        self.editor.setPlainText('x' * 1000 + '. ' + '3' * 1000)
+        self.editor.moveCursor(QTextCursor.End)
+        QTest.keyClicks(self.editor, ' thi ')
+        self.assertEqual(self.editor.textCursor().block().text()[-5:], ' the ')
+        QTest.keyClicks(self.editor, '"(\'thi.\')z ')
+        self.assertEqual(self.editor.textCursor().block().text()[-11:], '"(\'the.\'). ')
+
+
+class TestSearchTail(unittest.TestCase):
+    def test_same_as_full_search(self):
+        rng = random.Random(0)
+        chars = 'ab ;.,:<>\'"!?)]}(3-\t'  # a block's text has no newlines
+        for _ in range(5000):
+            text = ''.join(rng.choice(chars) for _ in range(rng.randint(0, 40)))
+            for pattern, barrier in [(word_pattern, word_barrier), (autocaps_pattern, autocaps_barrier)]:
+                full = pattern.search(text)
+                tail = search_tail(pattern, barrier, lambda n: text[len(text) - n:], len(text), window=3)
+                if full is None:
+                    self.assertIsNone(tail, msg=repr(text))
+                else:
+                    # Same match, counted back from the end of the text.
+                    self.assertEqual(len(text) - full.start(), len(tail.string) - tail.start(), msg=repr(text))
+                    self.assertEqual(full.groupdict(), tail.groupdict(), msg=repr(text))
+
+    def test_cursor_text_before(self):
+        editor = MyPlainTextEdit(regex_map)
+        editor.setPlainText("first para\nsecond \u2028para")
+        editor.moveCursor(QTextCursor.End)
+        cursor = editor.textCursor()
+        text = cursor.block().text()[:cursor.positionInBlock()]
+        for n in range(len(text) + 1):
+            self.assertEqual(cursor_text_before(cursor, n), text[len(text) - n:])
+        self.assertEqual(editor.textCursor().position(), cursor.position())
+
+
+class TestCoerce(unittest.TestCase):
+    def setUp(self) -> None:
+        self.editor = MyPlainTextEdit(regex_map)
+
+    def typed(self, paragraphs, autocaps) -> str:
+        """What typing `paragraphs` key by key, with Return after each but the last, then Return, gives."""
+        typist = MyPlainTextEdit(regex_map)
+        typist.autocaps = autocaps
+        for i, paragraph in enumerate(paragraphs):
+            if i:
+                QTest.keyClick(typist, Qt.Key_Return)
+            QTest.keyClicks(typist, paragraph)
+        typist.process_previous_word()
+        return typist.toPlainText()
+
+    def test_same_as_typing(self):
+        rng = random.Random(0)
+        words = ['thi', 'en', 'dwn', 'hwx', 'z', 'zz', '("thi).', 'it\'a', 'i?', 'x', '3']
+        for _ in range(30):
+            paragraphs = [' '.join(rng.choice(words) + rng.choice(['', '', '/', '.'])
+                                   for _ in range(rng.randint(0, 8))) for _ in range(rng.randint(1, 3))]
+            for autocaps in [False, True]:
+                self.editor.autocaps = autocaps
+                self.editor.setPlainText('\n'.join(paragraphs))
+                self.editor.coerce(0, self.editor.document().characterCount() - 1)
+                self.assertEqual(self.editor.toPlainText(), self.typed(paragraphs, autocaps), msg=repr(paragraphs))
+
+    def test_paragraph_edits(self):
+        lookups = []
+
+        def map_word(raw_word):
+            lookups.append(raw_word)
+            return {'thi': 'the', 'en': 'en'}.get(raw_word)
+
+        self.assertEqual(coerce_paragraph('en thi zz thi', 0, 13, map_word, autocaps=False), [(3, 'the'), (10, 'the')])
+        self.assertEqual(lookups, ['en', 'thi', 'zz', 'thi'])
+        self.assertEqual(coerce_paragraph('thi thi', 4, 5, map_word), [], msg="stops short of the last word")
+        self.assertEqual(coerce_paragraph('thi thi', 3, 7, map_word), [(0, 'The'), (4, 'the')])
+
+    def test_selection(self):
+        self.editor.autocaps = False
+        self.editor.setPlainText('thi thi\nthi thi')
+        self.editor.coerce(4, 11)
+        self.assertEqual(self.editor.toPlainText(), 'thi the\nthe thi')
+
+    def test_non_bmp(self):
+        self.editor.autocaps = False
+        self.editor.setPlainText('\U0001f600 thi thi')
+        self.assertEqual(self.editor.coerce(2, self.editor.document().characterCount() - 1), 2)
+        self.assertEqual(self.editor.toPlainText(), '\U0001f600 the the')
+
+    def test_one_undo_step_and_lookups(self):
+        self.editor.setPlainText('thi thi thi. thi')
+        self.editor.map_word = MagicMock(wraps=self.editor.map_word)
+        self.assertEqual(self.editor.coerce(0, self.editor.document().characterCount() - 1), 4)
+        self.assertEqual(self.editor.toPlainText(), 'The the the. The')
+        self.assertEqual(self.editor.map_word.call_count, 2, msg="once each for 'thi' and 'thi.'")
+        self.editor.undo()
+        self.assertEqual(self.editor.toPlainText(), 'thi thi thi. thi')
+
+    def test_cancel(self):
+        self.editor.setPlainText('thi\n' * 10)
+        with unittest.mock.patch('OHTE.textedit.PROGRESS_INTERVAL', -1):
+            progress = MagicMock(return_value=False)
+            self.assertIsNone(self.editor.coerce(0, self.editor.document().characterCount() - 1, progress))
+        progress.assert_called_once_with(4, 40)
+        self.assertEqual(self.editor.toPlainText(), 'thi\n' * 10)
+
 
 class TestWordcheckModeAllowedKeys(unittest.TestCase):
     def setUp(self) -> None:
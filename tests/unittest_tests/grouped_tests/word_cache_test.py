@@ -0,0 +1,84 @@
+import unittest
+import random
+
+from PySide2.QtWidgets import QApplication
+from PySide2.QtTest import QTest
+
+from OHTE.word_cache import WordCache
+from OHTE.dictionary_store import DictionaryStore
+from OHTE.regex_map import (map_string_to_word, add_word_to_dict, del_word_from_dict, set_entry_default)
+from OHTE.textedit import MyPlainTextEdit
+
+
+def setUpModule():
+    if QApplication.instance() is None:
+        app = QApplication([])
+
+
+class TestWordCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.regex_map = {'cat': {'default': 'may', 'words': ['may', 'cat']}, 'a': {'default': 'a', 'words': ['a']}}
+        self.cache = WordCache(self.regex_map, capacity=3)
+
+    def test_hits(self):
+        self.assertEqual(self.cache.map_string_to_word('mat'), 'may')
+        self.assertEqual(self.cache.map_string_to_word('mat'), 'may')
+        self.assertEqual(self.cache.map_string_to_word('Mat'), 'May', msg="capitalization is part of the key")
+        self.assertIsNone(self.cache.map_string_to_word('zzz'))
+        self.assertIsNone(self.cache.map_string_to_word('zzz'))
+        self.assertEqual(self.cache.stats(), {'size': 3, 'capacity': 3, 'hits': 2, 'misses': 3, 'hit_rate': 0.4})
+        self.cache.reset_stats()
+        self.assertEqual(self.cache.hit_rate, 0)
+
+    def test_least_recently_used_dropped(self):
+        for raw_word in ['mat', 'a', 'mat', 'Mat', 'zzz']:
+            self.cache.map_string_to_word(raw_word)
+        self.cache.reset_stats()
+        self.cache.map_string_to_word('mat')
+        self.cache.map_string_to_word('a')
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_invalidate_drops_only_dependents(self):
+        self.cache.map_string_to_word('mat')
+        self.cache.map_string_to_word('a')
+        self.regex_map['cat'] = {'default': 'cat', 'words': ['may', 'cat']}
+        self.cache.invalidate('cat')
+        self.assertEqual(self.cache.stats()['size'], 1)
+        self.assertEqual(self.cache.map_string_to_word('mat'), 'cat')
+        self.cache.invalidate('bwb')
+        self.assertEqual(self.cache.stats()['size'], 2)
+
+
+class TestStoreWordCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.store = DictionaryStore({'cat': {'default': 'may', 'words': ['may', 'cat']}})
+
+    def test_same_as_uncached(self):
+        rng = random.Random(0)
+        letters = 'aqtsz;.\'ly'
+        raw_words = [''.join(rng.choice(letters) for _ in range(rng.randint(1, 5))) for _ in range(60)]
+        raw_words += [word.capitalize() for word in raw_words]
+        for _ in range(2000):
+            raw_word = rng.choice(raw_words)
+            if rng.random() < 0.1:
+                word = map_string_to_word(raw_word, self.store) or raw_word.strip('.;\'')
+                if word:
+                    rng.choice([add_word_to_dict, del_word_from_dict, set_entry_default])(word, self.store)
+            self.assertEqual(self.store.word_cache.map_string_to_word(raw_word),
+                             map_string_to_word(raw_word, self.store.regex_map), msg=repr(raw_word))
+        self.assertGreater(self.store.word_cache.hits, 0)
+
+    def test_text_edit(self):
+        editor = MyPlainTextEdit(self.store)
+        QTest.keyClicks(editor, 'mat mat ')
+        self.assertEqual(editor.toPlainText(), 'May may ')
+        self.assertEqual((editor.word_cache.hits, editor.word_cache.misses), (1, 1))
+        add_word_to_dict('cat', self.store)
+        set_entry_default('cat', self.store)
+        self.assertNotIn('mat', self.store.word_cache._words)
+        QTest.keyClicks(editor, 'mat ')
+        self.assertEqual(editor.toPlainText(), 'May may cat ')
+
+
+if __name__ == '__main__':
+    unittest.main()
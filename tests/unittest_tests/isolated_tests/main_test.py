@@ -1,18 +1,17 @@
 import unittest
-from unittest.mock import MagicMock, mock_open, patch
+from unittest.mock import MagicMock
 import os
-import json
 
 from PySide2.QtCore import QStandardPaths
 
-from OHTE.main_window import MainWindow
 from OHTE import main
 
 
 QStandardPaths.locate = MagicMock(return_value='')
+QStandardPaths.writableLocation = MagicMock(return_value='')  # no journal, so the dictionary is saved on quit.
 
 
-DEST = 'regex_map.json'
+DEST = 'regex_map.bin'
 
 
 def setUpModule():
@@ -27,23 +26,22 @@ def tearDownModule():
 class TestMain(unittest.TestCase):
     # ONLY CALL ONE PER RUN OR ELSE CRASHES B/C QAPP NOT DELETED FOR SOME REASON
     def test_save_dictionary_called_on_close(self):
-        MainWindow.dict_modified = True
         main.save_dictionary = MagicMock()
         fake_dict = {'cat': {'default': 'cat', 'words': ['may', 'cat']}}
-        json.load = MagicMock(return_value=fake_dict)
+        main.open_dict_file = MagicMock(return_value=fake_dict)
         with self.assertRaises(SystemExit) as se:
             main.main()
         main.save_dictionary.assert_called_once()
-        main.save_dictionary.assert_called_with(DEST, DEST, fake_dict)
+        file_name, dict_src, dictionary = main.save_dictionary.call_args[0]
+        self.assertEqual((file_name, dict_src), (DEST, DEST))
+        self.assertIs(dictionary.regex_map, fake_dict)
 
     def test_opens_default_src_when_not_found_in_users_file_system(self):
-        open_spy = mock_open()
-        with patch('builtins.open', open_spy):
-            fake_dict = {'cat': {'default': 'cat', 'words': ['may', 'cat']}}
-            json.load = MagicMock(return_value=fake_dict)
-            with self.assertRaises(SystemExit) as se:
-                main.main()
-        open_spy.assert_called_with(DEST)
+        fake_dict = {'cat': {'default': 'cat', 'words': ['may', 'cat']}}
+        main.open_dict_file = MagicMock(return_value=fake_dict)
+        with self.assertRaises(SystemExit) as se:
+            main.main()
+        main.open_dict_file.assert_called_with(DEST)
 
 
 if __name__ == '__main__':